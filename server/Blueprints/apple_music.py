@@ -15,6 +15,7 @@ from util.utils import (
 )  # Utility to format milliseconds into human readable string
 from util.authlib import requires_scope
 from util.models import PlaylistItemsRequest, UserEmailRequest
+from util.playlist import optimized_pomodoro_playlists
 
 
 appleMusic_bp = Blueprint("appleMusic", __name__)
@@ -203,6 +204,12 @@ def get_playlists():
                 playlist["total_tracks"] = 0
                 playlist["playlist_id"] = playlist_id
 
+        # Pomodoro schedule for every playlist, scheduled in one pass.
+        scheduled = [p for p in playlists if "formatted_duration" in p]
+        schedules = optimized_pomodoro_playlists([p["formatted_duration"] for p in scheduled])
+        for playlist, schedule in zip(scheduled, schedules):
+            playlist["pomodoro_schedule"] = schedule
+
         logger.info(
             "Successfully processed playlists for user: %s",
             user_email)
@@ -15,6 +15,7 @@ from util.models import RegisterRequest, LoginRequest  # Import models
 from util.logit import get_logger
 from pydantic import ValidationError
 from util.authlib import default_user
+from util.tracing import timed
 from config.config import settings
 
 auth_bp = Blueprint("auth", __name__)
@@ -97,10 +98,12 @@ def login():
 
     if result:
         user_id, stored_hashed_password = result["email"], result["password"]
-        if bcrypt.checkpw(
-            payload.password.encode(
-                "utf-8"), stored_hashed_password.encode("utf-8")
-        ):
+        with timed("bcrypt"):
+            password_ok = bcrypt.checkpw(
+                payload.password.encode(
+                    "utf-8"), stored_hashed_password.encode("utf-8")
+            )
+        if password_ok:
             additional_claims = {"scopes": default_user}
             access_token = create_access_token(
                 identity=payload.email,
@@ -4,22 +4,15 @@ from flask_cors import CORS
 from util.logit import get_logger
 from util.error_handling import log_error
 from config.config import settings
+from util.error_stats import error_stats, register_error_stats
 
 errors_bp = Blueprint("errors", __name__)
 CORS(errors_bp, resources=settings.CORS_resource_allow_all)
 logger = get_logger("logs", "AppErrors")
 
-error_counts = {400: 0, 401: 0, 403: 0, 404: 0, 405: 0, 408: 0, 429: 0, 500: 0}
-
-
-def increment_error_count(status_code):
-    if status_code in error_counts:
-        error_counts[status_code] += 1
-
 
 @errors_bp.errorhandler(400)
 def bad_request(e):
-    increment_error_count(400)
     log_error(e)
     logger.error(f"400 Bad Request: {e}")
     return (
@@ -34,7 +27,6 @@ def bad_request(e):
 
 @errors_bp.errorhandler(401)
 def unauthorized(e):
-    increment_error_count(401)
     log_error(e)
     logger.error(f"401 Unauthorized: {e}")
     return (
@@ -47,7 +39,6 @@ def unauthorized(e):
 
 @errors_bp.errorhandler(403)
 def forbidden(e):
-    increment_error_count(403)
     log_error(e)
     logger.error(f"403 Forbidden: {e}")
     return (
@@ -61,7 +52,6 @@ def forbidden(e):
 
 @errors_bp.errorhandler(404)
 def page_not_found(e):
-    increment_error_count(404)
     log_error(e)
     logger.error(f"404 Not Found: {e}")
     return (
@@ -76,7 +66,6 @@ def page_not_found(e):
 
 @errors_bp.errorhandler(405)
 def method_not_allowed(e):
-    increment_error_count(405)
     log_error(e)
     logger.error(f"405 Method Not Allowed: {e}")
     return (
@@ -91,7 +80,6 @@ def method_not_allowed(e):
 
 @errors_bp.errorhandler(408)
 def request_timeout(e):
-    increment_error_count(408)
     log_error(e)
     logger.error(f"408 Request Timeout: {e}")
     return (
@@ -106,7 +94,6 @@ def request_timeout(e):
 
 @errors_bp.errorhandler(429)
 def too_many_requests(e):
-    increment_error_count(429)
     log_error(e)
     logger.error(f"429 Too Many Requests: {e}")
     return (
@@ -121,7 +108,6 @@ def too_many_requests(e):
 
 @errors_bp.errorhandler(500)
 def internal_server_error(e):
-    increment_error_count(500)
     log_error(e)
     logger.error(f"500 Internal Server Error: {e}")
     return (
@@ -136,7 +122,12 @@ def internal_server_error(e):
 
 @errors_bp.route("/error_stats")
 def show_error_stats():
-    return jsonify(error_counts)
+    """
+    Error counts per status code and per route over sliding 1m/5m/1h windows,
+    aggregated across all workers. Responses are recorded by the
+    after_request hook installed by register_error_stats.
+    """
+    return jsonify(error_stats.snapshot())
 
 
 def init_app(app):
@@ -152,3 +143,4 @@ def init_app(app):
     app.register_error_handler(408, request_timeout)
     app.register_error_handler(429, too_many_requests)
     app.register_error_handler(500, internal_server_error)
+    register_error_stats(app)
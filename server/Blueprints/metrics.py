@@ -0,0 +1,20 @@
+from flask import Blueprint, Response
+from flask_cors import CORS
+from util.logit import get_logger
+from util.metrics import render_metrics
+from config.config import settings
+
+metrics_bp = Blueprint("metrics", __name__)
+logger = get_logger("logs", "Metrics")
+CORS(metrics_bp, resources=settings.CORS_resource_allow_all)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Serves request latency histograms, per-provider outbound call metrics,
+    playlist cache hit/miss counters and Firestore read/write counts in the
+    Prometheus text exposition format.
+    """
+    body, content_type = render_metrics()
+    return Response(body, status=200, content_type=content_type)
@@ -1,3 +1,4 @@
+import math
 from flask import Blueprint, jsonify, request
 from flask_limiter import Limiter
 from flask_cors import CORS
@@ -5,8 +6,12 @@ from flask_limiter.util import get_remote_address
 from pydantic import ValidationError
 from util.logit import get_logger
 from config.config import settings
-from models.use_model import predict
-from util.models import MLRequest
+from models.batching import MicroBatcher
+from models.lookup_table import load_lookup_table
+from models.scheduler import HybridScheduler
+from models.use_model import predict_many
+from util.models import MLBatchRequest, MLRequest
+from util.tracing import timed
 
 mlModel_bp = Blueprint("mlModel", __name__)
 limiter = Limiter(key_func=get_remote_address)
@@ -16,6 +21,44 @@ CORS(mlModel_bp, resources=settings.CORS_resource_allow_all)
 
 logger = get_logger("logs", "mlModel")
 
+# Concurrent /ml/predict requests share forward passes.
+batcher = MicroBatcher(
+    predict_many,
+    window=settings.ml_batch_window_ms / 1000.0,
+    max_batch=settings.ml_max_batch_size,
+)
+
+# Precomputed predictions for whole-second durations, when configured.
+lookup_table = load_lookup_table(settings.ml_lookup_table) if settings.ml_lookup_table else None
+
+
+def lookup(duration_ms: float):
+    return lookup_table.lookup(duration_ms) if lookup_table is not None else None
+
+
+# Longest duration /ml/schedule and /ml/predict_batch accept, in
+# milliseconds (24 hours).
+MAX_SCHEDULE_MS = 24 * 60 * 60 * 1000
+
+
+def duration_error(duration_ms: float):
+    """Why `duration_ms` cannot be planned or predicted, or None if it can."""
+    if not math.isfinite(duration_ms) or duration_ms < 0:
+        return "Duration must be a finite, non-negative number."
+    if duration_ms > MAX_SCHEDULE_MS:
+        return f"Duration must be at most {MAX_SCHEDULE_MS} ms."
+    return None
+
+
+# /ml/schedule: heuristic schedules at once, model refinements through the
+# batcher in the background.
+scheduler = HybridScheduler(
+    batcher.submit,
+    bucket_seconds=settings.ml_schedule_bucket_seconds,
+    max_entries=settings.ml_schedule_cache_size,
+    tolerance=settings.ml_schedule_tolerance,
+)
+
 
 # Add /healthcheck to each blueprint
 @mlModel_bp.before_request
@@ -36,4 +79,47 @@ def predict_():
         payload = MLRequest.parse_obj(request.get_json())
     except ValidationError as ve:
         return jsonify({"error": ve.errors()}), 400
-    return jsonify(predict(payload.data / 60000.0))
+    with timed("model"):
+        prediction = lookup(payload.data) or batcher.submit(payload.data / 60000.0)
+    return jsonify(prediction)
+
+
+@mlModel_bp.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """
+    Predicts several durations (milliseconds, like /predict), running the
+    ones the lookup table does not cover through one forward pass, and
+    returns them in request order under "predictions".
+    """
+    try:
+        payload = MLBatchRequest.parse_obj(request.get_json())
+    except ValidationError as ve:
+        return jsonify({"error": ve.errors()}), 400
+    for i, ms in enumerate(payload.data):
+        error = duration_error(ms)
+        if error:
+            return jsonify({"error": f"data[{i}]: {error}"}), 400
+    predictions = [lookup(ms) for ms in payload.data]
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+    for i, prediction in zip(missing, predict_many([payload.data[i] / 60000.0 for i in missing])):
+        predictions[i] = prediction
+    return jsonify({"predictions": predictions})
+
+
+@mlModel_bp.route("/schedule", methods=["POST"])
+def schedule():
+    """
+    Schedule for a duration in milliseconds. "source" says whether the
+    schedule is the heuristic one or an accepted model refinement;
+    "refinement" is the state of the model's proposal for the bucket.
+    """
+    try:
+        payload = MLRequest.parse_obj(request.get_json())
+    except ValidationError as ve:
+        return jsonify({"error": ve.errors()}), 400
+    error = duration_error(payload.data)
+    if error:
+        return jsonify({"error": error}), 400
+    with timed("model"):
+        result = scheduler.schedule(payload.data / 60000.0)
+    return jsonify(result)
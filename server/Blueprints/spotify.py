@@ -137,7 +137,7 @@ def get_user():
         payload = UserIdRequest.parse_obj(request.get_json())
     except ValidationError as ve:
         return jsonify({"error": ve.errors()}), 400
-    print(payload.user_id)
+    logger.debug("Spotify user profile requested for %s", payload.user_id)
     return get_user_profile(escape(payload.user_id))
 
 
@@ -6,13 +6,12 @@ from util.error_handling import log_error
 from config.config import settings
 from util.models import PlaylistRequest  # Import the model
 from pydantic import ValidationError
-from cmd_gui_kit import CmdGUI
-from util.logit import get_logger
+from util.logit import get_logger, get_console
 import sys
 from util.authlib import requires_scope
 
-# Initialize CmdGUI for visual feedback
-gui = CmdGUI()
+# Initialize CmdGUI for visual feedback (rendered only when OUTPUT_MODE=gui)
+gui = get_console()
 
 logger = get_logger("logs", "SpotifyMicroService")
 
@@ -48,14 +48,11 @@ def view_profile():
     }
     """
     current_user = get_jwt_identity()
-    print(current_user)
 
     user_id = firebase_operations.get_user_id_by_email(current_user)
 
-    print(user_id)
-
     rows = firebase_operations.get_user_profile(user_id)
-    print(rows)
+    logger.debug("Profile rows fetched for user_id %s: %d", user_id, len(rows))
     try:
         if rows[0] != []:
             user = rows[0]
@@ -84,6 +81,10 @@ def get_current_user_chain_status():
     user_id = firebase_operations.get_user_id_by_email(current_user)
     chain_status = firebase_operations.get_user_chain_status(user_id)
     if chain_status:
+        # The app draws this and last month's calendar from "history".
+        if "history" not in chain_status:
+            months = firebase_operations.get_user_chain_history(user_id, months=2)
+            chain_status["history"] = [entry for month in reversed(months) for entry in month["entries"]]
         return jsonify(chain_status), 200
     return jsonify({"error": "Chain not found"}), 404
 
@@ -98,3 +99,32 @@ def update_user_chain_status():
     # e.g. data = { "action": "completed" }
     result = firebase_operations.upsert_user_chain(user_id, data)
     return jsonify(result), 200
+
+
+@profile_bp.route('/chain_leaderboard', methods=['POST'])
+@jwt_required()
+@requires_scope("me")
+def get_chain_leaderboard():
+    """
+    Chain leaderboards and streak histograms for all users, from the
+    summary document upsert_user_chain maintains.
+    """
+    return jsonify(firebase_operations.get_chain_summary()), 200
+
+
+@profile_bp.route('/chain_history', methods=['POST'])
+@jwt_required()
+@requires_scope("me")
+def get_user_chain_history():
+    """
+    The current user's chain actions by month, newest first; the body may
+    set "months" (default 3, at most 24).
+    """
+    current_user = get_jwt_identity()
+    user_id = firebase_operations.get_user_id_by_email(current_user)
+    data = request.get_json(silent=True) or {}
+    try:
+        months = min(max(int(data.get("months", 3)), 1), 24)
+    except (TypeError, ValueError):
+        return jsonify({"error": "months must be a number"}), 400
+    return jsonify(firebase_operations.get_user_chain_history(user_id, months)), 200
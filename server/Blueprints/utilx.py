@@ -1,8 +1,11 @@
-from flask import Blueprint, render_template, jsonify, request, current_app
+from flask import Blueprint, Response, render_template, jsonify, request, current_app
 from flask_cors import CORS
 from util.logit import get_logger
 from util.utils import route_descriptions
 from util.authlib import requires_scope
+from util.profiler import (
+    sample_stacks, sampling_jobs, slow_request_profiler, ProfilerBusy, MAX_BLOCKING_SECONDS, MAX_SAMPLE_SECONDS,
+)
 from config.config import settings
 
 util_bp = Blueprint("util", __name__)
@@ -74,6 +77,105 @@ def list_endpoints():
         return text_output, 200, {"Content-Type": "text/plain"}
 
 
+def _folded_response(collapsed: str) -> Response:
+    return Response(
+        collapsed,
+        status=200,
+        content_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": "attachment; filename=profile.folded"},
+    )
+
+
+@util_bp.route("/debug/profile", methods=["GET"])
+@requires_scope("admin")
+def sampling_profile():
+    """
+    Runs a time-boxed statistical sampling profile of this worker and returns
+    the collapsed stacks as a flamegraph input file.
+
+    Query parameters:
+    seconds (float): Sampling duration. Defaults to 10. Capped at
+        MAX_BLOCKING_SECONDS, so the request ends before gunicorn's worker
+        timeout, unless background is set.
+    interval (float): Seconds between samples. Defaults to 0.005. Must be
+        positive and no longer than seconds.
+    background (bool): Sample on a background thread for up to
+        MAX_SAMPLE_SECONDS and return 202 with a job id at once; the file is
+        then fetched from /debug/profile/<job_id> on the same worker.
+    """
+    try:
+        seconds = float(request.args.get("seconds", 10))
+        interval = float(request.args.get("interval", 0.005))
+    except ValueError:
+        return jsonify({"error": "seconds and interval must be numbers"}), 400
+    background = request.args.get("background", "false").lower() in ("1", "true", "yes")
+    limit = MAX_SAMPLE_SECONDS if background else MAX_BLOCKING_SECONDS
+    if not 0 < seconds <= limit:
+        return jsonify({"error": f"seconds must be in (0, {limit}]"}), 400
+    if not 0 < interval <= seconds:
+        return jsonify({"error": "interval must be in (0, seconds]"}), 400
+
+    try:
+        if background:
+            job = sampling_jobs.start(seconds, interval)
+        else:
+            collapsed = sample_stacks(seconds, interval)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+
+    if background:
+        logger.info(f"Sampling profile {job['id']} started ({seconds}s)")
+        return jsonify({"job_id": job["id"], "status": job["status"], "seconds": job["seconds"],
+                        "result_url": f"/debug/profile/{job['id']}"}), 202
+    logger.info(f"Sampling profile served ({seconds}s)")
+    return _folded_response(collapsed)
+
+
+@util_bp.route("/debug/profile/<job_id>", methods=["GET"])
+@requires_scope("admin")
+def sampling_profile_result(job_id):
+    """
+    The result of a background sampling profile: 202 while it runs, the
+    collapsed stacks once it is done. Jobs live in the worker that started
+    them, so other workers answer 404.
+    """
+    job = sampling_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown profile job in this worker."}), 404
+    if job["status"] == "running":
+        return jsonify({"job_id": job_id, "status": "running", "seconds": job["seconds"]}), 202
+    if job["status"] == "failed":
+        return jsonify({"job_id": job_id, "status": "failed", "error": job["error"]}), 500
+    return _folded_response(job["result"])
+
+
+@util_bp.route("/debug/slow_requests", methods=["GET", "POST"])
+@requires_scope("admin")
+def slow_requests():
+    """
+    GET returns the enabled routes and the cProfile output of the slowest
+    captured requests per route in this worker.
+    POST enables or disables capture for a route:
+    {"route": "/spotify/playlists", "keep": 5, "enabled": true}
+    """
+    if request.method == "GET":
+        return jsonify(slow_request_profiler.snapshot()), 200
+
+    data = request.get_json(silent=True) or {}
+    route = data.get("route")
+    if not route:
+        return jsonify({"error": "route is required"}), 400
+    if data.get("enabled", True):
+        try:
+            keep = int(data.get("keep", 5))
+        except (TypeError, ValueError):
+            return jsonify({"error": "keep must be an integer"}), 400
+        slow_request_profiler.enable(route, keep)
+    else:
+        slow_request_profiler.disable(route)
+    return jsonify({"routes": slow_request_profiler.snapshot()["routes"]}), 200
+
+
 @util_bp.route("/healthcheck", methods=["POST", "GET"])
 def app_healthcheck():
     # gui.log("App healthcheck requested")
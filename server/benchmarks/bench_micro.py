@@ -0,0 +1,36 @@
+"""
+pytest entry point for benchmarks/micro.py; not collected by the regular
+test run. One test per case, failing when the case's score regresses past
+MICRO_BENCH_THRESHOLD percent of the stored baseline:
+
+    python -m pytest benchmarks/bench_micro.py -v
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import micro  # noqa: E402
+
+micro.prepare_environment()
+
+BASELINE = micro.load_baseline()
+THRESHOLD = float(os.environ.get("MICRO_BENCH_THRESHOLD", micro.DEFAULT_THRESHOLD))
+
+
+@pytest.mark.parametrize("name", list(micro.CASES))
+def test_no_regression(name):
+    result = micro.run_case(name)
+    ok, delta = micro.check(name, result, BASELINE, THRESHOLD)
+    if delta is None:
+        pytest.skip(f"No baseline for {name}; record one with `python benchmarks/micro.py --save`")
+    assert ok, (
+        f"{name} regressed {delta:+.1f}% (score {result['score']}, "
+        f"baseline {BASELINE['cases'][name]['score']}, threshold {THRESHOLD}%)"
+    )
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Throughput of concurrent /profile/chain_status_update writes, measured on
+database.firebase_operations.upsert_user_chain against the in-memory
+Firestore fake with a simulated round-trip latency:
+
+    python benchmarks/chain_contention.py
+    python benchmarks/chain_contention.py --threads 1 4 16 --updates 200 --latency 0.005
+
+Two workloads per thread count: every thread updating its own user, and
+every thread updating one shared user with a different action per update
+(the double-tap / several-devices case, where transactions conflict and
+retry). Reported per run: updates per second, transaction round trips per
+update (2 without conflicts: begin and commit, plus a begin and a
+rollback or commit per retry, plus 2 for the leaderboard when a streak
+changes), updates that gave up after the client's retry limit, and
+history entries lost, i.e. updates that returned but are missing from the
+stored history.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from benchmarks.environment import prepare_environment  # noqa: E402
+
+THREADS = (1, 4, 16)
+UPDATES = 200
+LATENCY = 0.002  # seconds per round trip
+
+
+def run(fake, firebase_operations, threads: int, updates: int, shared: bool) -> dict:
+    fake.reset()
+    fake.reset_counters()
+    per_thread = updates // threads
+    failures = []
+
+    def worker(index: int):
+        user_id = 1 if shared else index + 1
+        for i in range(per_thread):
+            try:
+                firebase_operations.upsert_user_chain(user_id, {"action": f"t{index}-{i}"})
+            except Exception as e:
+                failures.append(e)
+
+    pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    done = per_thread * threads - len(failures)
+    users = [1] if shared else range(1, threads + 1)
+    stored = sum(
+        month["count"]
+        for user_id in users
+        for month in firebase_operations.get_user_chain_history(user_id, months=12)
+    )
+    return {
+        "updates_per_s": done / elapsed,
+        "txn_round_trips": fake.round_trips["transaction"] / max(1, done),
+        "failed": len(failures),
+        "lost": done - stored,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent chain update throughput")
+    parser.add_argument("--threads", nargs="+", type=int, default=list(THREADS))
+    parser.add_argument("--updates", type=int, default=UPDATES, help="updates per run, split between the threads")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per Firestore round trip")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    fake = prepare_environment()
+    from database import firebase_operations
+
+    fake.set_latency(read=args.latency, write=args.latency, transaction=args.latency)
+    print(f"{'workload':<12} {'threads':>7} {'updates/s':>10} {'txn trips':>10} {'failed':>7} {'lost':>5}")
+    for shared in (False, True):
+        for threads in args.threads:
+            result = run(fake, firebase_operations, threads, args.updates, shared)
+            print(f"{'one user' if shared else 'own user':<12} {threads:>7} {result['updates_per_s']:>10.1f} "
+                  f"{result['txn_round_trips']:>10.2f} {result['failed']:>7} {result['lost']:>5}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
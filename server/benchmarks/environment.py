@@ -0,0 +1,53 @@
+"""
+Process setup shared by the benchmarks: placeholder settings, the server
+directory as working directory and import root, and the in-memory
+Firestore fake in place of a real project.
+"""
+
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only applied where unset, so a local .env still wins for anything real.
+ENV_DEFAULTS = {
+    "JWT_SECRET_KEY": "load-test",
+    "SPOTIFY_CLIENT_ID": "id",
+    "SPOTIFY_CLIENT_SECRET": "secret",
+    "AUTH_REDIRECT_URI": "http://127.0.0.1/callback",
+    "SALT": "salt",
+    "MUSIXMATCH_API_KEY": "key",
+    "GOOGLE_CLIENT_ID": "id",
+    "GOOGLE_CLIENT_SECRET": "secret",
+    "GOOGLE_CLIENT_SECRET_FILE": "{}",
+    "APPLE_TEAM_ID": "team",
+    "APPLE_KEY_ID": "key",
+    "APPLE_PRIVATE_KEY_PATH": "keys/fake_key.p8",
+    "APPLE_DEVELOPER_TOKEN": "token",
+    "FIREBASE_CC_JSON": '{"type": "service_account"}',
+    "FIREBASECONFIG_APIKEY": "api",
+    "FIREBASECONFIG_AUTHDOMAIN": "domain",
+    "FIREBASECONFIG_PROJECTID": "project",
+    "FIREBASECONFIG_STORAGEBUCKET": "bucket",
+    "FIREBASECONFIG_MESSAGINGSENDERID": "sender",
+    "FIREBASECONFIG_APPID": "appid",
+    "FIREBASECONFIG_MEASUREMENTID": "measure",
+    "OUTPUT_MODE": "quiet",
+}
+
+
+def prepare_environment():
+    """
+    Readies this process to import the app. Returns the Firestore fake
+    that database.firebase_operations will use.
+    """
+    for name, value in ENV_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+    # Model weights and log directories are resolved relative to server/.
+    os.chdir(SERVER_DIR)
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)
+
+    from database.fake_firestore import install_fake_firestore
+
+    return install_fake_firestore()
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Reproducible load test of the Flask app against local provider stubs.
+
+The app is booted in its own process on the in-memory Firestore fake
+(database/fake_firestore.py), seeded with users that have every provider
+linked, and with every outbound provider call redirected to the stubs in
+provider_stubs.py. A keep-alive load generator then drives a weighted mix
+of login, playlist, playlist-duration, linked-app and ML predict requests
+at each concurrency level and writes p50/p95/p99 and throughput, overall
+and per scenario, to a JSON report.
+
+Requests are drawn from a seeded RNG and stub responses are deterministic,
+so reports from two commits are comparable:
+
+    python benchmarks/load_suite.py --output before.json
+    python benchmarks/load_suite.py --compare before.json --max-regression 15
+    python benchmarks/load_suite.py --mix spotify_duration --latency 0.05 spotify=0.2 --rate-limit spotify=50
+"""
+
+import argparse
+import asyncio
+import datetime as DT
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(HERE)
+sys.path.insert(0, SERVER_DIR)
+
+from benchmarks.provider_stubs import PROVIDERS  # noqa: E402
+
+REPORT_VERSION = 1
+STARTUP_TIMEOUT = 60  # seconds; the app loads the model and hashes seed passwords
+REQUEST_TIMEOUT = 30  # seconds before a request counts as an error
+DEFAULT_SEED = 1234
+PASSWORD = "load-test-password"
+# Apps collection rows; util.google looks the Google app up as "Google".
+APPS = {"Spotify": 1, "AppleMusic": 2, "YoutubeMusic": 3, "Google API": 4, "Google": 4}
+PERCENTILES = (50, 95, 99)
+
+
+def user_email(index: int) -> str:
+    return f"load-user-{index}@example.com"
+
+
+# -------------------------------------------------------------------------------
+# SCENARIOS
+# -------------------------------------------------------------------------------
+# name -> (path, needs_jwt, body(rng, email, playlists))
+SCENARIOS = {
+    "login": (
+        "/auth/login", False,
+        lambda rng, email, playlists: {"email": email, "password": PASSWORD},
+    ),
+    "spotify_playlists": (
+        "/spotify/playlists", True,
+        lambda rng, email, playlists: {"user_email": email},
+    ),
+    "spotify_duration": (
+        "/spotify-micro-service/playlist_duration", True,
+        lambda rng, email, playlists: {"user_email": email, "playlist_id": f"sp{rng.randrange(playlists)}"},
+    ),
+    "youtube_duration": (
+        "/youtube-music/playlist_duration", True,
+        lambda rng, email, playlists: {"user_email": email, "playlist_id": f"yt{rng.randrange(playlists)}"},
+    ),
+    "apple_duration": (
+        "/apple-music/playlist_duration", True,
+        lambda rng, email, playlists: {"user_email": email, "playlist_id": f"p.ap{rng.randrange(playlists)}"},
+    ),
+    "linked_app": (
+        "/apps/check_linked_app", True,
+        lambda rng, email, playlists: {"user_email": email, "app_name": rng.choice(["Spotify", "YoutubeMusic"])},
+    ),
+    "ml_predict": (
+        "/ml/predict", False,
+        lambda rng, email, playlists: {"data": rng.randrange(10, 240) * 60000},
+    ),
+}
+
+# Relative weights; any single scenario name is also accepted as a mix.
+MIXES = {
+    "realistic": {
+        "login": 5,
+        "spotify_playlists": 15,
+        "spotify_duration": 15,
+        "youtube_duration": 10,
+        "apple_duration": 5,
+        "linked_app": 25,
+        "ml_predict": 25,
+    },
+}
+
+
+def mix_weights(name: str) -> dict:
+    if name in MIXES:
+        return MIXES[name]
+    if name in SCENARIOS:
+        return {name: 1}
+    raise SystemExit(f"Unknown mix {name!r}; choose from {sorted(MIXES) + sorted(SCENARIOS)}")
+
+
+# -------------------------------------------------------------------------------
+# APP UNDER TEST
+# -------------------------------------------------------------------------------
+def seed_firestore(firebase_operations, users: int):
+    """
+    Creates `users` users, each with a profile and every app linked.
+    """
+    import bcrypt
+
+    def collection(name):
+        return firebase_operations.get_collection(name, firebase_operations.alias_map)
+
+    # One real bcrypt hash shared by every user keeps login as expensive as
+    # in production without paying for `users` hashes at startup.
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    now = DT.datetime.utcnow()
+    for app_name, app_id in APPS.items():
+        collection("apps").add({"app_id": app_id, "app_name": app_name})
+    for user_id in range(1, users + 1):
+        email = user_email(user_id - 1)
+        collection("users").document(str(user_id)).set(
+            {"user_id": user_id, "email": email, "password": hashed, "created_at": now, "updated_at": now}
+        )
+        collection("userprofiles").add(
+            {"user_id": user_id, "first_name": "Load", "last_name": str(user_id), "avatar_url": "", "bio": ""}
+        )
+        for app_id in sorted(set(APPS.values())):
+            collection("userlinkedapps").add(
+                {
+                    "user_id": user_id,
+                    "app_id": app_id,
+                    "access_token": f"stub-access-{user_id}-{app_id}",
+                    "refresh_token": f"stub-refresh-{user_id}-{app_id}",
+                    "token_expires_at": now + DT.timedelta(hours=1),
+                    "scopes": "",
+                }
+            )
+    firebase_operations.DB.collection("counters").document("users").set({"seq": users})
+
+
+def run_app(port: int, stub_url: str, users: int):
+    from benchmarks.environment import prepare_environment
+
+    prepare_environment()
+
+    import database.firebase_operations as firebase_operations
+    from benchmarks.provider_stubs import redirect_outbound_calls
+    from flask import Flask
+    from util.app import create_app
+    from werkzeug.serving import make_server
+
+    seed_firestore(firebase_operations, users)
+    redirect_outbound_calls(stub_url)
+    app = create_app(Flask("server", root_path=SERVER_DIR))
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def run_stubs(port: int, latency: dict, jitter: dict, rate_limits: dict):
+    from benchmarks.provider_stubs import serve_provider_stubs
+
+    serve_provider_stubs(port, latency, jitter, rate_limits)
+
+
+# -------------------------------------------------------------------------------
+# LOAD GENERATOR
+# -------------------------------------------------------------------------------
+def encode_request(port, path, body, token=None):
+    payload = json.dumps(body).encode("utf-8")
+    head = (
+        f"POST {path} HTTP/1.1\r\n"
+        f"Host: 127.0.0.1:{port}\r\n"
+        # The app forces HTTPS unless a TLS-terminating proxy says otherwise.
+        "X-Forwarded-Proto: https\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+    )
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    return (head + "\r\n").encode("latin-1") + payload
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                while await reader.readline() not in (b"\r\n", b""):
+                    pass  # trailers
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    else:
+        return status, await reader.read(), False
+    keep_alive = lines[0].startswith("HTTP/1.1") and headers.get("connection", "").lower() != "close"
+    return status, body, keep_alive
+
+
+async def send(port, conn, request):
+    if conn is None:
+        conn = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), REQUEST_TIMEOUT)
+    reader, writer = conn
+    writer.write(request)
+    await writer.drain()
+    status, body, keep_alive = await asyncio.wait_for(read_response(reader), REQUEST_TIMEOUT)
+    if not keep_alive:
+        writer.close()
+        conn = None
+    return conn, status, body
+
+
+async def client_loop(port, rng, weights, settings, deadline, samples, errors):
+    names, cumulative = list(weights), []
+    total = 0
+    for name in names:
+        total += weights[name]
+        cumulative.append(total)
+    conn = None
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, cum_weights=cumulative)[0]
+        path, needs_jwt, body = SCENARIOS[name]
+        email = user_email(rng.randrange(settings["users"]))
+        request = encode_request(
+            port, path, body(rng, email, settings["playlists"]), settings["token"] if needs_jwt else None
+        )
+        started = time.perf_counter()
+        try:
+            conn, status, _ = await send(port, conn, request)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            kind = "timeout" if isinstance(e, asyncio.TimeoutError) else "connection"
+            errors.setdefault(name, {}).setdefault(kind, 0)
+            errors[name][kind] += 1
+            if conn is not None:
+                conn[1].close()
+            conn = None
+            await asyncio.sleep(0.01)
+            continue
+        if 200 <= status < 300:
+            samples.setdefault(name, []).append(time.perf_counter() - started)
+        else:
+            errors.setdefault(name, {}).setdefault(str(status), 0)
+            errors[name][str(status)] += 1
+    if conn is not None:
+        conn[1].close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+    }
+    for q in PERCENTILES:
+        value = percentile(latencies, q)
+        summary[f"p{q}_ms"] = round(value * 1000, 2) if value is not None else None
+    return summary
+
+
+async def generate_load(port, weights, settings, concurrency, duration, seed):
+    samples, errors = {}, {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(
+        *(
+            client_loop(port, random.Random(seed * 1000003 + i), weights, settings, deadline, samples, errors)
+            for i in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    everything = [latency for values in samples.values() for latency in values]
+    all_errors = {}
+    for per_scenario in errors.values():
+        for kind, count in per_scenario.items():
+            all_errors[kind] = all_errors.get(kind, 0) + count
+    return {
+        "concurrency": concurrency,
+        **summarize(everything, all_errors, elapsed),
+        "scenarios": {
+            name: summarize(samples.get(name, []), errors.get(name, {}), elapsed)
+            for name in weights
+        },
+    }
+
+
+async def login(port, email):
+    conn, status, body = await send(port, None, encode_request(port, "/auth/login", {"email": email, "password": PASSWORD}))
+    if conn is not None:
+        conn[1].close()
+    if status != 200:
+        raise RuntimeError(f"Login failed with {status}: {body[:200]!r}")
+    return json.loads(body)["access_token"]
+
+
+# -------------------------------------------------------------------------------
+# ORCHESTRATION
+# -------------------------------------------------------------------------------
+def free_ports(count):
+    sockets = [socket.socket() for _ in range(count)]
+    for s in sockets:
+        s.bind(("127.0.0.1", 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def wait_for_port(port, process):
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited early with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing listening on port {port} after {STARTUP_TIMEOUT}s")
+
+
+def spawn(*args, verbose=False):
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), *args],
+        cwd=SERVER_DIR,
+        stdout=output,
+        stderr=output,
+    )
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def provider_values(items, default):
+    """
+    Parses ["0.05", "spotify=0.2"] into a value per provider: a bare number
+    applies to every provider, provider=value overrides one.
+    """
+    values = dict.fromkeys(PROVIDERS, default)
+    for item in items or []:
+        name, sep, value = item.rpartition("=")
+        if not sep:
+            values = dict.fromkeys(PROVIDERS, float(value))
+        elif name in PROVIDERS:
+            values[name] = float(value)
+        else:
+            raise SystemExit(f"Unknown provider {name!r}; choose from {', '.join(PROVIDERS)}")
+    return values
+
+
+def run_suite(args):
+    weights = mix_weights(args.mix)
+    latency = provider_values(args.latency, 0.0)
+    jitter = provider_values(args.jitter, 0.0)
+    rate_limits = provider_values(args.rate_limit, 0.0)
+    stub_port, app_port = free_ports(2)
+
+    stubs = spawn(
+        "--serve-stubs", "--port", str(stub_port),
+        "--latency", *[f"{p}={v}" for p, v in latency.items()],
+        "--jitter", *[f"{p}={v}" for p, v in jitter.items()],
+        "--rate-limit", *[f"{p}={v}" for p, v in rate_limits.items()],
+    )
+    app = None
+    try:
+        wait_for_port(stub_port, stubs)
+        app = spawn(
+            "--serve-app", "--port", str(app_port), "--stub-url", f"http://127.0.0.1:{stub_port}",
+            "--users", str(args.users), verbose=args.verbose,
+        )
+        wait_for_port(app_port, app)
+        settings = {
+            "users": args.users,
+            "playlists": args.playlists,
+            "token": asyncio.run(login(app_port, user_email(0))),
+        }
+        if args.warmup:
+            asyncio.run(generate_load(app_port, weights, settings, max(args.concurrency), args.warmup, args.seed - 1))
+        runs = []
+        for concurrency in args.concurrency:
+            result = asyncio.run(generate_load(app_port, weights, settings, concurrency, args.duration, args.seed))
+            runs.append(result)
+            print(
+                f"c={concurrency:<4} {result['throughput_rps']:>8} req/s  "
+                f"p50={result['p50_ms']}ms  p95={result['p95_ms']}ms  p99={result['p99_ms']}ms  "
+                f"errors={sum(result['errors'].values())}",
+                flush=True,
+            )
+            for name, summary in result["scenarios"].items():
+                print(
+                    f"    {name:<18} {summary['requests']:>6} ok  p50={summary['p50_ms']}ms  "
+                    f"p95={summary['p95_ms']}ms  p99={summary['p99_ms']}ms  errors={summary['errors'] or 0}",
+                    flush=True,
+                )
+    finally:
+        if app is not None:
+            stop(app)
+        stop(stubs)
+
+    commit, dirty = git_revision()
+    return {
+        "version": REPORT_VERSION,
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created_at": DT.datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "server": "werkzeug-threaded",
+        },
+        "config": {
+            "mix": args.mix,
+            "weights": weights,
+            "seed": args.seed,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "users": args.users,
+            "playlists": args.playlists,
+            "latency": latency,
+            "jitter": jitter,
+            "rate_limit": rate_limits,
+        },
+        "runs": runs,
+    }
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return round((new - old) / old * 100, 1)
+
+
+def compare(baseline, report, max_regression=None):
+    """
+    Prints the change from `baseline` per concurrency level and scenario and
+    returns the regressions larger than `max_regression` percent (slower
+    p95 or lower throughput).
+    """
+    if baseline.get("config", {}) != report["config"]:
+        print("warning: baseline was recorded with a different configuration", flush=True)
+    print(f"vs {baseline['meta'].get('commit') or 'baseline'}:")
+    regressions = []
+    old_runs = {run["concurrency"]: run for run in baseline.get("runs", [])}
+    for run in report["runs"]:
+        old_run = old_runs.get(run["concurrency"])
+        if old_run is None:
+            continue
+        rows = [("all", old_run, run)] + [
+            (name, old_run["scenarios"].get(name), summary)
+            for name, summary in run["scenarios"].items()
+        ]
+        for name, old, new in rows:
+            if not old:
+                continue
+            deltas = {key: change(old.get(key), new.get(key)) for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")}
+            columns = "  ".join(f"{key}={'n/a' if d is None else f'{d:+.1f}%'}" for key, d in deltas.items())
+            print(f"  c={run['concurrency']:<4} {name:<18} {columns}", flush=True)
+            if max_regression is None:
+                continue
+            if deltas["p95_ms"] is not None and deltas["p95_ms"] > max_regression:
+                regressions.append(f"c={run['concurrency']} {name} p95 {deltas['p95_ms']:+.1f}%")
+            if deltas["throughput_rps"] is not None and -deltas["throughput_rps"] > max_regression:
+                regressions.append(f"c={run['concurrency']} {name} throughput {deltas['throughput_rps']:+.1f}%")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the app against local provider stubs")
+    parser.add_argument("--mix", default="realistic",
+                        help=f"request mix: {', '.join(MIXES)} or a single scenario ({', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unmeasured load before the first level")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--users", type=int, default=50, help="seeded users with every app linked")
+    parser.add_argument("--playlists", type=int, default=200,
+                        help="distinct playlist ids requested; fewer means more cache hits")
+    parser.add_argument("--latency", nargs="+", metavar="[PROVIDER=]SECONDS",
+                        help="stub response delay, e.g. 0.05 spotify=0.2")
+    parser.add_argument("--jitter", nargs="+", metavar="[PROVIDER=]SECONDS",
+                        help="uniform +/- jitter added to the stub delay")
+    parser.add_argument("--rate-limit", nargs="+", metavar="[PROVIDER=]RPS",
+                        help="stub requests per second before answering 429 (0 = unlimited)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="with --compare, exit 1 if p95 or throughput regresses by more than this percent")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    # Internal: subprocess roles.
+    parser.add_argument("--serve-stubs", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--serve-app", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.serve_stubs:
+        run_stubs(
+            args.port,
+            provider_values(args.latency, 0.0),
+            provider_values(args.jitter, 0.0),
+            provider_values(args.rate_limit, 0.0),
+        )
+        return
+    if args.serve_app:
+        run_app(args.port, args.stub_url, args.users)
+        return
+
+    report = run_suite(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.max_regression)
+        if regressions:
+            print("Regressions over threshold:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the pure-Python helpers on hot request paths, with
+stored baselines and a regression threshold.
+
+Per-call times depend on the machine, so every case is also expressed as
+a score: its time divided by the time of a fixed pure-Python calibration
+loop measured alongside it. Baselines store scores, and a case fails
+when its score exceeds the baseline by more than the threshold, which
+keeps baselines recorded on one machine usable on another.
+
+    python benchmarks/micro.py                 # compare against the baseline
+    python benchmarks/micro.py --save          # record a new baseline
+    python -m pytest benchmarks/bench_micro.py # same check, one test per case
+
+MICRO_BENCH_THRESHOLD (percent, default 25) sets the threshold for pytest.
+"""
+
+import argparse
+import datetime as DT
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from benchmarks.environment import prepare_environment  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, "baselines", "micro.json")
+DEFAULT_THRESHOLD = 25.0  # percent
+REPEAT = 20
+ROUNDS = 3  # best-scoring of this many measurements is kept
+BATCH_TIME = 0.02  # seconds per batch
+
+
+def _calibration():
+    total = 0
+    for i in range(1000):
+        total += i * i % 7
+    return total
+
+
+# -------------------------------------------------------------------------------
+# CASES
+# -------------------------------------------------------------------------------
+# Each factory imports its target lazily and returns a zero-argument callable,
+# so running one case does not pay for importing torch.
+def _uncached_durations():
+    from util.playlist import SCHEDULE_CACHE_SIZE
+    from util.utils import ms2FormattedDuration
+
+    # More distinct durations (10 min to 5.7 h, 2 s apart) than the schedule
+    # caches hold, cycled in order, so every call misses them and times the
+    # scheduler itself.
+    count = 2 * SCHEDULE_CACHE_SIZE + 1
+    return itertools.cycle([ms2FormattedDuration(600000 + 2000 * i) for i in range(count)])
+
+
+def _pomodoro_playlist():
+    from util.playlist import optimized_pomodoro_playlist
+
+    durations = _uncached_durations()
+    return lambda: optimized_pomodoro_playlist(next(durations))
+
+
+def _pomodoro_playlist_code_format():
+    from util.playlist import optimized_pomodoro_playlist
+
+    durations = _uncached_durations()
+    return lambda: optimized_pomodoro_playlist(next(durations), code_format=True)
+
+
+def _pomodoro_playlist_cached():
+    from util.playlist import optimized_pomodoro_playlist
+
+    return lambda: optimized_pomodoro_playlist("115:00")
+
+
+def _pomodoro_playlists_library():
+    from util.playlist import optimized_pomodoro_playlists
+    from util.utils import ms2FormattedDuration
+
+    # A 500-playlist library, 10 to 260 minutes long.
+    durations = [ms2FormattedDuration(600000 + 30011 * i) for i in range(500)]
+    return lambda: optimized_pomodoro_playlists(durations)
+
+
+def _exact_schedule(catalogue=None):
+    from util.playlist import DEFAULT_CATALOGUE, search_schedule
+
+    catalogue = catalogue or DEFAULT_CATALOGUE
+    # Uncached, a different duration every call.
+    durations = itertools.cycle([m + 0.5 for m in range(15, 360, 7)])
+    return lambda: search_schedule(next(durations), catalogue)
+
+
+def _exact_schedule_large_catalogue():
+    from util.playlist import DEFAULT_CATALOGUE
+
+    # 30 patterns: the defaults, 1-8 work sessions with a long break, and
+    # repeated blocks of them.
+    catalogue = DEFAULT_CATALOGUE + tuple("WS" * n + "WL" for n in range(8)) + tuple(
+        f"{k}×{'WS' * n}WL" for k in (2, 3, 4) for n in range(1, 6)
+    ) + ("WSW+WSW", "WSWL+WSW")
+    return _exact_schedule(catalogue)
+
+
+def _iso_duration():
+    from util.youtube import iso_duration_to_milliseconds
+
+    return lambda: iso_duration_to_milliseconds("PT1H4M13S")
+
+
+def _ms_to_formatted():
+    from util.utils import ms2FormattedDuration
+
+    return lambda: ms2FormattedDuration(7384512)
+
+
+def _obfuscate():
+    from util.utils import obfuscate
+
+    return lambda: obfuscate("spotify")
+
+
+def _json_safe_profile():
+    from util.bind_apps import _json_safe
+
+    # Shaped like the linked-app profile payloads /apps/get_all_apps_binding
+    # passes through _json_safe.
+    now = DT.datetime(2025, 1, 1, 12, 0, 0)
+    profile = {
+        "display_name": "Stub User",
+        "followers": {"href": None, "total": 12},
+        "images": [{"url": f"https://example.invalid/{i}.jpg", "height": 300, "width": 300} for i in range(3)],
+        "scopes": {"playlist-read-private", "user-read-email", "user-top-read"},
+        "connected_at": now,
+        "token_expires_at": now.date(),
+        "playlists": [
+            {"id": f"p{i}", "name": f"Playlist {i}", "tracks": (i, i * 2), "updated": now}
+            for i in range(10)
+        ],
+    }
+    return lambda: _json_safe(profile)
+
+
+def _model_predict():
+    from models.use_model import predict
+
+    return lambda: predict(115.0)
+
+
+def _model_predict_many():
+    from models.use_model import predict_many
+
+    durations = [15.0 + 2.5 * i for i in range(64)]
+    return lambda: predict_many(durations)
+
+
+CASES = {
+    "playlist.optimized_pomodoro_playlist": _pomodoro_playlist,
+    "playlist.optimized_pomodoro_playlist[code_format]": _pomodoro_playlist_code_format,
+    "playlist.optimized_pomodoro_playlist[cached]": _pomodoro_playlist_cached,
+    "playlist.optimized_pomodoro_playlists[500]": _pomodoro_playlists_library,
+    "playlist.search_schedule": _exact_schedule,
+    "playlist.search_schedule[catalogue=30]": _exact_schedule_large_catalogue,
+    "youtube.iso_duration_to_milliseconds": _iso_duration,
+    "utils.ms2FormattedDuration": _ms_to_formatted,
+    "utils.obfuscate": _obfuscate,
+    "bind_apps._json_safe": _json_safe_profile,
+    "use_model.predict": _model_predict,
+    "use_model.predict_many[64]": _model_predict_many,
+}
+
+
+# -------------------------------------------------------------------------------
+# MEASUREMENT
+# -------------------------------------------------------------------------------
+def _batch_size(timer, batch_time: float) -> int:
+    number, elapsed = timer.autorange()
+    return max(1, int(number * batch_time / elapsed))
+
+
+def measure(fn, repeat: int = REPEAT, batch_time: float = BATCH_TIME) -> dict:
+    """
+    Times `fn` in `repeat` batches of about `batch_time` seconds each,
+    interleaved with batches of the calibration loop so both see the same
+    machine load, and returns per-call best and median times in nanoseconds
+    plus the score. Best batches are the least disturbed by the rest of the
+    machine, so they are what gets compared.
+    """
+    timer, calibration = timeit.Timer(fn), timeit.Timer(_calibration)
+    number = _batch_size(timer, batch_time)
+    calibration_number = _batch_size(calibration, batch_time)
+    per_call, calibration_per_call = [], []
+    for _ in range(repeat):
+        calibration_per_call.append(calibration.timeit(calibration_number) / calibration_number * 1e9)
+        per_call.append(timer.timeit(number) / number * 1e9)
+    return {
+        "calls": number,
+        "best_ns": round(min(per_call), 1),
+        "median_ns": round(statistics.median(per_call), 1),
+        "calibration_ns": round(min(calibration_per_call), 1),
+        "score": round(min(per_call) / min(calibration_per_call), 4),
+    }
+
+
+def run_case(name: str, rounds: int = ROUNDS) -> dict:
+    fn = CASES[name]()
+    return min((measure(fn) for _ in range(rounds)), key=lambda result: result["score"])
+
+
+def check(name: str, result: dict, baseline: dict, threshold: float):
+    """
+    Returns (ok, change in percent) against the stored baseline, or
+    (True, None) when the case has no baseline yet.
+    """
+    stored = baseline.get("cases", {}).get(name)
+    if not stored:
+        return True, None
+    delta = (result["score"] - stored["score"]) / stored["score"] * 100
+    return delta <= threshold, round(delta, 1)
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results: dict, path: str = BASELINE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    baseline = {
+        "meta": {
+            "created_at": DT.datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "cases": {
+            name: {"score": result["score"], "best_ns": result["best_ns"], "calibration_ns": result["calibration_ns"]}
+            for name, result in sorted(results.items())
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for hot helper functions")
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed score increase over the baseline, in percent")
+    parser.add_argument("--case", nargs="+", help="only run cases whose name contains one of these")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    prepare_environment()
+    names = [n for n in CASES if not args.case or any(c in n for c in args.case)]
+    baseline = load_baseline(args.baseline)
+    results, failures = {}, []
+    for name in names:
+        result = results[name] = run_case(name)
+        ok, delta = check(name, result, baseline, args.threshold)
+        change = "no baseline" if delta is None else f"{delta:+.1f}%"
+        if not ok:
+            change += "  REGRESSION"
+        print(f"{name:<52} {result['best_ns']:>12.0f} ns  score={result['score']:<10} {change}", flush=True)
+        if not ok:
+            failures.append(name)
+    if args.save:
+        if args.case:
+            # Keep the cases that were not re-run.
+            merged = {n: c for n, c in baseline.get("cases", {}).items()}
+            merged.update(results)
+            results = merged
+        save_baseline(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+    elif failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Compares the PomodoroNet inference engines (eager torch, TorchScript,
+ONNX Runtime, NumPy) on startup cost, memory and latency. Each engine runs
+in a fresh interpreter so import time and peak RSS are its own:
+
+    python benchmarks/ml_engines.py
+    python benchmarks/ml_engines.py --engine torchscript numpy --batch 1 64 512 --threads 1
+
+Reported per engine: seconds to import models.use_model (model loading and
+warm-up included), peak RSS of the process after that, the latency of the
+first call after import, and the best per-call latency of predict_many at
+each batch size. Engines whose runtime is not installed are reported as
+unavailable.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from benchmarks.environment import prepare_environment  # noqa: E402
+
+ENGINES = ("torch", "torchscript", "onnx", "numpy")
+BATCH_SIZES = (1, 64)
+REPEAT = 7
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_engine(engine: str, batch_sizes) -> dict:
+    """
+    Runs in the child process: loads `engine` and times it. ML_NUM_THREADS
+    and ML_WARM_UP come from the parent.
+    """
+    os.environ["ML_ENGINE"] = engine
+    prepare_environment()
+    from config.config import settings  # noqa: F401  (settings are not part of the engine's cost)
+
+    baseline_rss = _rss_mb()
+    started = time.perf_counter()
+    from models.use_model import predict_many
+
+    import_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    predict_many([115.0])
+    first_call = (time.perf_counter() - started) * 1e6
+    latency = {}
+    for size in batch_sizes:
+        durations = [15.0 + 300.0 * i / size for i in range(size)]
+        timer = timeit.Timer(lambda: predict_many(durations))
+        number, _ = timer.autorange()
+        latency[size] = min(timer.repeat(REPEAT, number)) / number * 1e6
+    return {
+        "engine": engine,
+        "import_s": round(import_seconds, 3),
+        "rss_mb": round(_rss_mb(), 1),
+        "rss_added_mb": round(_rss_mb() - baseline_rss, 1),
+        "first_call_us": round(first_call, 1),
+        "latency_us": {str(size): round(us, 1) for size, us in latency.items()},
+        "torch_imported": "torch" in sys.modules,
+    }
+
+
+def run_engine(engine: str, batch_sizes, threads: int, warm_up: bool) -> dict:
+    """
+    Measures `engine` in a child process; returns None and prints why when
+    the engine cannot load (e.g. onnxruntime is not installed).
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--engine", engine,
+               "--batch", *map(str, batch_sizes)]
+    env = dict(os.environ, ML_NUM_THREADS=str(threads), ML_WARM_UP=str(warm_up))
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+        print(f"{engine:<12} unavailable: {error}", flush=True)
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare PomodoroNet inference engines")
+    parser.add_argument("--engine", nargs="+", default=list(ENGINES), choices=ENGINES)
+    parser.add_argument("--batch", nargs="+", type=int, default=list(BATCH_SIZES))
+    parser.add_argument("--threads", type=int, default=0,
+                        help="inference threads per process (0: as in production, CPUs / WEB_CONCURRENCY)")
+    parser.add_argument("--no-warm-up", action="store_true", help="skip the startup warm-up inferences")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(measure_engine(args.engine[0], args.batch)))
+        return
+    header = f"{'engine':<12} {'import s':>9} {'peak RSS MB':>12} {'added MB':>9} {'torch':>6} {'first us':>9}"
+    print(header + "".join(f" {f'batch {size} us':>14}" for size in args.batch))
+    for engine in args.engine:
+        result = run_engine(engine, args.batch, args.threads, not args.no_warm_up)
+        if result is None:
+            continue
+        row = (f"{engine:<12} {result['import_s']:>9.3f} {result['rss_mb']:>12.1f} "
+               f"{result['rss_added_mb']:>9.1f} {str(result['torch_imported']):>6} {result['first_call_us']:>9.1f}")
+        print(row + "".join(f" {result['latency_us'][str(size)]:>14.1f}" for size in args.batch), flush=True)
+
+
+if __name__ == "__main__":
+    main()
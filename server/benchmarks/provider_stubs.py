@@ -0,0 +1,285 @@
+"""
+Local stand-ins for the Spotify, Google/YouTube, Apple Music and Musixmatch
+APIs, for load testing without network access or provider quotas.
+
+One HTTP server answers for every provider. The app under test reaches it
+through `redirect_outbound_calls`, which rewrites
+"https://api.spotify.com/v1/me" to "<stub>/api.spotify.com/v1/me", so the
+first path segment is always the provider host the app meant to call.
+
+Responses are deterministic per playlist id, so two runs against the same
+commit do the same amount of work. Each provider can be given a latency
+and a rate limit; requests over the limit get 429 with Retry-After.
+
+Tests skip the server and answer calls in-process with `stub_send`.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import requests
+
+# Host -> provider name used by --latency/--rate-limit overrides.
+PROVIDER_HOSTS = {
+    "accounts.spotify.com": "spotify",
+    "api.spotify.com": "spotify",
+    "oauth2.googleapis.com": "google",
+    "www.googleapis.com": "google",
+    "api.music.apple.com": "apple",
+    "api.musixmatch.com": "musixmatch",
+}
+PROVIDERS = ("spotify", "google", "apple", "musixmatch")
+
+PAGE_SIZE = 50
+MIN_TRACKS = 10
+MAX_TRACKS = 120
+USER_PLAYLISTS = 20
+
+
+def tracks_in(playlist_id: str) -> int:
+    """
+    Stable track count for a playlist id, identical across processes
+    (unlike hash(), which is salted per interpreter).
+    """
+    digest = hashlib.sha1(playlist_id.encode("utf-8")).digest()
+    return MIN_TRACKS + int.from_bytes(digest[:4], "big") % (MAX_TRACKS - MIN_TRACKS)
+
+
+def track_duration_ms(playlist_id: str, index: int) -> int:
+    digest = hashlib.sha1(f"{playlist_id}:{index}".encode("utf-8")).digest()
+    return 120000 + int.from_bytes(digest[:4], "big") % 240000
+
+
+def iso_duration(ms: int) -> str:
+    seconds = ms // 1000
+    return f"PT{seconds // 60}M{seconds % 60}S"
+
+
+class RateLimiter:
+    """
+    Token bucket per provider; `rate` requests per second with a burst of
+    one second's worth. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+# -------------------------------------------------------------------------------
+# PROVIDER RESPONSES
+# -------------------------------------------------------------------------------
+def spotify(method, path, query):
+    if path == "/api/token":
+        return 200, {"access_token": "stub-spotify-token", "token_type": "Bearer", "expires_in": 3600}
+    if path == "/v1/me" or path.startswith("/v1/users/"):
+        return 200, {"id": "stub-user", "display_name": "Stub User", "images": [], "followers": {"total": 0}}
+    offset = int(query.get("offset", ["0"])[0])
+    if path == "/v1/me/playlists":
+        items = [
+            {
+                "id": f"sp{i}",
+                "name": f"Playlist {i}",
+                "images": [{"url": f"https://example.invalid/sp{i}.jpg"}],
+                "owner": {"id": "stub-user", "display_name": "Stub User"},
+                "tracks": {"total": tracks_in(f"sp{i}")},
+            }
+            for i in range(offset, min(offset + PAGE_SIZE, USER_PLAYLISTS))
+        ]
+        return 200, {"items": items, "total": USER_PLAYLISTS}
+    if path.startswith("/v1/playlists/") and path.endswith("/tracks"):
+        playlist_id = path.split("/")[3]
+        total = tracks_in(playlist_id)
+        items = [
+            {"track": {"id": f"{playlist_id}-{i}", "duration_ms": track_duration_ms(playlist_id, i)}}
+            for i in range(offset, min(offset + PAGE_SIZE, total))
+        ]
+        return 200, {"items": items, "total": total}
+    return 404, {"error": {"status": 404, "message": "Not found"}}
+
+
+def google(method, path, query):
+    if path == "/token":
+        return 200, {"access_token": "stub-google-token", "expires_in": 3600}
+    if path == "/oauth2/v1/userinfo":
+        return 200, {"id": "stub-google-user", "email": "stub@example.com", "name": "Stub User"}
+    if path == "/youtube/v3/playlists":
+        items = [
+            {"id": f"yt{i}", "snippet": {"title": f"Playlist {i}", "channelId": "stub-channel"}}
+            for i in range(int(query.get("maxResults", ["5"])[0]))
+        ]
+        return 200, {"items": items}
+    if path == "/youtube/v3/channels":
+        thumbnails = {"high": {"url": "https://example.invalid/channel.jpg"}}
+        return 200, {"items": [{"id": "stub-channel", "snippet": {"thumbnails": thumbnails}}]}
+    if path == "/youtube/v3/playlistItems":
+        playlist_id = query.get("playlistId", [""])[0]
+        total = tracks_in(playlist_id)
+        start = int(query.get("pageToken", ["0"])[0])
+        end = min(start + PAGE_SIZE, total)
+        body = {
+            "items": [
+                {"snippet": {"resourceId": {"videoId": f"{playlist_id}-{i}"}}}
+                for i in range(start, end)
+            ]
+        }
+        if end < total:
+            body["nextPageToken"] = str(end)
+        return 200, body
+    if path == "/youtube/v3/videos":
+        video_ids = [v for v in query.get("id", [""])[0].split(",") if v]
+        items = []
+        for video_id in video_ids:
+            playlist_id, _, index = video_id.rpartition("-")
+            items.append(
+                {
+                    "id": video_id,
+                    "snippet": {
+                        "title": f"Video {video_id}",
+                        "channelTitle": "Stub Channel",
+                        "thumbnails": {"standard": {"url": "https://example.invalid/video.jpg"}},
+                    },
+                    "contentDetails": {"duration": iso_duration(track_duration_ms(playlist_id, int(index or 0)))},
+                }
+            )
+        return 200, {"items": items}
+    return 404, {"error": {"code": 404, "message": "Not found"}}
+
+
+def apple(method, path, query):
+    if path == "/v1/me/library/playlists":
+        playlists = [{"id": f"p.ap{i}", "attributes": {"name": f"Playlist {i}"}} for i in range(USER_PLAYLISTS)]
+        return 200, {"data": playlists}
+    if path.startswith("/v1/me/library/") and path.endswith("/tracks"):
+        container_id = path.split("/")[5]
+        tracks = [
+            {"id": f"i.{container_id}-{i}", "attributes": {"name": f"Track {i}",
+                                                           "durationInMillis": track_duration_ms(container_id, i)}}
+            for i in range(tracks_in(container_id))
+        ]
+        return 200, {"data": tracks}
+    if path == "/v1/me/library/albums":
+        return 200, {"data": [{"id": f"l.al{i}", "attributes": {"name": f"Album {i}"}} for i in range(10)]}
+    return 404, {"errors": [{"status": "404", "title": "Not Found"}]}
+
+
+def musixmatch(method, path, query):
+    if path == "/ws/1.1/matcher.lyrics.get":
+        lyrics = {"lyrics_body": "Stub lyrics\n" * 20, "lyrics_language": "en"}
+        return 200, {"message": {"header": {"status_code": 200}, "body": {"lyrics": lyrics}}}
+    return 404, {"message": {"header": {"status_code": 404}}}
+
+
+HANDLERS = {"spotify": spotify, "google": google, "apple": apple, "musixmatch": musixmatch}
+
+
+# -------------------------------------------------------------------------------
+# SERVER
+# -------------------------------------------------------------------------------
+class ProviderStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = {}  # provider -> (seconds, jitter seconds)
+    limiters = {}  # provider -> RateLimiter
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_any(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        url = urlsplit(self.path)
+        host, _, path = url.path.lstrip("/").partition("/")
+        provider = PROVIDER_HOSTS.get(host)
+        if provider is None:
+            return self.respond(404, {"error": f"Unknown provider host {host!r}"})
+        if not self.limiters[provider].allow():
+            return self.respond(429, {"error": "rate limited"}, {"Retry-After": "1"})
+        delay, jitter = self.latency[provider]
+        if delay or jitter:
+            time.sleep(max(0.0, delay + random.uniform(-jitter, jitter)))
+        status, body = HANDLERS[provider](self.command, "/" + path, parse_qs(url.query))
+        self.respond(status, body)
+
+    def respond(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = handle_any
+
+
+def serve_provider_stubs(port, latency, jitter, rate_limits, host="127.0.0.1"):
+    """
+    Serves every provider on one port until the process is killed.
+    `latency`, `jitter` and `rate_limits` map provider name to a value.
+    """
+    ProviderStubHandler.latency = {p: (latency[p], jitter[p]) for p in PROVIDERS}
+    ProviderStubHandler.limiters = {p: RateLimiter(rate_limits[p]) for p in PROVIDERS}
+    server = ThreadingHTTPServer((host, port), ProviderStubHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.serve_forever()
+
+
+def redirect_outbound_calls(stub_base_url: str):
+    """
+    Sends every outbound call for a known provider host to the stub server.
+
+    Patches the transport adapter rather than Session.request so the
+    outbound metrics still see, and label by, the real provider URL.
+    """
+    adapter_send = requests.adapters.HTTPAdapter.send
+
+    def send(self, request, *args, **kwargs):
+        url = urlsplit(request.url)
+        if url.hostname in PROVIDER_HOSTS:
+            rewritten = f"{stub_base_url}/{url.hostname}{url.path}"
+            request.url = rewritten + (f"?{url.query}" if url.query else "")
+        return adapter_send(self, request, *args, **kwargs)
+
+    requests.adapters.HTTPAdapter.send = send
+
+
+def stub_send(adapter, request, *args, **kwargs):
+    """
+    Drop-in for requests.adapters.HTTPAdapter.send that answers provider
+    calls in-process from the same handlers, without latency or rate
+    limits. Calls to any other host fail as if there were no network.
+    """
+    url = urlsplit(request.url)
+    provider = PROVIDER_HOSTS.get(url.hostname)
+    if provider is None:
+        raise requests.ConnectionError(f"No provider stub for {url.hostname!r}", request=request)
+    status, body = HANDLERS[provider](request.method, url.path, parse_qs(url.query))
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode("utf-8")
+    response.headers["Content-Type"] = "application/json"
+    response.encoding = "utf-8"
+    response.url = request.url
+    response.request = request
+    return response
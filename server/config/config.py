@@ -20,6 +20,41 @@ class Settings(BaseSettings):
     SECRET_KEY: str = Field(default_factory=lambda: secrets.token_hex(16))
     apple_developer_token: str = Field(..., env="APPLE_DEVELOPER_TOKEN")
     firebase_json: str = Field(..., env="FIREBASE_CC_JSON")
+    # "gui": CmdGUI terminal rendering + console logs (local development)
+    # "console": console + file logs, no CmdGUI rendering
+    # "quiet": file logs only, no terminal output at all (production)
+    output_mode: str = Field(default="console", env="OUTPUT_MODE")
+    # Comma-separated URL rules to cProfile, keeping the slowest N per route
+    profile_routes: str = Field(default="", env="PROFILE_ROUTES")
+    profile_slowest_n: int = Field(default=5, env="PROFILE_SLOWEST_N")
+    # SQLite file shared by all workers for /error_stats
+    error_stats_db: str = Field(default="logs/error_stats.sqlite3", env="ERROR_STATS_DB")
+    # Cache-Control max-age (seconds) for /static files such as swagger.json,
+    # so the load balancer response cache and browsers can reuse them
+    static_max_age: int = Field(default=300, env="STATIC_MAX_AGE")
+    # /ml/predict runs predictions arriving within this many milliseconds of
+    # each other as one forward pass, up to ML_MAX_BATCH_SIZE; a lone
+    # prediction runs at once. 0 disables: sync workers serve one request
+    # at a time, so only threaded or async workers have anything to batch
+    ml_batch_window_ms: float = Field(default=0.0, env="ML_BATCH_WINDOW_MS")
+    ml_max_batch_size: int = Field(default=64, env="ML_MAX_BATCH_SIZE")
+    # Serve /ml/predict for whole-second durations from this precomputed
+    # table (models/lookup_table.py), building it at startup if missing
+    ml_lookup_table: str = Field(default="", env="ML_LOOKUP_TABLE")
+    # PomodoroNet runtime: "torch" (eager), "torchscript", "onnx", or "numpy"
+    # to skip importing torch (always used when torch is not installed)
+    ml_engine: str = Field(default="torch", env="ML_ENGINE")
+    # Inference threads per worker; 0 shares the CPUs between the workers
+    ml_num_threads: int = Field(default=0, env="ML_NUM_THREADS")
+    # Run a few inferences at startup so first requests skip lazy setup
+    ml_warm_up: bool = Field(default=True, env="ML_WARM_UP")
+    # /ml/schedule asks the model once per bucket of this many seconds, and
+    # keeps its verdict for at most ML_SCHEDULE_CACHE_SIZE buckets per worker
+    ml_schedule_bucket_seconds: int = Field(default=60, env="ML_SCHEDULE_BUCKET_SECONDS")
+    ml_schedule_cache_size: int = Field(default=4096, env="ML_SCHEDULE_CACHE_SIZE")
+    # Minutes of extra loss over the heuristic schedule the model's pattern,
+    # fitted to the duration, may have and still replace it
+    ml_schedule_tolerance: float = Field(default=0.0, env="ML_SCHEDULE_TOLERANCE")
 
     class Config:
         env_file = ".env"
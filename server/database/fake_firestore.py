@@ -0,0 +1,575 @@
+# fake_firestore.py
+
+"""
+In-memory stand-in for the subset of the Firestore client API that
+database.firebase_operations uses: collections, chained where(FieldFilter)
+queries, stream/get, get_all, add, document().get/set/update/delete, write batches
+and @firestore.transactional transactions with optimistic concurrency.
+
+Every round trip the real client would make is counted per kind ("read",
+"write", "transaction") together with the documents read and written, and
+can be delayed by a configurable latency per kind, so tests can assert how
+many round trips an endpoint makes and benchmarks can model a remote
+database.
+
+The test suite (tests/conftest.py) and the load suite and micro-benchmarks
+in benchmarks/ boot the app on it; the app itself never imports it.
+"""
+
+import copy
+import datetime as DT
+import itertools
+import threading
+import time
+import uuid
+from collections import Counter
+from google.api_core import exceptions
+from google.cloud.firestore_v1.transforms import (
+    DELETE_FIELD,
+    SERVER_TIMESTAMP,
+    ArrayRemove,
+    ArrayUnion,
+    Increment,
+    Maximum,
+    Minimum,
+)
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+MAX_TRANSACTION_ATTEMPTS = 5
+# Round-trip kinds: queries and document gets, single-document writes, and
+# transaction begin/commit/rollback.
+ROUND_TRIP_KINDS = ("read", "write", "transaction")
+
+
+def _get_field(data: dict, field_path: str):
+    """
+    Resolves a dotted field path; raises KeyError when any segment is missing.
+    """
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(field_path)
+        value = value[part]
+    return value
+
+
+def _matches(data: dict, field_path: str, op: str, expected) -> bool:
+    try:
+        value = _get_field(data, field_path)
+    except KeyError:
+        return False
+    try:
+        if op == "==":
+            return value == expected
+        if op == "!=":
+            return value != expected
+        if op == "<":
+            return value < expected
+        if op == "<=":
+            return value <= expected
+        if op == ">":
+            return value > expected
+        if op == ">=":
+            return value >= expected
+        if op == "in":
+            return value in expected
+        if op == "not-in":
+            return value not in expected
+        if op == "array_contains":
+            return isinstance(value, list) and expected in value
+        if op == "array_contains_any":
+            return isinstance(value, list) and any(v in value for v in expected)
+    except TypeError:
+        # Firestore never matches values of different types in range filters.
+        return False
+    raise ValueError(f"Unsupported operator: {op!r}")
+
+
+def _apply_value(current, value):
+    """
+    Resolves field transforms (SERVER_TIMESTAMP, Increment, Maximum,
+    Minimum, ArrayUnion, ArrayRemove) against the stored value.
+    """
+    if value is SERVER_TIMESTAMP:
+        return DT.datetime.now(DT.timezone.utc)
+    if isinstance(value, Increment):
+        base = current if isinstance(current, (int, float)) else 0
+        return base + value.value
+    if isinstance(value, (Maximum, Minimum)):
+        if not isinstance(current, (int, float)):
+            return value.value
+        return max(current, value.value) if isinstance(value, Maximum) else min(current, value.value)
+    if isinstance(value, ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        result.extend(v for v in value.values if v not in result)
+        return result
+    if isinstance(value, ArrayRemove):
+        result = list(current) if isinstance(current, list) else []
+        return [v for v in result if v not in value.values]
+    if isinstance(value, dict):
+        base = current if isinstance(current, dict) else {}
+        return {k: _apply_value(base.get(k), v) for k, v in value.items() if v is not DELETE_FIELD}
+    return copy.deepcopy(value)
+
+
+def _merge(target: dict, updates: dict, dotted: bool):
+    """
+    Writes `updates` into `target` in place. With `dotted`, keys such as
+    "a.b" address nested fields, as in DocumentReference.update().
+    """
+    for key, value in updates.items():
+        parts = key.split(".") if dotted else [key]
+        node = target
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        leaf = parts[-1]
+        if value is DELETE_FIELD:
+            node.pop(leaf, None)
+        elif isinstance(value, dict) and not dotted and isinstance(node.get(leaf), dict):
+            _merge(node[leaf], value, dotted=False)
+        else:
+            node[leaf] = _apply_value(node.get(leaf), value)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        if self._data is None:
+            return None
+        return copy.deepcopy(_get_field(self._data, field_path))
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection_path: str, document_id: str):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection_path}/{self.id}"
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._client, self._collection_path)
+
+    def collection(self, name: str):
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None):
+        if transaction is not None:
+            return transaction.get(self)
+        return self._client._read(self)
+
+    def create(self, document_data: dict):
+        self._client._write(self, document_data, mode="create")
+
+    def set(self, document_data: dict, merge: bool = False):
+        self._client._write(self, document_data, mode="merge" if merge else "set")
+
+    def update(self, field_updates: dict):
+        self._client._write(self, field_updates, mode="update")
+
+    def delete(self):
+        self._client._write(self, None, mode="delete")
+
+    def __eq__(self, other):
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class FakeQuery:
+    def __init__(self, client, collection_path: str, filters=(), orders=(), limit=None):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+        }
+        state.update(changes)
+        return FakeQuery(self._client, self._collection_path, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int):
+        return self._copy(limit=count)
+
+    def stream(self, transaction=None):
+        if transaction is not None:
+            return iter(transaction.get(self))
+        return iter(self._client._query(self))
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+    def _select(self, documents: dict):
+        """
+        Applies filters, ordering and limit to {doc_id: data} and returns the
+        matching (doc_id, data) pairs.
+        """
+        rows = [
+            (doc_id, data)
+            for doc_id, data in documents.items()
+            if all(_matches(data, f, op, v) for f, op, v in self._filters)
+        ]
+        for field_path, direction in reversed(self._orders):
+            rows = [r for r in rows if _has_field(r[1], field_path)]
+            rows.sort(key=lambda r: _get_field(r[1], field_path), reverse=direction == DESCENDING)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+
+def _has_field(data: dict, field_path: str) -> bool:
+    try:
+        _get_field(data, field_path)
+    except KeyError:
+        return False
+    return True
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: str = None):
+        return FakeDocumentReference(self._client, self._collection_path, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data: dict, document_id: str = None):
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return DT.datetime.now(DT.timezone.utc), reference
+
+    def list_documents(self):
+        return [self.document(doc_id) for doc_id in self._client._documents(self._collection_path)]
+
+
+class FakeTransaction:
+    """
+    Buffers writes and validates at commit that every document read in the
+    transaction is unchanged, raising Aborted otherwise so that
+    @firestore.transactional retries, as the real client does.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, client, max_attempts: int = MAX_TRANSACTION_ATTEMPTS, read_only: bool = False):
+        self._client = client
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._reads = {}
+        self._writes = []
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def _begin(self, retry_id=None):
+        if self.in_progress:
+            raise ValueError("The transaction has already begun.")
+        self._client._round_trip("transaction")
+        self._id = next(self._ids)
+
+    def _clean_up(self):
+        self._id = None
+        self._reads = {}
+        self._writes = []
+
+    def _rollback(self):
+        if self.in_progress:
+            self._client._round_trip("transaction")
+        self._clean_up()
+
+    def _commit(self):
+        if not self.in_progress:
+            raise ValueError("The transaction has no transaction ID, so it cannot be committed.")
+        try:
+            self._client._commit(self._reads, self._writes)
+        finally:
+            self._clean_up()
+        return []
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, FakeDocumentReference):
+            snapshot = self._client._read(ref_or_query)
+            self._reads[ref_or_query.path] = snapshot.update_time
+            return snapshot
+        snapshots = self._client._query(ref_or_query)
+        for snapshot in snapshots:
+            self._reads[snapshot.reference.path] = snapshot.update_time
+        return snapshots
+
+    def get_all(self, references):
+        snapshots = self._client._read_all(references)
+        for snapshot in snapshots:
+            self._reads[snapshot.reference.path] = snapshot.update_time
+        return iter(snapshots)
+
+    def _add_write(self, reference, data, mode):
+        if self._read_only:
+            raise ValueError("Cannot perform write operation in read-only transaction.")
+        self._writes.append((reference, data, mode))
+
+    def create(self, reference, document_data: dict):
+        self._add_write(reference, document_data, "create")
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._add_write(reference, document_data, "merge" if merge else "set")
+
+    def update(self, reference, field_updates: dict):
+        self._add_write(reference, field_updates, "update")
+
+    def delete(self, reference):
+        self._add_write(reference, None, "delete")
+
+
+class FakeWriteBatch:
+    """
+    Buffers writes and applies them atomically in one commit round trip.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def create(self, reference, document_data: dict):
+        self._writes.append((reference, document_data, "create"))
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._writes.append((reference, document_data, "merge" if merge else "set"))
+
+    def update(self, reference, field_updates: dict):
+        self._writes.append((reference, field_updates, "update"))
+
+    def delete(self, reference):
+        self._writes.append((reference, None, "delete"))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._commit({}, writes, kind="write")
+        return []
+
+
+class FakeFirestoreClient:
+    """
+    Thread-safe in-memory document store. Documents live in
+    {collection_path: {doc_id: data}}; each write bumps a per-document
+    version used for transaction conflict detection.
+
+    `latency` maps a round-trip kind to the seconds each such round trip
+    sleeps, outside the store lock, like a network call would.
+    """
+
+    def __init__(self, latency: dict = None):
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._versions = {}
+        self._clock = itertools.count(1)
+        self.latency = dict.fromkeys(ROUND_TRIP_KINDS, 0.0)
+        self.set_latency(**(latency or {}))
+        self.round_trips = Counter()
+        self.documents_read = 0
+        self.documents_written = 0
+
+    # ---------------------------
+    # Client API
+    # ---------------------------
+
+    def collection(self, path: str):
+        return FakeCollectionReference(self, path)
+
+    def document(self, path: str):
+        collection_path, document_id = path.rsplit("/", 1)
+        return FakeDocumentReference(self, collection_path, document_id)
+
+    def transaction(self, max_attempts: int = MAX_TRANSACTION_ATTEMPTS, read_only: bool = False):
+        return FakeTransaction(self, max_attempts=max_attempts, read_only=read_only)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        if transaction is not None:
+            return transaction.get_all(references)
+        return iter(self._read_all(references))
+
+    def reset(self):
+        """
+        Drops every document and zeroes the counters; latency is kept.
+        """
+        with self._lock:
+            self._collections.clear()
+            self._versions.clear()
+        self.reset_counters()
+
+    # ---------------------------
+    # Latency and counters
+    # ---------------------------
+
+    def set_latency(self, **seconds):
+        for kind, value in seconds.items():
+            if kind not in ROUND_TRIP_KINDS:
+                raise ValueError(f"Unknown round-trip kind {kind!r}; choose from {ROUND_TRIP_KINDS}")
+            self.latency[kind] = float(value)
+
+    def reset_counters(self):
+        with self._lock:
+            self.round_trips = Counter()
+            self.documents_read = 0
+            self.documents_written = 0
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {
+                "round_trips": dict(self.round_trips),
+                "documents_read": self.documents_read,
+                "documents_written": self.documents_written,
+            }
+
+    def _round_trip(self, kind: str, read: int = 0, written: int = 0):
+        with self._lock:
+            self.round_trips[kind] += 1
+            self.documents_read += read
+            self.documents_written += written
+        if self.latency[kind]:
+            time.sleep(self.latency[kind])
+
+    # ---------------------------
+    # Storage
+    # ---------------------------
+
+    def _documents(self, collection_path: str) -> dict:
+        with self._lock:
+            documents = dict(self._collections.get(collection_path, {}))
+        self._round_trip("read", read=len(documents))
+        return documents
+
+    def _read(self, reference) -> FakeDocumentSnapshot:
+        self._round_trip("read", read=1)
+        with self._lock:
+            data = self._collections.get(reference._collection_path, {}).get(reference.id)
+            return FakeDocumentSnapshot(
+                reference, copy.deepcopy(data), self._versions.get(reference.path)
+            )
+
+    def _read_all(self, references) -> list:
+        references = list(references)
+        self._round_trip("read", read=len(references))
+        with self._lock:
+            return [
+                FakeDocumentSnapshot(
+                    reference,
+                    copy.deepcopy(self._collections.get(reference._collection_path, {}).get(reference.id)),
+                    self._versions.get(reference.path),
+                )
+                for reference in references
+            ]
+
+    def _query(self, query: FakeQuery) -> list:
+        with self._lock:
+            documents = self._collections.get(query._collection_path, {})
+            snapshots = [
+                FakeDocumentSnapshot(
+                    FakeDocumentReference(self, query._collection_path, doc_id),
+                    copy.deepcopy(data),
+                    self._versions.get(f"{query._collection_path}/{doc_id}"),
+                )
+                for doc_id, data in query._select(documents)
+            ]
+        # Firestore bills at least one read per query, even an empty one.
+        self._round_trip("read", read=max(1, len(snapshots)))
+        return snapshots
+
+    def _write(self, reference, data, mode: str):
+        self._round_trip("write", written=1)
+        with self._lock:
+            self._apply(reference, data, mode)
+
+    def _apply(self, reference, data, mode: str):
+        documents = self._collections.setdefault(reference._collection_path, {})
+        existing = documents.get(reference.id)
+        if mode == "create" and existing is not None:
+            raise exceptions.AlreadyExists(f"Document already exists: {reference.path}")
+        if mode == "update" and existing is None:
+            raise exceptions.NotFound(f"No document to update: {reference.path}")
+        if mode == "delete":
+            documents.pop(reference.id, None)
+            self._versions.pop(reference.path, None)
+            return
+        if mode in ("set", "create"):
+            new_data = {}
+            _merge(new_data, data, dotted=False)
+        else:
+            new_data = copy.deepcopy(existing) if existing is not None else {}
+            _merge(new_data, data, dotted=mode == "update")
+        documents[reference.id] = new_data
+        self._versions[reference.path] = next(self._clock)
+
+    def _commit(self, reads: dict, writes: list, kind: str = "transaction"):
+        self._round_trip(kind, written=len(writes))
+        with self._lock:
+            for path, version in reads.items():
+                if self._versions.get(path) != version:
+                    raise exceptions.Aborted(f"Transaction conflict on {path}")
+            for reference, _, mode in writes:
+                exists = reference.id in self._collections.get(reference._collection_path, {})
+                if mode == "create" and exists:
+                    raise exceptions.AlreadyExists(f"Document already exists: {reference.path}")
+                if mode == "update" and not exists:
+                    raise exceptions.NotFound(f"No document to update: {reference.path}")
+            for reference, data, mode in writes:
+                self._apply(reference, data, mode)
+
+
+def install_fake_firestore(client: FakeFirestoreClient = None) -> FakeFirestoreClient:
+    """
+    Makes firebase_admin hand out `client` (a new fake by default) without
+    reading credentials. Must run before database.firebase_operations is
+    first imported, since that module connects at import time.
+    """
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    client = client if client is not None else FakeFirestoreClient()
+    credentials.Certificate = lambda *args, **kwargs: None
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    firestore.client = lambda *args, **kwargs: client
+    return client
@@ -1,16 +1,28 @@
 # firebase_commands.py
 
 import datetime as DT
+from contextvars import ContextVar
+from functools import wraps
 from dateutil.parser import parse  # If using date parsing from strings
 import os
+import random
 import bcrypt
 from google.cloud.firestore_v1.base_query import FieldFilter
 from google.cloud.firestore_v1.collection import CollectionReference
-from google.cloud.firestore_v1.transforms import SERVER_TIMESTAMP
+from google.cloud.firestore_v1.transforms import (
+    DELETE_FIELD,
+    SERVER_TIMESTAMP,
+    ArrayUnion,
+    Increment,
+    Maximum,
+)
 from config.config import firebase_config
 from config.config import FirebaseConfig
 from firebase_admin import credentials, firestore
 import firebase_admin
+from util.tracing import timed
+from util.metrics import record_firestore_helper_call
+from util.logit import get_logger
 
 # You can import your alias_map from your configuration (for example, using Pydantic)
 # For demonstration, we define it here:
@@ -20,8 +32,11 @@ alias_map = {
     "userlinkedapps": "database_structure/UserLinkedApps/rows",
     "userprofiles": "database_structure/UserProfiles/rows",
     "userchains": "database_structure/UserChains/rows",
+    "chainsummary": "database_structure/UserChains/summary",
 }
 
+logger = get_logger("logs", "Firebase")
+
 
 def init_firebase(config: FirebaseConfig):
     current_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -46,6 +61,39 @@ def init_firebase(config: FirebaseConfig):
 DB = init_firebase(firebase_config)
 
 
+# Set while a decorated helper runs, so the helpers it calls (insert_user
+# calling get_next_user_id, say) are not counted as operations of their own.
+_in_operation: ContextVar = ContextVar("in_firestore_operation", default=False)
+
+
+def firestore_operation(kind: str):
+    """
+    Marks a helper as Firestore access of the given kind ("read" or
+    "write"): counts the call in firestore_helper_calls_total and charges
+    its time to the "firestore" bucket of the request trace. Only the
+    outermost decorated helper of a call is counted; round trips and
+    documents are not, see database.fake_firestore for those.
+    """
+
+    def decorator(fn):
+        timed_fn = timed("firestore")(fn)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _in_operation.get():
+                return fn(*args, **kwargs)
+            record_firestore_helper_call(kind, fn.__name__)
+            token = _in_operation.set(True)
+            try:
+                return timed_fn(*args, **kwargs)
+            finally:
+                _in_operation.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
 def get_collection(table: str, alias_map: dict) -> CollectionReference:
     """
     Returns a Firestore collection reference by looking up the given table alias
@@ -60,6 +108,7 @@ def get_collection(table: str, alias_map: dict) -> CollectionReference:
 # ---------------------------
 
 
+@firestore_operation("read")
 def get_user_id_by_email(email: str, alias_map: dict = alias_map):
     """
     Emulates:
@@ -81,6 +130,7 @@ def get_user_id_by_email(email: str, alias_map: dict = alias_map):
         return None
 
 
+@firestore_operation("read")
 def get_app_id_by_name(app_name: str, alias_map: dict = alias_map):
     """
     Emulates:
@@ -102,6 +152,7 @@ def get_app_id_by_name(app_name: str, alias_map: dict = alias_map):
         return None
 
 
+@firestore_operation("read")
 def get_userlinkedapps_count_and_access_token(
     app_id: int, user_id: int, alias_map: dict = alias_map
 ):
@@ -132,6 +183,7 @@ def get_userlinkedapps_count_and_access_token(
     return count, access_tokens
 
 
+@firestore_operation("write")
 def delete_userlinkedapps(user_id: int, app_id: int,
                           alias_map: dict = alias_map):
     """
@@ -153,6 +205,7 @@ def delete_userlinkedapps(user_id: int, app_id: int,
 # Auth Commands
 # ---------------------------
 
+@firestore_operation("write")
 def get_next_user_id(db: firestore.Client = DB) -> int:
     counter_ref = db.collection("counters").document("users")
 
@@ -168,6 +221,7 @@ def get_next_user_id(db: firestore.Client = DB) -> int:
     return txn_increment(transaction)
 
 
+@firestore_operation("write")
 def insert_user(email: str, password: str, alias_map: dict = alias_map) -> int:
     """
     Emulates:
@@ -183,7 +237,8 @@ def insert_user(email: str, password: str, alias_map: dict = alias_map) -> int:
     users_col = get_collection("users", alias_map)
 
     # 2) Hash the password
-    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    with timed("bcrypt"):
+        hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
     hashed_str = hashed.decode("utf-8")
 
     # 3) Obtain the next numeric ID
@@ -204,6 +259,7 @@ def insert_user(email: str, password: str, alias_map: dict = alias_map) -> int:
     return user_id
 
 
+@firestore_operation("read")
 def get_user_password_and_email(email: str, alias_map: dict = alias_map):
     """
     Emulates:
@@ -225,6 +281,7 @@ def get_user_password_and_email(email: str, alias_map: dict = alias_map):
 # ---------------------------
 
 
+@firestore_operation("read")
 def get_userlinkedapps_tokens(
         user_id: int, app_id: int, alias_map: dict = alias_map):
     """
@@ -254,6 +311,7 @@ def get_userlinkedapps_tokens(
     return results
 
 
+@firestore_operation("write")
 def insert_userlinkedapps(
     user_id: int,
     app_id: int,
@@ -284,6 +342,7 @@ def insert_userlinkedapps(
     )
 
 
+@firestore_operation("write")
 def if_not_exists_insert_userlinkedapps(
     user_id: int,
     app_id: int,
@@ -337,6 +396,7 @@ def if_not_exists_insert_userlinkedapps(
 
 # Reuse get_user_id_by_email.
 # For conditional insert, reuse if_not_exists_insert_userlinkedapps.
+@firestore_operation("write")
 def if_not_exists_insert_userlinkedapps_spotify(
     user_id: int,
     app_id: int,
@@ -355,6 +415,7 @@ def if_not_exists_insert_userlinkedapps_spotify(
 # ---------------------------
 
 
+@firestore_operation("read")
 def get_user_profile(user_id: int, alias_map: dict = alias_map):
     """
     Emulates:
@@ -371,7 +432,7 @@ def get_user_profile(user_id: int, alias_map: dict = alias_map):
     profiles = []
     for doc in docs:
         data = doc.to_dict()
-        print(data)
+        logger.debug("Profile document %s fetched", doc.id)
         profiles.append(
             {
                 "first_name": data.get("first_name"),
@@ -388,6 +449,7 @@ def get_user_profile(user_id: int, alias_map: dict = alias_map):
 # ---------------------------
 
 
+@firestore_operation("read")
 def get_userlinkedapps_access_refresh(
     user_id: int, app_id: int, alias_map: dict = alias_map
 ):
@@ -416,6 +478,7 @@ def get_userlinkedapps_access_refresh(
     return results
 
 
+@firestore_operation("write")
 def update_userlinkedapps_tokens(
     new_access_token: str,
     new_refresh_token: str,
@@ -465,61 +528,408 @@ def update_userlinkedapps_tokens(
         )
 
 
+@firestore_operation("read")
 def get_user_chain_status(user_id: int, alias_map: dict = alias_map):
     """
-    Retrieve the current chain status for a user.
+    Retrieve the current chain status for a user, with one keyed read.
     Returns None if no document exists for that user.
     """
-    col = get_collection("userchains", alias_map)
-    filt = FieldFilter(field_path="user_id", op_string="==", value=user_id)
-    docs = col.where(filter=filt).stream()
-    for doc in docs:
-        data = doc.to_dict()
-        return data  # Return first (and only) doc found
-    return None
+    snapshot = _chain_ref(user_id, alias_map).get()
+    return snapshot.to_dict() if snapshot.exists else None
 
 
-def upsert_user_chain(user_id: int, action_data: dict, alias_map: dict = alias_map):
+# Subcollection of a chain document holding its actions, one document per
+# month ("YYYY-MM") with an "entries" array, a "count" and the "keys"
+# (see chain_action_key) of the actions recorded that month.
+CHAIN_HISTORY = "history"
+
+
+# A user's updates all land on one chain document; allow more retries than
+# the client's default 5 for bursts from several devices.
+CHAIN_TRANSACTION_ATTEMPTS = 10
+
+
+def _chain_ref(user_id: int, alias_map: dict = alias_map):
+    """Every user has one chain document, named by their user_id."""
+    return get_collection("userchains", alias_map).document(str(user_id))
+
+
+def chain_action_key(date: str, action) -> str:
+    """Idempotency key of an action: it is recorded once per user and day."""
+    return f"{date}:{action}"
+
+
+def _chain_month(date: DT.date) -> str:
+    return date.strftime("%Y-%m")
+
+
+def _chain_history_buckets(entries: list) -> dict:
     """
-    Upsert (update or insert) the chain status for a user.
+    Groups history entries into {month: entries} in their original order.
     """
-    col = get_collection("userchains", alias_map)
+    buckets = {}
+    for entry in entries:
+        month = _chain_month(parse(entry["date"]).date())
+        buckets.setdefault(month, []).append(entry)
+    return buckets
+
+
+# ---------------------------
+# Chain Summary
+# ---------------------------
+
+# Read by /profile/chain_leaderboard with one get_all:
+#   "leaderboard"                     top_chain_streak, top_max_chain_streak,
+#                                     the CHAIN_LEADERBOARD_SIZE best chains
+#   "counts-00" .. CHAIN_SUMMARY_SHARDS counter shards, each holding part of
+#     users, total_actions            counters
+#     max_chain_streak_histogram      {bucket label: chains}, by max_chain_streak
+#     chain_streak_by_day             {last update day: {bucket label: chains}},
+#                                     by chain_streak
+# Every chain update increments one shard, picked at random, inside its own
+# transaction: Firestore sustains about one write per second per document
+# and serialises transactions writing the same one, so a single counter
+# document would queue every user's update behind everyone else's.
+# get_chain_summary adds the shards up. Current streaks are kept per day of
+# the chain's last update because a chain that missed a day is broken
+# whether or not it has been updated since; when serving, chains last
+# updated before yesterday count as streak "0". Each chain update also
+# folds its shard's days older than yesterday into one LAPSED entry, so a
+# shard holds at most today, yesterday and LAPSED.
+CHAIN_SUMMARY_DOC = "leaderboard"
+CHAIN_SUMMARY_SHARDS = 16
+CHAIN_LEADERBOARD_SIZE = 20
+# Lower bounds of the histogram buckets: "1", "2-3", ..., "366+".
+STREAK_BUCKETS = (1, 2, 4, 8, 15, 31, 61, 181, 366)
+LEADERBOARDS = {"top_chain_streak": "chain_streak", "top_max_chain_streak": "max_chain_streak"}
+# chain_streak_by_day key lapsed chains are folded into.
+LAPSED = "lapsed"
+
+
+def _chain_summary_ref(alias_map: dict = alias_map):
+    return get_collection("chainsummary", alias_map).document(CHAIN_SUMMARY_DOC)
+
+
+def _chain_summary_shard_ref(shard: int, alias_map: dict = alias_map):
+    return get_collection("chainsummary", alias_map).document(f"counts-{shard:02d}")
+
+
+def streak_bucket(streak: int) -> str:
+    """The histogram bucket label of a streak length."""
+    for lower, upper in zip(STREAK_BUCKETS, STREAK_BUCKETS[1:]):
+        if streak < upper:
+            return str(lower) if upper - lower == 1 else f"{lower}-{upper - 1}"
+    return f"{STREAK_BUCKETS[-1]}+"
+
+
+def chain_is_live(last_update_date: str, today: DT.date = None) -> bool:
+    """False once a day has passed without an update: the streak is broken."""
+    today = today or DT.datetime.utcnow().date()
+    return (today - parse(last_update_date).date()).days <= 1
+
+
+def _add_counts(total: dict, counts: dict):
+    for label, count in counts.items():
+        total[label] = total.get(label, 0) + count
+
+
+def _lapsed_days(by_day: dict, today: DT.date) -> dict:
+    """The entries of chain_streak_by_day for days before yesterday."""
+    yesterday = (today - DT.timedelta(days=1)).isoformat()
+    return {day: counts for day, counts in by_day.items() if day != LAPSED and day < yesterday}
+
+
+def _chain_summary_counts(before, after, actions: int = 1, lapsed_days: dict = None) -> dict:
+    """
+    Shard transforms for a recorded action whose chain went from `before`
+    to `after` (chain_streak, max_chain_streak, day of the last update);
+    `before` is None for a chain the summary does not count yet, which
+    brings all its `actions` along. `lapsed_days` (see _lapsed_days), as
+    read from the shard in the same transaction, are moved into LAPSED, and
+    a chain last counted under such a day leaves LAPSED instead.
+    """
+    lapsed_days = lapsed_days or {}
+    yesterday = (DT.date.fromisoformat(after[2]) - DT.timedelta(days=1)).isoformat()
+    counts = {"total_actions": Increment(actions)}
+    if before is None:
+        counts["users"] = Increment(1)
+    old = streak_bucket(before[1]) if before is not None else None
+    new = streak_bucket(after[1])
+    if old != new:
+        counts["max_chain_streak_histogram"] = {new: Increment(1)}
+        if old is not None:
+            counts["max_chain_streak_histogram"][old] = Increment(-1)
+    old = (before[2], streak_bucket(before[0])) if before is not None else None
+    if old is not None and old[0] < yesterday:
+        old = (LAPSED, old[1])
+    new = (after[2], streak_bucket(after[0]))
+    by_day = {day: DELETE_FIELD for day in lapsed_days}
+    lapsed = {}
+    for day_counts in lapsed_days.values():
+        _add_counts(lapsed, day_counts)
+    if old != new:
+        by_day[new[0]] = {new[1]: Increment(1)}
+        if old is not None and old[0] == LAPSED:
+            _add_counts(lapsed, {old[1]: -1})
+        elif old is not None:
+            by_day.setdefault(old[0], {})[old[1]] = Increment(-1)
+    lapsed = {label: Increment(count) for label, count in lapsed.items() if count}
+    if lapsed:
+        by_day[LAPSED] = lapsed
+    if by_day:
+        counts["chain_streak_by_day"] = by_day
+    return counts
+
+
+def _chain_board_entry(chain: dict) -> dict:
+    return {key: chain[key] for key in ("user_id", "chain_streak", "max_chain_streak", "last_update_date")}
+
+
+def _rank(entries: list, field: str) -> list:
+    return sorted(entries, key=lambda e: (-e[field], e["user_id"]))[:CHAIN_LEADERBOARD_SIZE]
+
+
+def _update_chain_leaderboard(summary_ref, chain: dict):
+    """
+    Puts the chain's current streaks on the summary's leaderboards. Run
+    after the chain's own transaction, so only updates that change a
+    streak, at most one per user and day, contend on the summary. Entries
+    are rewritten from the chain each time; lapsed chains are dropped from
+    top_chain_streak, and a chain dropping off a board leaves its place to
+    the next chain that updates.
+    """
+    entry = _chain_board_entry(chain)
+
+    @firestore.transactional
+    def txn_leaderboard(txn):
+        snapshot = summary_ref.get(transaction=txn)
+        summary = snapshot.to_dict() if snapshot.exists else {}
+        changes = {}
+        for board, field in LEADERBOARDS.items():
+            current = summary.get(board, [])
+            others = [e for e in current if e["user_id"] != entry["user_id"]]
+            if field == "chain_streak":
+                others = [e for e in others if chain_is_live(e["last_update_date"])]
+            ranked = _rank(others + [entry], field)
+            if ranked != current:
+                changes[board] = ranked
+        if changes:
+            txn.set(summary_ref, changes, merge=True)
+
+    txn_leaderboard(DB.transaction(max_attempts=CHAIN_TRANSACTION_ATTEMPTS))
+
+
+@firestore_operation("read")
+def get_chain_summary(alias_map: dict = alias_map) -> dict:
+    """
+    The leaderboards and the counter shards added up, read with one
+    get_all; an empty summary before the first chain update. Histogram
+    buckets without chains are left out, and chains last updated before
+    yesterday count as broken: streak "0", and off top_chain_streak.
+    """
+    refs = [_chain_summary_ref(alias_map)]
+    refs += [_chain_summary_shard_ref(shard, alias_map) for shard in range(CHAIN_SUMMARY_SHARDS)]
+    documents = {snap.reference.path: snap.to_dict() for snap in DB.get_all(refs) if snap.exists}
+    boards = documents.pop(refs[0].path, {})
+
+    yesterday = (DT.datetime.utcnow().date() - DT.timedelta(days=1)).isoformat()
+    summary = {"users": 0, "total_actions": 0, "chain_streak_histogram": {}, "max_chain_streak_histogram": {}}
+    lapsed = 0
+    for shard in documents.values():
+        summary["users"] += shard.get("users", 0)
+        summary["total_actions"] += shard.get("total_actions", 0)
+        _add_counts(summary["max_chain_streak_histogram"], shard.get("max_chain_streak_histogram", {}))
+        for day, counts in shard.get("chain_streak_by_day", {}).items():
+            if day != LAPSED and day >= yesterday:
+                _add_counts(summary["chain_streak_histogram"], counts)
+            else:
+                lapsed += sum(counts.values())
+    summary["chain_streak_histogram"]["0"] = lapsed
+    for field in ("chain_streak_histogram", "max_chain_streak_histogram"):
+        summary[field] = {label: count for label, count in summary[field].items() if count}
+    for board, field in LEADERBOARDS.items():
+        entries = boards.get(board, [])
+        if field == "chain_streak":
+            entries = [e for e in entries if chain_is_live(e["last_update_date"])]
+        summary[board] = entries
+    return summary
+
+
+@firestore_operation("write")
+def rebuild_chain_summary(alias_map: dict = alias_map) -> dict:
+    """
+    Recomputes the summary from every chain document, into the leaderboard
+    document and the first counter shard, and marks each chain as counted.
+    For chains written before the summary existed; scans the whole
+    collection, so run it once as maintenance, not per request. Lapsed
+    chains are filed under LAPSED, as chain updates fold them.
+    """
+    chains = [doc for doc in get_collection("userchains", alias_map).stream()]
     today = DT.datetime.utcnow().date()
-    filt = FieldFilter(field_path="user_id", op_string="==", value=user_id)
-    docs = list(col.where(filter=filt).stream())
+    counts = {"users": 0, "total_actions": 0, "max_chain_streak_histogram": {}, "chain_streak_by_day": {}}
+    entries = []
+    for doc in chains:
+        chain = doc.to_dict()
+        counts["users"] += 1
+        counts["total_actions"] += chain.get("history_count", len(chain.get("history", [])))
+        _add_counts(counts["max_chain_streak_histogram"], {streak_bucket(chain["max_chain_streak"]): 1})
+        day = parse(chain["last_update_date"]).date()
+        key = day.isoformat() if chain_is_live(chain["last_update_date"], today) else LAPSED
+        _add_counts(counts["chain_streak_by_day"].setdefault(key, {}), {streak_bucket(chain["chain_streak"]): 1})
+        entries.append(_chain_board_entry(chain))
+    boards = {board: _rank(entries, field) for board, field in LEADERBOARDS.items()}
+    batch = DB.batch()
+    batch.set(_chain_summary_ref(alias_map), boards)
+    for shard in range(CHAIN_SUMMARY_SHARDS):
+        batch.set(_chain_summary_shard_ref(shard, alias_map), counts if shard == 0 else {})
+    batch.commit()
+    # Firestore batches hold at most 500 writes.
+    for start in range(0, len(chains), 500):
+        batch = DB.batch()
+        for doc in chains[start:start + 500]:
+            batch.update(doc.reference, {"in_summary": True})
+        batch.commit()
+    return get_chain_summary(alias_map)
+
+
+@firestore_operation("write")
+def upsert_user_chain(user_id: int, action_data: dict, alias_map: dict = alias_map):
+    """
+    Records an action on the user's chain and updates the streak.
+
+    The chain document (named by user_id) only holds aggregates; the action
+    is appended to this month's document in its "history" subcollection.
+    Both are read with one get_all and written in one transaction, so
+    concurrent updates (double taps, several devices) are serialized
+    instead of overwriting each other. Repeating an action already
+    recorded for the day (same chain_action_key) changes nothing.
+    Counters change through Increment/Maximum transforms and the history
+    through ArrayUnion. A chain still carrying an inline "history" array
+    has it moved into monthly documents on its next update.
+
+    The same transaction moves the chain between the histogram buckets of
+    one randomly picked counter shard, with Increment transforms, and folds
+    the shard's days before yesterday into LAPSED; the shard is read in the
+    same get_all for that, so only updates landing on the same shard
+    contend. When a streak changed, the leaderboard follows in a second,
+    small transaction (see _update_chain_leaderboard).
+
+    Returns the chain's aggregates after the update.
+    """
+    chain_ref = _chain_ref(user_id, alias_map)
+    now = DT.datetime.utcnow()
+    today = now.date()
+    action = action_data.get("action")
+    key = chain_action_key(today.isoformat(), action)
+    entry = {"date": today.isoformat(), "action": action, "at": now.isoformat()}
+    month = _chain_month(today)
+    bucket_ref = chain_ref.collection(CHAIN_HISTORY).document(month)
 
-    # CASE 1: Chain does not exist for this user
-    if not docs:
-        doc_data = {
+    @firestore.transactional
+    def txn_upsert(txn):
+        # get_all does not keep the order of the references.
+        snapshots = {snap.reference.path: snap for snap in txn.get_all([chain_ref, bucket_ref, shard_ref])}
+        chain_snap, bucket_snap = snapshots[chain_ref.path], snapshots[bucket_ref.path]
+        shard = snapshots[shard_ref.path].to_dict() or {}
+        doc_data = chain_snap.to_dict() if chain_snap.exists else None
+        recorded = set((bucket_snap.to_dict() or {}).get("keys", []) if bucket_snap.exists else [])
+        if doc_data is not None:
+            # A chain not yet migrated keeps its actions inline, this
+            # month's included.
+            recorded.update(chain_action_key(e["date"], e.get("action")) for e in doc_data.get("history") or [])
+        if doc_data is not None and key in recorded:
+            return doc_data, False
+        # Streaks as counted in the summary before this update, if at all.
+        before = None
+        if doc_data is not None and doc_data.get("in_summary"):
+            before = (doc_data["chain_streak"], doc_data["max_chain_streak"],
+                      parse(doc_data["last_update_date"]).date().isoformat())
+
+        # CASE 1: Chain does not exist for this user
+        if doc_data is None:
+            doc_data = {
+                "user_id": user_id,
+                "chain_start_date": today.isoformat(),
+                "chain_streak": 1,
+                "max_chain_streak": 1,
+                "last_update_date": now.isoformat(),
+                "broken": False,
+                "history_count": 1,
+                "in_summary": True,
+            }
+            txn.set(chain_ref, doc_data)
+            legacy = []
+
+        # CASE 2: Chain exists, update it
+        else:
+            last_update = parse(doc_data["last_update_date"]).date()
+            updates = {"last_update_date": now.isoformat(), "history_count": Increment(1)}
+            # Check streak continuation
+            if (today - last_update).days == 1:
+                doc_data["chain_streak"] += 1
+                doc_data["broken"] = False
+                updates.update(chain_streak=Increment(1), broken=False,
+                               max_chain_streak=Maximum(doc_data["chain_streak"]))
+            elif (today - last_update).days > 1:
+                doc_data["chain_streak"] = 1
+                doc_data["broken"] = True
+                doc_data["chain_start_date"] = today.isoformat()
+                updates.update(chain_streak=1, broken=True, chain_start_date=today.isoformat())
+            # else: already updated today, only the history grows
+            legacy = doc_data.pop("history", None) or []
+            if legacy:
+                updates.update(history=DELETE_FIELD, history_count=len(legacy) + 1)
+            if before is None:
+                updates["in_summary"] = doc_data["in_summary"] = True
+            doc_data["max_chain_streak"] = max(doc_data["max_chain_streak"], doc_data["chain_streak"])
+            doc_data["last_update_date"] = now.isoformat()
+            doc_data["history_count"] = doc_data.get("history_count", len(legacy)) + 1
+            txn.update(chain_ref, updates)
+
+        # Legacy entries are written as plain arrays: they are the only
+        # source of those months, and ArrayUnion would fold repeated
+        # actions together.
+        for legacy_month, entries in _chain_history_buckets(legacy).items():
+            keys = list(dict.fromkeys(chain_action_key(e["date"], e.get("action")) for e in entries))
+            txn.set(chain_ref.collection(CHAIN_HISTORY).document(legacy_month),
+                    {"user_id": user_id, "month": legacy_month, "entries": entries,
+                     "count": len(entries), "keys": keys})
+        txn.set(bucket_ref, {
             "user_id": user_id,
-            "chain_start_date": today.isoformat(),
-            "chain_streak": 1,
-            "max_chain_streak": 1,
-            "last_update_date": DT.datetime.utcnow().isoformat(),
-            "broken": False,
-            "history": [{"date": today.isoformat(), "action": action_data.get("action")}]
-        }
-        # Use user_id as document name to ensure one doc per user (or generate unique doc_id if needed)
-        col.document(str(user_id)).set(doc_data)
-        return doc_data
-
-    # CASE 2: Chain exists, update it
-    doc = docs[0]
-    doc_id = doc.id
-    doc_data = doc.to_dict()
-    last_update = parse(doc_data["last_update_date"]).date()
-    # Check streak continuation
-    if (today - last_update).days == 1:
-        doc_data["chain_streak"] += 1
-        doc_data["max_chain_streak"] = max(doc_data["max_chain_streak"], doc_data["chain_streak"])
-        doc_data["broken"] = False
-    elif (today - last_update).days > 1:
-        doc_data["chain_streak"] = 1
-        doc_data["broken"] = True
-        doc_data["chain_start_date"] = today.isoformat()
-    # else: already updated today (can update history if needed)
-    doc_data["last_update_date"] = DT.datetime.utcnow().isoformat()
-    doc_data.setdefault("history", []).append({"date": today.isoformat(), "action": action_data.get("action")})
-    # Update document
-    col.document(doc_id).set(doc_data)
+            "month": month,
+            "entries": ArrayUnion([entry]),
+            "count": Increment(1),
+            "keys": ArrayUnion([key]),
+        }, merge=True)
+        after = (doc_data["chain_streak"], doc_data["max_chain_streak"], today.isoformat())
+        actions = 1 if before is not None else doc_data["history_count"]
+        lapsed_days = _lapsed_days(shard.get("chain_streak_by_day", {}), today)
+        txn.set(shard_ref, _chain_summary_counts(before, after, actions, lapsed_days), merge=True)
+        # The leaderboard also follows a new day: its entries carry the date.
+        return doc_data, after != before
+
+    summary_ref = _chain_summary_ref(alias_map)
+    shard_ref = _chain_summary_shard_ref(random.randrange(CHAIN_SUMMARY_SHARDS), alias_map)
+    doc_data, streaks_changed = txn_upsert(DB.transaction(max_attempts=CHAIN_TRANSACTION_ATTEMPTS))
+    if streaks_changed:
+        # The chain is saved; a leaderboard that loses the race catches up
+        # on the user's next streak change.
+        try:
+            _update_chain_leaderboard(summary_ref, doc_data)
+        except Exception as e:
+            logger.warning("Chain leaderboard not updated for user %s: %s", user_id, e)
     return doc_data
+
+
+@firestore_operation("read")
+def get_user_chain_history(user_id: int, months: int = 3, alias_map: dict = alias_map):
+    """
+    The user's chain actions of the last `months` months that have any, as
+    [{"month", "count", "entries"}], newest month first.
+    """
+    history = _chain_ref(user_id, alias_map).collection(CHAIN_HISTORY)
+    docs = history.order_by("month", direction=firestore.Query.DESCENDING).limit(months).stream()
+    return [
+        {"month": data["month"], "count": data.get("count", 0), "entries": data.get("entries", [])}
+        for data in (doc.to_dict() for doc in docs)
+    ]
@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn server:app` (see Dockerfile).
+import os
+import shutil
+
+# Prometheus multiprocess mode: every worker writes its metric samples here and
+# /metrics merges them, so the numbers do not depend on which worker answers.
+multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc"
+)
+
+
+def on_starting(server):
+    # Drop samples left over from a previous run of the master.
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Lets the app size per-worker pools (e.g. model inference threads, see
+    # models/serving.py) by the real worker count, however it was set.
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,64 @@
+# artifacts.py
+#
+# Files derived from the model weights (lookup table, TorchScript and ONNX
+# exports) are built on demand by whichever gunicorn worker finds them
+# missing or stale, while other workers may be reading or memory-mapping
+# them. Builds run under a per-file lock, so one worker builds and the
+# rest load its result, and are written to a temporary file that replaces
+# the real one in a single rename, so a reader sees the old file or the
+# new one, never a truncated one. Each records model_digest() of the
+# weights it was derived from, to tell when it is stale.
+
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialised, writes stay atomic
+    fcntl = None
+
+from models.patterns import MODEL_PATH
+
+# Metadata key under which TorchScript, ONNX and .npz exports store it.
+DIGEST_KEY = "source_sha256"
+
+
+def model_digest(model_path: str = MODEL_PATH) -> str:
+    """SHA-256 of the weights file, hex encoded."""
+    with open(model_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@contextmanager
+def build_lock(path: str):
+    """Holds an exclusive lock on `path`.lock for the duration of the block."""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def replacing(path: str):
+    """
+    Yields a temporary path next to `path`; when the block finishes, the
+    file written there atomically replaces `path`. On an error it is
+    removed and `path` is left as it was.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        yield temp_path
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,84 @@
+# batching.py
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesces single calls made concurrently from several threads into
+    one call of a batched function.
+
+    `batch_fn` takes a list of inputs and returns a list of results in the
+    same order. `submit(x)` blocks until x's result is ready. A background
+    thread takes the first waiting input and, if others are already
+    queued behind it, keeps collecting for up to `window` seconds or until
+    `max_batch` inputs are waiting, then runs them together. A lone
+    request is dispatched at once, so sync workers that never see two
+    requests at a time pay no window; inputs that arrive while a batch
+    runs are queued and share the next call.
+
+    With `window` 0 or below, submit() calls batch_fn directly.
+    """
+
+    def __init__(self, batch_fn, window: float = 0.002, max_batch: int = 64):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.batches = 0  # batch_fn calls made by the worker thread
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def submit(self, item):
+        if self.window <= 0:
+            return self.batch_fn([item])[0]
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a pre-forked worker process starts
+        # its own on first use.
+        if self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._worker.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+                self._pid = os.getpid()
+
+    def _collect(self) -> list:
+        pending = [self._queue.get()]
+        if self._queue.empty():
+            return pending
+        deadline = time.monotonic() + self.window
+        while len(pending) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            try:
+                results = self.batch_fn([item for item, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(pending, results):
+                    future.set_result(result)
+            self.batches += 1
@@ -0,0 +1,150 @@
+# lookup_table.py
+#
+# Precomputed PomodoroNet outputs for every whole second from 0 to
+# MAX_SECONDS, stored as one int16 row per second in a .npy file and
+# memory-mapped, so a prediction for a playlist duration is an array index
+# instead of a forward pass. Each row holds the raw model output that
+# decode_prediction turns into a response: pattern index, MAX_SESSIONS
+# session lengths and the two break lengths.
+#
+#   python models/lookup_table.py --build    # evaluate the model on the grid
+#   python models/lookup_table.py --check    # prove the table matches it
+#
+# A JSON file next to the table records the model weights it was built
+# from; load_lookup_table rebuilds a table whose weights have changed, once
+# per host, replacing the file atomically (see models/artifacts.py).
+
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.artifacts import build_lock, model_digest, replacing  # noqa: E402
+from models.patterns import MAX_SESSIONS, MODEL_PATH, decode_prediction  # noqa: E402
+
+TABLE_PATH = "models/pomodoro_table.npy"
+MAX_SECONDS = 6 * 60 * 60
+COLUMNS = 1 + MAX_SESSIONS + 2
+CHUNK = 4096
+
+
+def grid_minutes(max_seconds: int = MAX_SECONDS) -> np.ndarray:
+    """
+    The durations the table covers, in minutes, computed exactly as
+    /ml/predict converts milliseconds so both feed the model the same float.
+    """
+    return (np.arange(max_seconds + 1, dtype=np.int64) * 1000) / 60000.0
+
+
+def build_table(max_seconds: int = MAX_SECONDS) -> np.ndarray:
+    from models.use_model import forward
+
+    minutes = grid_minutes(max_seconds)
+    table = np.empty((len(minutes), COLUMNS), dtype=np.int16)
+    for start in range(0, len(minutes), CHUNK):
+        pattern_idx, sessions, breaks = forward(minutes[start:start + CHUNK])
+        rows = table[start:start + len(pattern_idx)]
+        rows[:, 0] = pattern_idx
+        rows[:, 1:1 + MAX_SESSIONS] = sessions
+        rows[:, 1 + MAX_SESSIONS:] = breaks
+    return table
+
+
+def _meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def save_table(table: np.ndarray, path: str = TABLE_PATH, model_path: str = MODEL_PATH):
+    # Workers may have the old table memory-mapped: it is replaced, never
+    # truncated, and the metadata follows the table it describes.
+    with replacing(path) as temp_path:
+        with open(temp_path, "wb") as f:
+            np.save(f, table)
+    with replacing(_meta_path(path)) as temp_path:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"model_sha256": model_digest(model_path), "max_seconds": len(table) - 1}, f, indent=2)
+            f.write("\n")
+
+
+class PomodoroLookupTable:
+    def __init__(self, path: str = TABLE_PATH):
+        self.path = path
+        self.rows = np.load(path, mmap_mode="r")
+        self.max_seconds = len(self.rows) - 1
+
+    def lookup(self, duration_ms: float):
+        """
+        The /ml/predict response for `duration_ms`, or None when it is not a
+        whole number of seconds within the table.
+        """
+        seconds, remainder = divmod(duration_ms, 1000)
+        if remainder or not 0 <= seconds <= self.max_seconds:
+            return None
+        row = self.rows[int(seconds)].tolist()
+        return decode_prediction(
+            duration_ms / 60000.0, row[0], row[1:1 + MAX_SESSIONS], row[1 + MAX_SESSIONS:]
+        )
+
+
+def load_lookup_table(path: str = TABLE_PATH, model_path: str = MODEL_PATH,
+                      max_seconds: int = MAX_SECONDS) -> PomodoroLookupTable:
+    """
+    Memory-maps the table at `path`, building it first when it is missing
+    or was built from other weights than `model_path`. Workers starting
+    together wait for the first one's build instead of repeating it.
+    """
+    if not _is_fresh(path, model_path):
+        with build_lock(path):
+            if not _is_fresh(path, model_path):
+                save_table(build_table(max_seconds), path, model_path)
+    return PomodoroLookupTable(path)
+
+
+def _is_fresh(path: str, model_path: str) -> bool:
+    try:
+        with open(_meta_path(path), encoding="utf-8") as f:
+            fresh = json.load(f).get("model_sha256") == model_digest(model_path)
+    except FileNotFoundError:
+        return False
+    return fresh and os.path.exists(path)
+
+
+def check_table(table: PomodoroLookupTable, stride: int = 1) -> list:
+    """
+    Compares every `stride`-th second of the table with a live, unbatched
+    model prediction and returns the seconds that differ.
+    """
+    from models.use_model import predict
+
+    return [
+        seconds
+        for seconds in range(0, table.max_seconds + 1, stride)
+        if table.lookup(seconds * 1000.0) != predict(seconds * 1000.0 / 60000.0)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify the PomodoroNet lookup table")
+    parser.add_argument("--build", action="store_true", help="evaluate the model on the grid and save the table")
+    parser.add_argument("--check", action="store_true", help="compare the table with the live model")
+    parser.add_argument("--path", default=TABLE_PATH)
+    parser.add_argument("--max-seconds", type=int, default=MAX_SECONDS)
+    parser.add_argument("--stride", type=int, default=1, help="check every N-th second only")
+    args = parser.parse_args()
+    # Model and table paths are relative to server/.
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if args.build:
+        save_table(build_table(args.max_seconds), args.path)
+        print(f"Table for 0..{args.max_seconds} s written to {args.path}")
+    if args.check:
+        mismatches = check_table(PomodoroLookupTable(args.path), args.stride)
+        if mismatches:
+            print(f"{len(mismatches)} seconds differ from the live model, first: {mismatches[:10]}")
+            sys.exit(1)
+        print("Table matches the live model")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# numpy_engine.py
+#
+# PomodoroNet forward pass in plain NumPy, for workers that should not pay
+# torch's import time and memory. The weights come from an .npz export of
+# the torch state_dict:
+#
+#   python models/numpy_engine.py            # export models/pomodoro_model.npz
+#   python models/numpy_engine.py --check    # compare with the torch model
+#
+# The export records the SHA-256 of the .pth it came from; loading warns
+# when the .pth has changed since.
+
+import argparse
+import os
+import sys
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.artifacts import DIGEST_KEY, model_digest  # noqa: E402
+from models.patterns import MODEL_PATH  # noqa: E402
+
+WEIGHTS_PATH = "models/pomodoro_model.npz"
+
+# Largest difference from the torch outputs --check accepts before
+# rounding; float32 matmuls may sum in a different order.
+TOLERANCE = 1e-4
+
+
+def export_weights(model_path: str = MODEL_PATH, path: str = WEIGHTS_PATH):
+    import torch
+
+    state_dict = torch.load(model_path, map_location="cpu")
+    arrays = {name: tensor.numpy() for name, tensor in state_dict.items()}
+    np.savez(path, **arrays, **{DIGEST_KEY: np.array(model_digest(model_path))})
+
+
+def decode_outputs(pattern_logits, sessions, breaks) -> tuple:
+    """
+    Raw output arrays of a batch to the lists models.use_model.forward
+    returns; shared by every runtime that hands back NumPy arrays.
+    """
+    # np.rint rounds half to even, like torch.round.
+    return (
+        pattern_logits.argmax(axis=1).tolist(),
+        np.maximum(np.rint(sessions), 0).astype(np.int32).tolist(),
+        np.maximum(np.rint(breaks), 0).astype(np.int32).tolist(),
+    )
+
+
+class NumpyPomodoroNet:
+    """
+    Same layers as PomodoroNet: Linear(1, 64), ReLU, Linear(64, 64), ReLU,
+    then the pattern, sessions and breaks heads, all in float32.
+    """
+
+    LAYERS = ("shared.0", "shared.2", "pattern_head", "sessions_head", "breaks_head")
+
+    def __init__(self, weights: dict):
+        # Pre-transposed so every layer is x @ W + b.
+        self.layers = {
+            name: (np.ascontiguousarray(weights[f"{name}.weight"].T, dtype=np.float32),
+                   np.asarray(weights[f"{name}.bias"], dtype=np.float32))
+            for name in self.LAYERS
+        }
+
+    def _linear(self, name, x):
+        weight, bias = self.layers[name]
+        return x @ weight + bias
+
+    def __call__(self, x: np.ndarray) -> tuple:
+        features = np.maximum(self._linear("shared.0", x), 0)
+        features = np.maximum(self._linear("shared.2", features), 0)
+        return (
+            self._linear("pattern_head", features),
+            self._linear("sessions_head", features),
+            self._linear("breaks_head", features),
+        )
+
+    def forward(self, durations_minutes) -> tuple:
+        """
+        Same contract as models.use_model.torch_forward: argmax pattern index and
+        session and break lengths rounded and clamped at 0, as lists.
+        """
+        if not len(durations_minutes):
+            return [], [], []
+        return decode_outputs(*self(np.asarray(durations_minutes, dtype=np.float32).reshape(-1, 1)))
+
+
+def load_numpy_model(path: str = WEIGHTS_PATH, model_path: str = MODEL_PATH) -> NumpyPomodoroNet:
+    with np.load(path) as archive:
+        weights = {name: archive[name] for name in archive.files}
+    source = str(weights.pop(DIGEST_KEY, ""))
+    if os.path.exists(model_path) and source != model_digest(model_path):
+        warnings.warn(f"{path} was exported from other weights than {model_path}; re-run models/numpy_engine.py")
+    return NumpyPomodoroNet(weights)
+
+
+def compare_with_torch(durations_minutes, path: str = WEIGHTS_PATH) -> dict:
+    """
+    Runs both engines on `durations_minutes` and returns the largest raw
+    output difference and the durations whose decoded prediction differs.
+    """
+    import torch
+    from models.pomodoro_model import load_pomodoro_model
+    from models.use_model import torch_forward
+
+    torch_model = load_pomodoro_model(MODEL_PATH)
+    numpy_model = load_numpy_model(path)
+    x = np.asarray(durations_minutes, dtype=np.float32).reshape(-1, 1)
+    with torch.no_grad():
+        expected = [t.numpy() for t in torch_model(torch.from_numpy(x))]
+    actual = numpy_model(x)
+    max_error = max(float(np.abs(a - e).max()) for a, e in zip(actual, expected))
+    torch_rows = list(zip(*torch_forward(torch_model, x.ravel())))
+    numpy_rows = list(zip(*numpy_model.forward(x.ravel())))
+    mismatches = [d for d, t, n in zip(durations_minutes, torch_rows, numpy_rows) if t != n]
+    return {"max_error": max_error, "mismatches": mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export PomodoroNet weights for the NumPy engine")
+    parser.add_argument("--check", action="store_true", help="compare the export with the torch model instead")
+    parser.add_argument("--path", default=WEIGHTS_PATH)
+    args = parser.parse_args()
+    # Model and weight paths are relative to server/.
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if not args.check:
+        export_weights(path=args.path)
+        print(f"Weights written to {args.path}")
+        return
+    # Every whole second up to six hours, as the lookup table covers.
+    result = compare_with_torch(np.arange(6 * 60 * 60 + 1) / 60.0, args.path)
+    print(f"max raw difference {result['max_error']:.2e}, {len(result['mismatches'])} decoded mismatches")
+    if result["max_error"] > TOLERANCE or result["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# patterns.py
+#
+# Output vocabulary of PomodoroNet and the decoding of its raw outputs,
+# kept free of torch so every inference path can share it.
+
+from util.playlist import parse_pattern
+
+# You need these constants (set exactly as during training)
+PATTERN_LIST = [
+    "WSW", "WSWSWL", "WSWSWSWL", "WSWSWSWL+WSWS", "2×WSWSWL", "2×WSWSWSWL"
+]
+IDX_TO_PATTERN = {i: p for i, p in enumerate(PATTERN_LIST)}
+MAX_SESSIONS = 8
+
+# Trained weights, relative to server/.
+MODEL_PATH = "models/pomodoro_model.pth"
+
+
+def decode_prediction(duration_minutes, pattern_idx, sessions, breaks) -> dict:
+    """
+    Turns one row of model output (argmax pattern index, rounded session
+    and break lengths clamped at 0) into the /ml/predict response.
+    """
+    pattern = IDX_TO_PATTERN[pattern_idx]
+    counts = parse_pattern(pattern)  # "2×WSWSWL" has six work sessions
+    sessions = list(sessions[:counts["w"]])
+    short_break = breaks[0]
+    long_break = breaks[1] if counts["l"] else None
+    # Enforce: long_break > short_break if long_break exists
+    if long_break is not None and long_break <= short_break:
+        long_break = short_break + 5
+    return {
+        "duration_minutes": duration_minutes,
+        "pattern": pattern,
+        "work_sessions": sessions,
+        "short_break": short_break,
+        "long_break": long_break
+    }
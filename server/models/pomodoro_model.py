@@ -2,13 +2,7 @@
 
 import torch
 import torch.nn as nn
-
-# You need these constants (set exactly as during training)
-PATTERN_LIST = [
-    "WSW", "WSWSWL", "WSWSWSWL", "WSWSWSWL+WSWS", "2×WSWSWL", "2×WSWSWSWL"
-]
-IDX_TO_PATTERN = {i: p for i, p in enumerate(PATTERN_LIST)}
-MAX_SESSIONS = 8
+from models.patterns import PATTERN_LIST, IDX_TO_PATTERN, MAX_SESSIONS  # noqa: F401
 
 
 class PomodoroNet(nn.Module):
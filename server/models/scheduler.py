@@ -0,0 +1,180 @@
+# scheduler.py
+#
+# One scheduling service over both engines. The quick heuristic in
+# util.playlist answers at once; PomodoroNet's prediction for the duration's
+# bucket is computed on a background thread, and once it has been checked,
+# the pattern it picked, fitted to each requested duration by the exact
+# search, replaces the heuristic schedule. Decisions are cached per duration
+# bucket and both solvers are memoized, so repeat durations cost a few dict
+# lookups.
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from util.logit import get_logger
+from util.metrics import record_cache_lookup
+from util.playlist import fit_pattern, heuristic_schedule, parse_pattern
+
+logger = get_logger("logs", "scheduler")
+
+# Refinement states reported with every answer.
+PENDING, ACCEPTED, REJECTED, FAILED = "pending", "accepted", "rejected", "failed"
+
+
+def model_schedule(prediction: dict, duration_minutes: float, max_work_allowed: int = 35,
+                   penalty_weight: float = 1.0) -> dict:
+    """
+    A /ml/predict response in the shape of a util.playlist schedule, with
+    its final_sum and its loss against `duration_minutes` computed the
+    same way.
+    """
+    pattern = parse_pattern(prediction["pattern"])
+    work_sessions = list(prediction["work_sessions"])
+    short_break = prediction["short_break"] if pattern["s"] else None
+    long_break = prediction["long_break"] if pattern["l"] else None
+    final_sum = sum(work_sessions) + pattern["s"] * (short_break or 0) + pattern["l"] * (long_break or 0)
+    penalty = sum(max(0, ws - max_work_allowed) for ws in work_sessions)
+    return {
+        "total_duration": duration_minutes,
+        "sequence": prediction["pattern"],
+        "work_sessions": work_sessions,
+        "short_break": short_break,
+        "long_break": long_break,
+        "final_sum": final_sum,
+        "loss": abs(duration_minutes - final_sum) + penalty_weight * penalty,
+    }
+
+
+def check_model_schedule(schedule: dict, fitted: dict, heuristic_loss: float, tolerance: float) -> list:
+    """
+    Reasons the model's schedule may not replace the heuristic one; empty
+    when it is usable. The model is trusted on the shape of a schedule,
+    not on its lengths: its sessions and breaks must be coherent with its
+    pattern, and `fitted`, the pattern fitted to the duration by the exact
+    search, must have a loss no worse than the heuristic's, give or take
+    `tolerance` minutes.
+    """
+    pattern = parse_pattern(schedule["sequence"])
+    problems = []
+    if len(schedule["work_sessions"]) != pattern["w"]:
+        problems.append(f"{len(schedule['work_sessions'])} work sessions for {pattern['w']} in the pattern")
+    if any(ws <= 0 for ws in schedule["work_sessions"]):
+        problems.append("empty work session")
+    if pattern["s"] and schedule["short_break"] <= 0:
+        problems.append("empty short break")
+    if pattern["l"] and schedule["long_break"] <= (schedule["short_break"] or 0):
+        problems.append("long break not longer than the short break")
+    if fitted["loss"] > heuristic_loss + tolerance:
+        problems.append(
+            f"{fitted['sequence']} fits {fitted['total_duration']:g} min with loss {fitted['loss']:.2f} "
+            f"(heuristic {heuristic_loss:.2f})"
+        )
+    return problems
+
+
+class HybridScheduler:
+    """
+    Serves schedules for durations in minutes.
+
+    `predict_fn(duration_minutes)` returns a /ml/predict response. The
+    first request for a bucket gets the heuristic schedule straight away
+    and queues the prediction; later requests for the bucket get the
+    model's pattern fitted to their own duration once it has been
+    accepted, else the heuristic schedule for their duration. At most
+    `max_entries` buckets are kept, least recently used first out.
+    """
+
+    def __init__(self, predict_fn, bucket_seconds: int = 60, max_entries: int = 4096,
+                 tolerance: float = 0.0, background: bool = True):
+        self.predict_fn = predict_fn
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.max_entries = max(1, max_entries)
+        self.tolerance = tolerance
+        self.background = background
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def bucket(self, duration_minutes: float) -> float:
+        """The duration, in minutes, the model is asked about for every request of its bucket."""
+        buckets = round(duration_minutes * 60 / self.bucket_seconds)
+        return buckets * self.bucket_seconds / 60
+
+    def schedule(self, duration_minutes: float) -> dict:
+        key = self.bucket(duration_minutes)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache_lookup("pomodoro_schedule", hit=entry is not None)
+        if entry is None:
+            entry = self._add(key)
+        return self._answer(duration_minutes, key, entry)
+
+    def wait(self, timeout: float = None):
+        """Blocks until every queued refinement has finished; for tests and benchmarks."""
+        with self._lock:
+            futures = [entry["future"] for entry in self._entries.values() if entry["future"] is not None]
+        for future in futures:
+            future.result(timeout)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _add(self, key: float) -> dict:
+        entry = {"pattern": None, "status": PENDING, "problems": [], "future": None}
+        with self._lock:
+            # Another thread may have scheduled the bucket meanwhile.
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.background:
+                entry["future"] = self._pool().submit(self._refine, key, entry)
+        if not self.background:
+            self._refine(key, entry)
+        return entry
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Threads do not survive fork, so a pre-forked worker process starts
+        # its own pool on first use. Called with the lock held.
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="schedule-refiner")
+            self._pid = os.getpid()
+        return self._executor
+
+    def _refine(self, key: float, entry: dict):
+        try:
+            schedule = model_schedule(self.predict_fn(key), key)
+            fitted, _ = fit_pattern(key, schedule["sequence"])
+        except Exception as e:
+            logger.error("Model refinement for %s min failed: %s", key, e)
+            entry["status"] = FAILED
+            return
+        problems = check_model_schedule(schedule, fitted, heuristic_schedule(key)[1], self.tolerance)
+        if problems:
+            logger.info("Model schedule for %s min rejected: %s", key, "; ".join(problems))
+        # The status is written last; readers look at it first.
+        entry["pattern"], entry["problems"] = schedule["sequence"], problems
+        entry["status"] = REJECTED if problems else ACCEPTED
+
+    @staticmethod
+    def _answer(duration_minutes: float, key: float, entry: dict) -> dict:
+        status = entry["status"]
+        if status == ACCEPTED:
+            source, (schedule, _) = "model", fit_pattern(duration_minutes, entry["pattern"])
+        else:
+            source, (schedule, _) = "heuristic", heuristic_schedule(duration_minutes)
+        return {
+            "duration_minutes": duration_minutes,
+            "bucket_minutes": key,
+            "source": source,
+            "refinement": status,
+            "problems": entry["problems"] if status == REJECTED else [],
+            # A copy: the solvers' results are memoized.
+            "schedule": dict(schedule, work_sessions=list(schedule["work_sessions"])),
+        }
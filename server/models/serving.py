@@ -0,0 +1,178 @@
+# serving.py
+#
+# Compiled PomodoroNet runtimes and CPU tuning for serving:
+#
+#   torchscript  models/pomodoro_model.pt, a scripted copy of the eager model
+#   onnx         models/pomodoro_model.onnx, run by onnxruntime (optional;
+#                exporting needs the onnx package, serving needs onnxruntime)
+#
+#   python models/serving.py --export torchscript onnx
+#
+# Both files record the SHA-256 of the .pth they came from and are
+# re-exported on load when the weights change, by one worker per host and
+# with an atomic replace (see models/artifacts.py). Every runtime pins its
+# intra-op thread pool to intra_op_threads() so several gunicorn workers
+# on one host do not oversubscribe its cores.
+
+import argparse
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.artifacts import DIGEST_KEY, build_lock, model_digest, replacing  # noqa: E402
+from models.patterns import MODEL_PATH  # noqa: E402
+
+SCRIPTED_PATH = "models/pomodoro_model.pt"
+ONNX_PATH = "models/pomodoro_model.onnx"
+OUTPUT_NAMES = ["pattern_logits", "sessions", "breaks"]
+
+# Batch sizes run once at startup so the first requests do not pay for
+# lazy initialisation (thread pools, TorchScript's profiling runs).
+WARM_UP_BATCHES = (1, 8, 64)
+WARM_UP_ROUNDS = 3
+
+
+def intra_op_threads(num_threads: int = 0, workers: int = None) -> int:
+    """
+    Threads per worker for model inference: `num_threads` when set,
+    otherwise the host's CPUs shared evenly between the workers
+    (WEB_CONCURRENCY, which gunicorn.conf.py sets in every worker).
+    """
+    if num_threads > 0:
+        return num_threads
+    if workers is None:
+        workers = int(os.environ.get("WEB_CONCURRENCY") or 1)
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def pin_torch_threads(threads: int):
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        # Only allowed before the first inter-op parallel work.
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def warm_up(forward, batches=WARM_UP_BATCHES, rounds: int = WARM_UP_ROUNDS):
+    for _ in range(rounds):
+        for size in batches:
+            forward([25.0 + 5.0 * i for i in range(size)])
+
+
+# ---------------------------
+# TorchScript
+# ---------------------------
+
+def export_torchscript(model_path: str = MODEL_PATH, path: str = SCRIPTED_PATH):
+    import torch
+    from models.pomodoro_model import load_pomodoro_model
+
+    scripted = torch.jit.script(load_pomodoro_model(model_path))
+    with replacing(path) as temp_path:
+        torch.jit.save(scripted, temp_path, _extra_files={DIGEST_KEY: model_digest(model_path)})
+
+
+def _read_torchscript(path: str, digest: str):
+    import torch
+
+    extra_files = {DIGEST_KEY: ""}
+    if not os.path.exists(path):
+        return None
+    model = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+    return model if extra_files[DIGEST_KEY] == digest.encode("utf-8") else None
+
+
+def load_torchscript(path: str = SCRIPTED_PATH, model_path: str = MODEL_PATH):
+    digest = model_digest(model_path)
+    model = _read_torchscript(path, digest)
+    if model is None:
+        with build_lock(path):
+            # Another worker may have exported it while this one waited.
+            model = _read_torchscript(path, digest)
+            if model is None:
+                export_torchscript(model_path, path)
+                model = _read_torchscript(path, digest)
+    return model.eval()
+
+
+# ---------------------------
+# ONNX
+# ---------------------------
+
+def export_onnx(model_path: str = MODEL_PATH, path: str = ONNX_PATH):
+    import onnx
+    import torch
+    from models.pomodoro_model import load_pomodoro_model
+
+    with replacing(path) as temp_path:
+        torch.onnx.export(
+            load_pomodoro_model(model_path),
+            torch.zeros(1, 1),
+            temp_path,
+            input_names=["duration_minutes"],
+            output_names=OUTPUT_NAMES,
+            dynamic_axes={name: {0: "batch"} for name in ["duration_minutes", *OUTPUT_NAMES]},
+            dynamo=False,
+        )
+        exported = onnx.load(temp_path)
+        onnx.helper.set_model_props(exported, {DIGEST_KEY: model_digest(model_path)})
+        onnx.save(exported, temp_path)
+
+
+class OnnxPomodoroNet:
+    def __init__(self, path: str, threads: int):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.source = self.session.get_modelmeta().custom_metadata_map.get(DIGEST_KEY, "")
+
+    def __call__(self, x: np.ndarray) -> tuple:
+        return tuple(self.session.run(OUTPUT_NAMES, {"duration_minutes": x}))
+
+    def forward(self, durations_minutes) -> tuple:
+        from models.numpy_engine import decode_outputs
+
+        if not len(durations_minutes):
+            return [], [], []
+        return decode_outputs(*self(np.asarray(durations_minutes, dtype=np.float32).reshape(-1, 1)))
+
+
+def _read_onnx(path: str, threads: int, digest: str):
+    model = OnnxPomodoroNet(path, threads) if os.path.exists(path) else None
+    return model if model is not None and model.source == digest else None
+
+
+def load_onnx(threads: int, path: str = ONNX_PATH, model_path: str = MODEL_PATH) -> OnnxPomodoroNet:
+    digest = model_digest(model_path)
+    model = _read_onnx(path, threads, digest)
+    if model is None:
+        with build_lock(path):
+            model = _read_onnx(path, threads, digest)
+            if model is None:
+                export_onnx(model_path, path)
+                model = OnnxPomodoroNet(path, threads)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export PomodoroNet for the compiled runtimes")
+    parser.add_argument("--export", nargs="+", choices=("torchscript", "onnx"), default=["torchscript"])
+    args = parser.parse_args()
+    # Model paths are relative to server/.
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    exporters = {"torchscript": (export_torchscript, SCRIPTED_PATH), "onnx": (export_onnx, ONNX_PATH)}
+    for runtime in args.export:
+        export, path = exporters[runtime]
+        export(path=path)
+        print(f"{runtime} model written to {path}")
+
+
+if __name__ == "__main__":
+    main()
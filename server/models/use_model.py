@@ -1,32 +1,88 @@
 # use_model.py
 
-import torch
-from models.pomodoro_model import load_pomodoro_model, IDX_TO_PATTERN
+import importlib.util
+from config.config import settings
+from models.patterns import MODEL_PATH, decode_prediction
+from util.tracing import timed
 
-device = 'cuda' if torch.cuda.is_available() else 'cpu'
-device = 'cpu'
-model = load_pomodoro_model("models/pomodoro_model.pth", device=device)
+# "torch" runs the eager PomodoroNet, "torchscript" and "onnx" the compiled
+# exports in models/serving.py, and "numpy" the exported weights in
+# models/numpy_engine.py without importing torch at all.
+ENGINES = ("torch", "torchscript", "onnx", "numpy")
 
 
-def predict(duration_minutes: float) -> dict:
-    x = torch.tensor([[duration_minutes]], dtype=torch.float32).to(device)
+def torch_forward(net, durations_minutes) -> tuple:
+    """
+    Raw output of the torch model `net` for each duration as three lists:
+    argmax pattern index, and session and break lengths rounded and
+    clamped at 0.
+    """
+    import torch
+
+    if not len(durations_minutes):
+        return [], [], []
+    x = torch.tensor(durations_minutes, dtype=torch.float32).reshape(-1, 1)
     with torch.no_grad():
-        pat_logits, sess_pred, break_pred = model(x)
-        pattern_idx = torch.argmax(pat_logits, dim=1).item()
-        pattern = IDX_TO_PATTERN[pattern_idx]
-        sessions = sess_pred[0].cpu().round().clamp(min=0).int().tolist()
-        needed = pattern.count('W')
-        sessions = sessions[:needed]
-        breaks = break_pred[0].cpu().round().clamp(min=0).int().tolist()
-        short_break = breaks[0]
-        long_break = breaks[1] if 'L' in pattern else None
-        # Enforce: long_break > short_break if long_break exists
-        if long_break is not None and long_break <= short_break:
-            long_break = short_break + 5
-    return {
-        "duration_minutes": duration_minutes,
-        "pattern": pattern,
-        "work_sessions": sessions,
-        "short_break": short_break,
-        "long_break": long_break
-    }
+        pat_logits, sess_pred, break_pred = net(x)
+        pattern_idx = torch.argmax(pat_logits, dim=1).tolist()
+        sessions = sess_pred.round().clamp(min=0).int().tolist()
+        breaks = break_pred.round().clamp(min=0).int().tolist()
+    return pattern_idx, sessions, breaks
+
+
+def load_engine(engine: str, threads: int = None):
+    """
+    Returns (model, forward) for an engine name; forward takes a sequence
+    of durations in minutes and returns torch_forward's three lists.
+    Torch-based engines get their intra-op pool pinned to `threads`
+    (default: serving.intra_op_threads()).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ML engine {engine!r}; choose from {ENGINES}")
+    if engine == "numpy":
+        from models.numpy_engine import load_numpy_model
+
+        model = load_numpy_model()
+        return model, model.forward
+    from models import serving
+
+    threads = threads or serving.intra_op_threads(settings.ml_num_threads)
+    if engine == "onnx":
+        model = serving.load_onnx(threads)
+        return model, model.forward
+    serving.pin_torch_threads(threads)
+    if engine == "torchscript":
+        model = serving.load_torchscript()
+    else:
+        from models.pomodoro_model import load_pomodoro_model
+
+        model = load_pomodoro_model(MODEL_PATH, device="cpu")
+    return model, lambda durations_minutes: torch_forward(model, durations_minutes)
+
+
+ENGINE = settings.ml_engine
+# Torch-free installs fall back to the NumPy engine.
+if ENGINE == "torch" and importlib.util.find_spec("torch") is None:
+    ENGINE = "numpy"
+model, forward = load_engine(ENGINE)
+if settings.ml_warm_up:
+    from models.serving import warm_up
+
+    warm_up(forward)
+
+
+@timed("model")
+def predict_many(durations_minutes) -> list:
+    """
+    Predicts every duration in one forward pass; element i of the result
+    equals predict(durations_minutes[i]).
+    """
+    durations_minutes = list(durations_minutes)
+    return [
+        decode_prediction(*row) for row in zip(durations_minutes, *forward(durations_minutes))
+    ]
+
+
+@timed("model")
+def predict(duration_minutes: float) -> dict:
+    return predict_many([duration_minutes])[0]
@@ -1,6 +1,6 @@
 import os
 import sys
-from unittest.mock import Mock
+import pytest
 
 # Ensure the server package and root are on sys.path
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -33,13 +33,11 @@ os.environ.setdefault("FIREBASECONFIG_MESSAGINGSENDERID", "sender")
 os.environ.setdefault("FIREBASECONFIG_APPID", "appid")
 os.environ.setdefault("FIREBASECONFIG_MEASUREMENTID", "measure")
 
-# Patch firebase_admin to avoid requiring valid credentials
-import firebase_admin
-from firebase_admin import credentials, firestore
+# Serve database.firebase_operations from an in-memory Firestore instead of
+# a real project, so no credentials are needed and round trips can be counted.
+from database.fake_firestore import install_fake_firestore
 
-credentials.Certificate = lambda *args, **kwargs: Mock()
-firebase_admin.initialize_app = lambda *args, **kwargs: Mock()
-firestore.client = lambda *args, **kwargs: Mock()
+FAKE_DB = install_fake_firestore()
 
 # Ensure settings has debug_mode attribute for blueprints that access it
 try:
@@ -48,3 +46,28 @@ try:
         object.__setattr__(config_module.settings, 'debug_mode', 'False')
 except Exception:
     pass
+
+
+@pytest.fixture
+def fake_firestore():
+    """
+    The in-memory Firestore behind database.firebase_operations, emptied,
+    with counters zeroed and no latency, for each test that asks for it.
+    """
+    FAKE_DB.reset()
+    FAKE_DB.set_latency(read=0, write=0, transaction=0)
+    yield FAKE_DB
+    FAKE_DB.reset()
+    FAKE_DB.set_latency(read=0, write=0, transaction=0)
+
+
+@pytest.fixture
+def provider_stubs(monkeypatch):
+    """
+    Answers outbound Spotify, Google, Apple and Musixmatch calls in-process
+    from benchmarks/provider_stubs.py; any other host fails to connect.
+    """
+    import requests
+    from benchmarks.provider_stubs import stub_send
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", stub_send)
@@ -2,6 +2,7 @@
 
 import sys
 import os
+import time
 from flask import Flask
 import pytest
 from flask_jwt_extended import JWTManager, create_access_token
@@ -9,6 +10,7 @@ from flask_jwt_extended import JWTManager, create_access_token
 # Prepend repository root so that "server" and "util" modules are importable.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from server import create_app
+from util.profiler import _clamp, sampling_jobs
 
 ############################################
 # Fixtures and helper functions
@@ -86,6 +88,77 @@ def test_list_endpoints_json(client, app, monkeypatch):
     # Optionally, check that the endpoints list is a list type.
     assert isinstance(data["endpoints"], list), "Expected endpoints to be a list"
 
+
+def test_sampling_profile_requires_admin(client):
+    token = create_access_token(identity="user@example.com", additional_claims={"scopes": ["me"]})
+    response = client.get("/debug/profile", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403, "Expected 403 without the admin scope"
+
+
+def test_sampling_profile_returns_collapsed_stacks(client, app):
+    headers = get_admin_auth_headers(app)
+    response = client.get("/debug/profile", headers=headers, query_string={"seconds": 0.05, "interval": 0.005})
+    assert response.status_code == 200
+    assert "attachment" in response.headers.get("Content-Disposition", "")
+    lines = response.get_data(as_text=True).splitlines()
+    # Each line is "frame;frame;... <count>"
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+
+def test_sampling_profile_caps_blocking_runs_below_the_worker_timeout(client, app):
+    headers = get_admin_auth_headers(app)
+    response = client.get("/debug/profile", headers=headers, query_string={"seconds": 25})
+    assert response.status_code == 400
+
+
+def test_sampling_profile_rejects_unbounded_intervals(client, app):
+    headers = get_admin_auth_headers(app)
+    for interval in ("1e9", "inf", "nan", "0", "-1", "0.5"):
+        response = client.get("/debug/profile", headers=headers,
+                              query_string={"seconds": 0.2, "interval": interval, "background": "true"})
+        assert response.status_code == 400, interval
+    assert _clamp(1.0, float("inf")) == (1.0, 1.0)
+    assert _clamp(1.0, 1e9) == (1.0, 1.0)
+
+
+def test_sampling_profile_runs_in_the_background(client, app):
+    headers = get_admin_auth_headers(app)
+    started = time.perf_counter()
+    response = client.get("/debug/profile", headers=headers,
+                          query_string={"seconds": 0.2, "interval": 0.005, "background": "true"})
+    assert response.status_code == 202
+    assert time.perf_counter() - started < 0.2
+    job_id = response.get_json()["job_id"]
+    assert response.get_json()["result_url"] == f"/debug/profile/{job_id}"
+    # One profile per worker at a time.
+    assert client.get("/debug/profile", headers=headers, query_string={"seconds": 0.05}).status_code == 409
+
+    assert sampling_jobs.wait(job_id, timeout=5)["status"] == "done"
+    result = client.get(f"/debug/profile/{job_id}", headers=headers)
+    assert result.status_code == 200
+    assert "attachment" in result.headers.get("Content-Disposition", "")
+    assert client.get("/debug/profile/unknown", headers=headers).status_code == 404
+
+
+def test_slow_requests_captures_opted_in_route(client, app):
+    headers = get_admin_auth_headers(app)
+    response = client.post("/debug/slow_requests", headers=headers, json={"route": "/healthcheck", "keep": 2})
+    assert response.status_code == 200
+    assert response.get_json()["routes"]["/healthcheck"] == 2
+
+    for _ in range(3):
+        client.get("/healthcheck")
+
+    data = client.get("/debug/slow_requests", headers=headers).get_json()
+    captures = data["captures"]["/healthcheck"]
+    assert len(captures) == 2, "Only the slowest N requests are kept"
+    assert captures[0]["duration_ms"] >= captures[1]["duration_ms"]
+    assert "function calls" in captures[0]["stats"]
+
+    client.post("/debug/slow_requests", headers=headers, json={"route": "/healthcheck", "enabled": False})
+
 ############################################
 # End of test_endpoints.py
 ############################################
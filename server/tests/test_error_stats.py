@@ -0,0 +1,61 @@
+# tests/test_error_stats.py
+
+import sys
+import os
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from server import create_app
+from util.error_stats import ErrorStatsStore
+
+# The tests pass fake `now` values; a background flush would prune their
+# rows by wall-clock time, so it is kept from running during a test.
+NO_BACKGROUND_FLUSH = 10 ** 6
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ErrorStatsStore(str(tmp_path / "error_stats.sqlite3"), flush_interval=NO_BACKGROUND_FLUSH)
+
+
+def test_sliding_windows(store):
+    now = 1_000_000
+    store.record(404, "<unmatched>", now=now - 30)      # in 1m, 5m, 1h
+    store.record(500, "/spotify/playlists", now=now - 120)  # in 5m, 1h
+    store.record(500, "/spotify/playlists", now=now - 1800)  # in 1h only
+    store.record(500, "/spotify/playlists", now=now - 7200)  # expired
+
+    stats = store.snapshot(now=now)
+    assert stats["1m"] == {"total": 1, "by_status": {"404": 1}, "by_route": {"<unmatched>": 1}}
+    assert stats["5m"]["by_status"] == {"404": 1, "500": 1}
+    assert stats["1h"]["total"] == 3
+    assert stats["1h"]["by_route"]["/spotify/playlists"] == 2
+
+
+def test_workers_sharing_a_database_are_aggregated(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    worker_a = ErrorStatsStore(path, flush_interval=NO_BACKGROUND_FLUSH)
+    worker_b = ErrorStatsStore(path, flush_interval=NO_BACKGROUND_FLUSH)
+    now = 2_000_000
+    worker_a.record(429, "/lyrics/get", now=now)
+    worker_b.record(429, "/lyrics/get", now=now)
+    worker_b.flush(now=now)
+
+    assert worker_a.snapshot(now=now)["1m"]["by_status"] == {"429": 2}
+
+
+def test_error_stats_endpoint_counts_error_responses(monkeypatch, store):
+    monkeypatch.setattr("util.error_stats.error_stats", store)
+    monkeypatch.setattr("helper.error.error_stats", store)
+    app = create_app(Flask(__name__), testing=True)
+    with app.test_client() as client:
+        # Validation failure returned by the view itself (not an error handler)
+        client.post("/ml/predict", json={})
+        data = client.get("/error_stats").get_json()
+    assert data["1m"]["by_status"] == {"400": 1}
+    assert data["1m"]["by_route"] == {"/ml/predict": 1}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,411 @@
+# tests/test_firebase_operations.py
+
+import sys
+import os
+import datetime as DT
+import threading
+import time
+import bcrypt
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from server import create_app
+from database import firebase_operations
+from database.firebase_operations import alias_map
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app = create_app(app, testing=True)
+    app.config["JWT_SECRET_KEY"] = "test-secret"
+    JWTManager(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+
+@pytest.fixture
+def seeded(fake_firestore, monkeypatch):
+    """
+    One user linked to Apple Music, with counters zeroed after seeding.
+    """
+    # Cheap hashes; the cost factor is irrelevant to round trips.
+    salt = bcrypt.gensalt
+    monkeypatch.setattr(firebase_operations.bcrypt, "gensalt", lambda: salt(rounds=4))
+    # get_next_user_id updates the counter, so it has to exist already.
+    fake_firestore.document("counters/users").set({"seq": 0})
+    for app_id, app_name in ((1, "Spotify"), (2, "AppleMusic")):
+        fake_firestore.collection(alias_map["apps"]).document(str(app_id)).set(
+            {"app_id": app_id, "app_name": app_name}
+        )
+    user_id = firebase_operations.insert_user("user@example.com", "password")
+    firebase_operations.insert_userlinkedapps(user_id, 2, "apple-token", "", 0, "")
+    fake_firestore.reset_counters()
+    return fake_firestore
+
+
+def get_auth_headers(scopes=None):
+    if scopes is None:
+        scopes = ["apps"]
+    token = create_access_token(identity="user@example.com", additional_claims={"scopes": scopes})
+    return {"Authorization": f"Bearer {token}"}
+
+
+#############################################
+# Round trips per operation
+#############################################
+
+def test_query_is_one_read_round_trip(seeded):
+    assert firebase_operations.get_user_id_by_email("user@example.com") == 1
+    assert seeded.counters() == {"round_trips": {"read": 1}, "documents_read": 1, "documents_written": 0}
+
+
+def test_empty_query_is_still_billed_one_read(seeded):
+    assert firebase_operations.get_user_id_by_email("nobody@example.com") is None
+    assert seeded.counters()["documents_read"] == 1
+
+
+def test_insert_user_round_trips(seeded):
+    """
+    The id counter is one transaction (begin, read, commit) and the user
+    document one more write.
+    """
+    user_id = firebase_operations.insert_user("second@example.com", "password")
+    assert user_id == 2
+    assert seeded.round_trips == {"transaction": 2, "read": 1, "write": 1}
+    assert seeded.documents_written == 2
+
+
+def test_update_tokens_writes_each_matching_document(seeded):
+    firebase_operations.update_userlinkedapps_tokens("new-token", "new-refresh", 3600, 1, 2)
+    assert seeded.round_trips == {"read": 1, "write": 1}
+    assert firebase_operations.get_userlinkedapps_tokens(1, 2)[0]["access_token"] == "new-token"
+
+
+def test_concurrent_id_counter_does_not_lose_increments(fake_firestore):
+    fake_firestore.document("counters/users").set({"seq": 0})
+    ids = []
+
+    def worker():
+        for _ in range(10):
+            ids.append(firebase_operations.get_next_user_id(fake_firestore))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ids) == list(range(1, 41))
+
+
+def test_latency_is_charged_per_round_trip(seeded):
+    seeded.set_latency(read=0.05)
+    start = time.perf_counter()
+    firebase_operations.get_user_id_by_email("user@example.com")
+    firebase_operations.get_app_id_by_name("AppleMusic")
+    assert time.perf_counter() - start >= 0.1
+
+
+def test_unknown_latency_kind_is_rejected(fake_firestore):
+    with pytest.raises(ValueError):
+        fake_firestore.set_latency(query=0.1)
+
+
+#############################################
+# Round trips per endpoint
+#############################################
+
+def test_check_linked_app_round_trips(client, seeded):
+    """
+    User lookup, app lookup and token lookup: three reads, no writes.
+    """
+    payload = {"app_name": "AppleMusic", "user_email": "user@example.com"}
+    response = client.post("/apps/check_linked_app", json=payload, headers=get_auth_headers())
+    assert response.status_code == 200
+    assert response.get_json()["user_linked"] is True
+    assert seeded.round_trips == {"read": 3}
+
+
+#############################################
+# User chains
+#############################################
+
+def test_nested_helpers_count_as_one_operation(seeded, monkeypatch):
+    operations = []
+    monkeypatch.setattr(firebase_operations, "record_firestore_helper_call",
+                        lambda kind, helper: operations.append((kind, helper)))
+    firebase_operations.insert_user("other@example.com", "password")
+    firebase_operations.if_not_exists_insert_userlinkedapps_spotify(1, 1, "token", "refresh", "scope")
+    assert operations == [("write", "insert_user"), ("write", "if_not_exists_insert_userlinkedapps_spotify")]
+    # Outside a decorated helper, the inner one counts on its own.
+    firebase_operations.get_next_user_id()
+    assert operations[-1] == ("write", "get_next_user_id")
+
+
+def _chain_doc(fake_firestore, user_id=1):
+    return fake_firestore.collection(alias_map["userchains"]).document(str(user_id))
+
+
+def _history(fake_firestore, user_id=1):
+    docs = _chain_doc(fake_firestore, user_id).collection("history").stream()
+    return {doc.id: doc.to_dict() for doc in docs}
+
+
+def test_chain_update_round_trips(seeded):
+    """
+    The chain transaction (begin, one get_all of the chain, its month and a
+    summary counter shard, commit of all three), then the leaderboard
+    transaction (begin, summary read, commit).
+    """
+    firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    assert seeded.round_trips == {"transaction": 4, "read": 2}
+    assert seeded.documents_written == 4
+    chain = _chain_doc(seeded).get().to_dict()
+    assert "history" not in chain
+    assert (chain["chain_streak"], chain["history_count"]) == (1, 1)
+
+    # Same day, streaks unchanged: the leaderboard is left alone.
+    seeded.reset_counters()
+    firebase_operations.upsert_user_chain(1, {"action": "paused"})
+    assert seeded.round_trips == {"transaction": 2, "read": 1}
+
+
+def test_chain_history_goes_to_monthly_documents(seeded):
+    for action in ("started", "completed", "paused"):
+        result = firebase_operations.upsert_user_chain(1, {"action": action})
+    month = DT.datetime.utcnow().strftime("%Y-%m")
+    bucket = _history(seeded)[month]
+    assert [e["action"] for e in bucket["entries"]] == ["started", "completed", "paused"]
+    assert bucket["count"] == 3
+    chain = _chain_doc(seeded).get().to_dict()
+    assert chain == result
+    assert set(chain) == {"user_id", "chain_start_date", "chain_streak", "max_chain_streak",
+                          "last_update_date", "broken", "history_count", "in_summary"}
+    assert chain["history_count"] == 3
+
+
+def test_repeated_chain_action_is_recorded_once(seeded):
+    first = firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    seeded.reset_counters()
+    again = firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    assert again == first
+    assert seeded.documents_written == 0
+    month = DT.datetime.utcnow().strftime("%Y-%m")
+    assert _history(seeded)[month]["count"] == 1
+
+
+def test_concurrent_chain_updates_lose_nothing(seeded):
+    actions = [f"action-{i}" for i in range(8)]
+    threads = [
+        threading.Thread(target=firebase_operations.upsert_user_chain, args=(1, {"action": action}))
+        for action in actions + actions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    month = DT.datetime.utcnow().strftime("%Y-%m")
+    bucket = _history(seeded)[month]
+    assert sorted(e["action"] for e in bucket["entries"]) == actions
+    assert bucket["count"] == 8
+    assert _chain_doc(seeded).get().to_dict()["history_count"] == 8
+
+
+@pytest.mark.parametrize("days_ago,streak,max_streak,broken", [(1, 5, 7, False), (3, 1, 7, True)])
+def test_chain_streak_uses_field_transforms(seeded, days_ago, streak, max_streak, broken):
+    last = DT.datetime.utcnow() - DT.timedelta(days=days_ago)
+    _chain_doc(seeded).set({
+        "user_id": 1, "chain_start_date": last.date().isoformat(), "chain_streak": 4, "max_chain_streak": 7,
+        "last_update_date": last.isoformat(), "broken": False, "history_count": 4,
+    })
+    result = firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    chain = _chain_doc(seeded).get().to_dict()
+    assert chain == result
+    assert (chain["chain_streak"], chain["max_chain_streak"], chain["broken"]) == (streak, max_streak, broken)
+    assert chain["history_count"] == 5
+
+
+def test_inline_history_is_moved_to_monthly_documents(seeded):
+    today = DT.datetime.utcnow()
+    legacy = [
+        {"date": "2024-01-30", "action": "completed"},
+        {"date": "2024-01-30", "action": "completed"},
+        {"date": "2024-02-01", "action": "started"},
+    ]
+    _chain_doc(seeded).set({
+        "user_id": 1, "chain_start_date": "2024-01-30", "chain_streak": 1, "max_chain_streak": 2,
+        "last_update_date": "2024-02-01T10:00:00", "broken": False, "history": legacy,
+    })
+    firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    chain = _chain_doc(seeded).get().to_dict()
+    assert "history" not in chain and chain["history_count"] == 4
+    history = _history(seeded)
+    assert history["2024-01"]["entries"] == legacy[:2] and history["2024-01"]["count"] == 2
+    assert history["2024-01"]["keys"] == ["2024-01-30:completed"]
+    assert history["2024-02"]["entries"] == legacy[2:]
+    assert history[today.strftime("%Y-%m")]["count"] == 1
+
+
+def test_inline_history_counts_for_repeated_actions(seeded):
+    today = DT.datetime.utcnow().date().isoformat()
+    legacy = [{"date": today, "action": "completed"}]
+    _chain_doc(seeded).set({
+        "user_id": 1, "chain_start_date": today, "chain_streak": 1, "max_chain_streak": 1,
+        "last_update_date": today + "T08:00:00", "broken": False, "history": legacy,
+    })
+    seeded.reset_counters()
+    firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    assert seeded.documents_written == 0
+    firebase_operations.upsert_user_chain(1, {"action": "paused"})
+    chain = _chain_doc(seeded).get().to_dict()
+    assert chain["history_count"] == 2
+    month = DT.datetime.utcnow().strftime("%Y-%m")
+    assert [e["action"] for e in _history(seeded)[month]["entries"]] == ["completed", "paused"]
+
+
+def test_chain_history_endpoint(client, seeded):
+    for month, count in (("2024-01", 2), ("2024-03", 1), ("2024-02", 4)):
+        _chain_doc(seeded).collection("history").document(month).set(
+            {"user_id": 1, "month": month, "entries": [{"action": "completed"}] * count, "count": count}
+        )
+    response = client.post("/profile/chain_history", json={"months": 2}, headers=get_auth_headers(["me"]))
+    assert response.status_code == 200
+    assert [(m["month"], m["count"]) for m in response.get_json()] == [("2024-03", 1), ("2024-02", 4)]
+    bad = client.post("/profile/chain_history", json={"months": "many"}, headers=get_auth_headers(["me"]))
+    assert bad.status_code == 400
+
+
+def test_chain_status_still_lists_recent_history(client, seeded):
+    for action in ("started", "completed"):
+        firebase_operations.upsert_user_chain(1, {"action": action})
+    response = client.post("/profile/chain_status", headers=get_auth_headers(["me"]))
+    assert response.status_code == 200
+    assert [e["action"] for e in response.get_json()["history"]] == ["started", "completed"]
+
+
+#############################################
+# Chain summary
+#############################################
+
+def _seed_chain(fake_firestore, user_id, streak, max_streak, days_ago=1):
+    last = DT.datetime.utcnow() - DT.timedelta(days=days_ago)
+    _chain_doc(fake_firestore, user_id).set({
+        "user_id": user_id, "chain_start_date": last.date().isoformat(), "chain_streak": streak,
+        "max_chain_streak": max_streak, "last_update_date": last.isoformat(), "broken": False,
+        "history_count": streak,
+    })
+
+
+def test_streak_buckets():
+    labels = [firebase_operations.streak_bucket(n) for n in (1, 2, 3, 4, 7, 14, 15, 365, 366, 1000)]
+    assert labels == ["1", "2-3", "2-3", "4-7", "4-7", "8-14", "15-30", "181-365", "366+", "366+"]
+
+
+def test_summary_follows_chain_updates(seeded):
+    for user_id, (streak, max_streak) in enumerate([(1, 1), (3, 3), (7, 9), (2, 40)], start=1):
+        _seed_chain(seeded, user_id, streak, max_streak)
+    firebase_operations.rebuild_chain_summary()
+    for user_id in (1, 2, 3):
+        firebase_operations.upsert_user_chain(user_id, {"action": "completed"})
+    firebase_operations.upsert_user_chain(4, {"action": "completed"})
+    # A broken chain starts over.
+    _seed_chain(seeded, 5, 6, 6, days_ago=3)
+    firebase_operations.upsert_user_chain(5, {"action": "completed"})
+
+    summary = firebase_operations.get_chain_summary()
+    assert summary["users"] == 5
+    assert summary["chain_streak_histogram"] == {"1": 1, "2-3": 2, "4-7": 1, "8-14": 1}
+    assert summary["max_chain_streak_histogram"] == {"2-3": 1, "4-7": 2, "8-14": 1, "31-60": 1}
+    assert [e["user_id"] for e in summary["top_chain_streak"]] == [3, 2, 4, 1, 5]
+    assert [e["user_id"] for e in summary["top_max_chain_streak"]] == [4, 3, 5, 2, 1]
+    # The incremental summary matches one computed from scratch.
+    assert firebase_operations.rebuild_chain_summary() == summary
+
+
+def test_summary_counts_lapsed_chains_as_broken(seeded):
+    _seed_chain(seeded, 1, 5, 5, days_ago=1)
+    _seed_chain(seeded, 2, 9, 9, days_ago=3)
+    summary = firebase_operations.rebuild_chain_summary()
+    assert summary["chain_streak_histogram"] == {"4-7": 1, "0": 1}
+    assert [e["user_id"] for e in summary["top_chain_streak"]] == [1]
+    assert [e["user_id"] for e in summary["top_max_chain_streak"]] == [2, 1]
+
+    # The lapsed chain starts over and is live again.
+    firebase_operations.upsert_user_chain(2, {"action": "completed"})
+    summary = firebase_operations.get_chain_summary()
+    assert summary["chain_streak_histogram"] == {"1": 1, "4-7": 1}
+    assert [e["user_id"] for e in summary["top_chain_streak"]] == [1, 2]
+
+
+def test_chain_updates_fold_past_days_into_lapsed(seeded, monkeypatch):
+    monkeypatch.setattr(firebase_operations, "CHAIN_SUMMARY_SHARDS", 1)
+    today = DT.datetime.utcnow().date()
+    day = {n: (today - DT.timedelta(days=n)).isoformat() for n in (0, 1, 3, 5)}
+    for user_id, streak, days_ago in ((1, 5, 1), (2, 9, 3), (3, 2, 5)):
+        _seed_chain(seeded, user_id, streak, streak, days_ago=days_ago)
+        _chain_doc(seeded, user_id).update({"in_summary": True})
+    # As left by updates on those days, before any fold.
+    seeded.collection(alias_map["chainsummary"]).document("counts-00").set({
+        "users": 3, "total_actions": 16, "max_chain_streak_histogram": {"2-3": 1, "4-7": 1, "8-14": 1},
+        "chain_streak_by_day": {day[1]: {"4-7": 1}, day[3]: {"8-14": 1}, day[5]: {"2-3": 1}},
+    })
+
+    firebase_operations.upsert_user_chain(2, {"action": "completed"})
+    shard = seeded.collection(alias_map["chainsummary"]).document("counts-00").get().to_dict()
+    lapsed = firebase_operations.LAPSED
+    assert shard["chain_streak_by_day"] == {day[0]: {"1": 1}, day[1]: {"4-7": 1}, lapsed: {"2-3": 1}}
+    summary = firebase_operations.get_chain_summary()
+    assert summary["chain_streak_histogram"] == {"1": 1, "4-7": 1, "0": 1}
+    rebuilt = firebase_operations.rebuild_chain_summary()
+    for field in ("users", "total_actions", "chain_streak_histogram", "max_chain_streak_histogram"):
+        assert rebuilt[field] == summary[field]
+
+
+def test_summary_counts_are_sharded(seeded):
+    for user_id in range(1, 41):
+        firebase_operations.upsert_user_chain(user_id, {"action": "completed"})
+    shards = seeded.collection(alias_map["chainsummary"]).stream()
+    counts = [doc.to_dict()["users"] for doc in shards if doc.id.startswith("counts-")]
+    assert len(counts) > 1 and sum(counts) == 40
+    assert firebase_operations.get_chain_summary()["users"] == 40
+
+
+def test_leaderboard_keeps_the_best_chains(seeded, monkeypatch):
+    monkeypatch.setattr(firebase_operations, "CHAIN_LEADERBOARD_SIZE", 3)
+    for user_id in range(1, 7):
+        _seed_chain(seeded, user_id, user_id, user_id)
+        firebase_operations.upsert_user_chain(user_id, {"action": "completed"})
+    board = firebase_operations.get_chain_summary()["top_chain_streak"]
+    assert [(e["user_id"], e["chain_streak"]) for e in board] == [(6, 7), (5, 6), (4, 5)]
+
+
+def test_leaderboard_failure_keeps_the_chain_update(seeded, monkeypatch):
+    def contended(summary_ref, chain):
+        raise ValueError("Failed to commit transaction in 10 attempts.")
+
+    monkeypatch.setattr(firebase_operations, "_update_chain_leaderboard", contended)
+    result = firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    assert _chain_doc(seeded).get().to_dict() == result
+    assert firebase_operations.get_chain_summary()["users"] == 1
+
+
+def test_chain_leaderboard_endpoint_is_one_read(client, seeded):
+    firebase_operations.upsert_user_chain(1, {"action": "completed"})
+    seeded.reset_counters()
+    response = client.post("/profile/chain_leaderboard", headers=get_auth_headers(["me"]))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["users"] == 1 and body["top_chain_streak"][0]["user_id"] == 1
+    assert seeded.round_trips == {"read": 1}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,59 @@
+# tests/test_metrics.py
+
+import sys
+import os
+import pytest
+import requests
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from server import create_app
+from util import metrics
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app = create_app(app, testing=True)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+
+def test_provider_for_url():
+    assert metrics.provider_for_url("https://api.spotify.com/v1/me") == "spotify"
+    assert metrics.provider_for_url("https://accounts.spotify.com/api/token") == "spotify"
+    assert metrics.provider_for_url("https://www.googleapis.com/youtube/v3/videos") == "google"
+    assert metrics.provider_for_url("https://api.music.apple.com/v1/me") == "apple"
+    assert metrics.provider_for_url("http://127.0.0.1:5501/healthcheck") == "other"
+
+
+def test_outbound_wrapper_installed_once(app):
+    """Creating several apps must not stack wrappers on requests.Session."""
+    wrapper = requests.Session.request
+    create_app(Flask(__name__), testing=True)
+    assert requests.Session.request is wrapper
+    assert getattr(wrapper, "_metered", False)
+    assert getattr(wrapper, "_timed", False)
+
+
+def test_metrics_endpoint_exposes_route_histogram(client):
+    client.get("/healthcheck")
+    metrics.record_cache_lookup("spotify_playlist", hit=True)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_bucket{blueprint="util"' in body
+    assert 'route="/healthcheck"' in body
+    assert 'playlist_cache_requests_total{cache="spotify_playlist",result="hit"}' in body
+
+
+if __name__ == "__main__":
+    pytest.main()
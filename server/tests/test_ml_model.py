@@ -0,0 +1,434 @@
+# tests/test_ml_model.py
+
+import sys
+import os
+import subprocess
+import threading
+import time
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from server import create_app
+from models.batching import MicroBatcher
+from models import lookup_table
+from models.lookup_table import PomodoroLookupTable, build_table, check_table, load_lookup_table, save_table
+from models import serving
+from models.numpy_engine import TOLERANCE, compare_with_torch
+from models.patterns import MAX_SESSIONS, PATTERN_LIST, decode_prediction
+from models.scheduler import HybridScheduler, check_model_schedule, model_schedule
+from models.use_model import load_engine, predict, predict_many, torch_forward
+from util.playlist import fit_pattern, heuristic_schedule
+
+DURATIONS_MS = [0, 25 * 60000, 52 * 60000, 115 * 60000, 180 * 60000, 299 * 60000]
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app = create_app(app, testing=True)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+
+def test_predict_many_matches_predict():
+    minutes = [ms / 60000.0 for ms in DURATIONS_MS] + [i / 7 for i in range(0, 1500, 13)]
+    assert predict_many(minutes) == [predict(m) for m in minutes]
+    assert predict_many([]) == []
+
+
+def test_predict_batch_endpoint(client):
+    response = client.post("/ml/predict_batch", json={"data": DURATIONS_MS})
+    assert response.status_code == 200
+    predictions = response.get_json()["predictions"]
+    assert predictions == [client.post("/ml/predict", json={"data": ms}).get_json() for ms in DURATIONS_MS]
+
+
+@pytest.mark.parametrize("payload", [{}, {"data": []}, {"data": ["soon"]}, {"data": [1.0] * 1025}])
+def test_predict_batch_rejects_bad_payloads(client, payload):
+    assert client.post("/ml/predict_batch", json=payload).status_code == 400
+
+
+def test_predict_batch_rejects_unbounded_durations(client):
+    assert client.post("/ml/predict_batch", json={"data": [0, 24 * 3600 * 1000]}).status_code == 200
+    for value in ("-1", "86400001", "NaN", "Infinity", "-Infinity"):
+        response = client.post("/ml/predict_batch", data='{"data": [60000, %s]}' % value,
+                               content_type="application/json")
+        assert response.status_code == 400, value
+        assert response.get_json()["error"].startswith("data[1]")
+
+
+def test_batcher_coalesces_concurrent_calls():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        time.sleep(0.05)  # callers arriving meanwhile queue for the next batch
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, window=0.2, max_batch=64)
+    results = {}
+    start = threading.Barrier(8)
+
+    def worker(i):
+        start.wait()
+        results[i] = batcher.submit(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {i: i * 2 for i in range(8)}
+    # Every caller got its own result, from fewer calls than callers.
+    assert sum(len(c) for c in calls) == 8
+    assert len(calls) < 8
+
+
+def test_batcher_respects_max_batch():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(len(items)) or list(items), window=0.2, max_batch=2)
+    threads = [threading.Thread(target=batcher.submit, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(calls) <= 2
+    assert sum(calls) == 6
+
+
+def test_batcher_passes_errors_to_every_caller():
+    def fail(items):
+        raise ValueError("model unavailable")
+
+    batcher = MicroBatcher(fail, window=0.001)
+    with pytest.raises(ValueError, match="model unavailable"):
+        batcher.submit(1)
+
+
+def test_batcher_without_window_calls_directly():
+    batcher = MicroBatcher(lambda items: [threading.current_thread()], window=0)
+    assert batcher.submit(1) is threading.current_thread()
+    assert batcher.batches == 0
+
+
+def test_lone_call_does_not_wait_for_the_window():
+    batcher = MicroBatcher(lambda items: list(items), window=1.0)
+    batcher.submit(0)  # start the worker
+    started = time.perf_counter()
+    assert batcher.submit(1) == 1
+    assert time.perf_counter() - started < 0.5
+    assert batcher.batches == 2
+
+
+#############################################
+# Lookup table
+#############################################
+
+@pytest.fixture(scope="module")
+def table_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("table") / "pomodoro_table.npy")
+    save_table(build_table(max_seconds=1800), path)
+    return path
+
+
+def test_lookup_table_matches_live_model(table_path):
+    assert check_table(PomodoroLookupTable(table_path)) == []
+
+
+def test_lookup_table_only_covers_whole_seconds_in_range(table_path):
+    table = PomodoroLookupTable(table_path)
+    assert table.lookup(300000.0) == predict(5.0)
+    assert table.lookup(300500.0) is None
+    assert table.lookup(1801000.0) is None
+    assert table.lookup(-1000.0) is None
+
+
+def test_load_lookup_table_rebuilds_stale_tables(table_path, tmp_path, monkeypatch):
+    path = str(tmp_path / "table.npy")
+    save_table(build_table(max_seconds=10), path)
+    assert load_lookup_table(path, max_seconds=20).max_seconds == 10
+    monkeypatch.setattr(lookup_table, "model_digest", lambda model_path=None: "other weights")
+    assert load_lookup_table(path, max_seconds=20).max_seconds == 20
+
+
+def test_lookup_table_rebuild_is_atomic_and_runs_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "table.npy")
+    save_table(build_table(max_seconds=10), path)
+    mapped = PomodoroLookupTable(path)
+    before = mapped.rows.copy()
+
+    builds = []
+    real_build = lookup_table.build_table
+    monkeypatch.setattr(lookup_table, "model_digest", lambda model_path=None: "other weights")
+    monkeypatch.setattr(lookup_table, "build_table", lambda max_seconds: builds.append(max_seconds) or real_build(max_seconds))
+    loaded = []
+    threads = [threading.Thread(target=lambda: loaded.append(load_lookup_table(path, max_seconds=20)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert builds == [20]
+    assert [table.max_seconds for table in loaded] == [20] * 4
+    # The old mapping still reads the table it was opened on.
+    assert (mapped.rows == before).all()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+
+def test_predict_endpoints_use_lookup_table(client, table_path, monkeypatch):
+    from Blueprints import ml_model
+
+    live = [client.post("/ml/predict", json={"data": ms}).get_json() for ms in DURATIONS_MS]
+    monkeypatch.setattr(ml_model, "lookup_table", PomodoroLookupTable(table_path))
+    monkeypatch.setattr(ml_model, "batcher", None)  # any miss on /predict would fail
+    assert [client.post("/ml/predict", json={"data": ms}).get_json() for ms in DURATIONS_MS[:2]] == live[:2]
+    # Durations past the table fall back to the model.
+    assert client.post("/ml/predict_batch", json={"data": DURATIONS_MS}).get_json()["predictions"] == live
+
+
+#############################################
+# NumPy engine
+#############################################
+
+def test_numpy_engine_matches_torch():
+    result = compare_with_torch([i / 60.0 for i in range(0, 6 * 60 * 60 + 1, 7)])
+    assert result["max_error"] <= TOLERANCE
+    assert result["mismatches"] == []
+
+
+def test_numpy_engine_predictions_match_torch():
+    _, numpy_forward = load_engine("numpy")
+    _, torch_forward = load_engine("torch")
+    minutes = [ms / 60000.0 for ms in DURATIONS_MS]
+    assert numpy_forward(minutes) == torch_forward(minutes)
+    assert numpy_forward([]) == ([], [], [])
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        load_engine("tensorflow")
+
+
+def test_numpy_engine_does_not_import_torch():
+    code = (
+        "import sys; from models.use_model import ENGINE, predict; predict(115.0); "
+        "print(ENGINE, 'torch' in sys.modules)"
+    )
+    server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    env = dict(os.environ, ML_ENGINE="numpy", OUTPUT_MODE="quiet", PYTHONPATH=server_dir)
+    output = subprocess.run([sys.executable, "-c", code], cwd=server_dir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["numpy", "False"]
+
+
+#############################################
+# Compiled runtimes and CPU tuning
+#############################################
+
+GRID = [i / 60.0 for i in range(0, 6 * 60 * 60 + 1, 11)]
+
+
+def test_torchscript_matches_eager(tmp_path):
+    _, eager_forward = load_engine("torch")
+    scripted = serving.load_torchscript(path=str(tmp_path / "model.pt"))
+    assert torch_forward(scripted, GRID) == eager_forward(GRID)
+
+
+def test_torchscript_is_reexported_for_new_weights(tmp_path, monkeypatch):
+    path = str(tmp_path / "model.pt")
+    serving.load_torchscript(path=path)
+    exported = os.path.getmtime(path)
+    serving.load_torchscript(path=path)
+    assert os.path.getmtime(path) == exported
+    monkeypatch.setattr(serving, "model_digest", lambda model_path=None: "other weights")
+    os.utime(path, (exported - 10, exported - 10))
+    serving.load_torchscript(path=path)
+    assert os.path.getmtime(path) > exported - 10
+
+
+def test_torchscript_is_exported_once_by_concurrent_workers(tmp_path, monkeypatch):
+    path = str(tmp_path / "model.pt")
+    exports = []
+    real_export = serving.export_torchscript
+    monkeypatch.setattr(serving, "export_torchscript",
+                        lambda model_path, path: exports.append(path) or real_export(model_path, path))
+    threads = [threading.Thread(target=serving.load_torchscript, kwargs={"path": path}) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert exports == [path]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+
+def test_onnx_matches_eager(tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    _, eager_forward = load_engine("torch")
+    model = serving.load_onnx(threads=1, path=str(tmp_path / "model.onnx"))
+    assert model.forward(GRID) == eager_forward(GRID)
+
+
+@pytest.mark.parametrize("num_threads,workers,cpus,expected", [
+    (3, 4, 8, 3),   # explicit setting wins
+    (0, 4, 8, 2),   # CPUs shared between workers
+    (0, 1, 8, 8),
+    (0, 16, 8, 1),  # never below one thread
+])
+def test_intra_op_threads(monkeypatch, num_threads, workers, cpus, expected):
+    monkeypatch.setattr(serving.os, "cpu_count", lambda: cpus)
+    assert serving.intra_op_threads(num_threads, workers) == expected
+
+
+def test_intra_op_threads_reads_worker_count(monkeypatch):
+    monkeypatch.setattr(serving.os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    assert serving.intra_op_threads() == 4
+
+
+def test_torch_engines_pin_threads():
+    import torch
+
+    previous = torch.get_num_threads()
+    try:
+        load_engine("torch", threads=1)
+        assert torch.get_num_threads() == 1
+    finally:
+        torch.set_num_threads(previous)
+
+
+def test_warm_up_runs_every_batch_size():
+    sizes = []
+    serving.warm_up(lambda durations: sizes.append(len(durations)), batches=(1, 4), rounds=2)
+    assert sizes == [1, 4, 1, 4]
+
+
+def _prediction(pattern, sessions, short_break, long_break=None):
+    return {"duration_minutes": 0, "pattern": pattern, "work_sessions": sessions,
+            "short_break": short_break, "long_break": long_break}
+
+
+def test_model_schedule_is_checked_against_the_duration():
+    good = model_schedule(_prediction("WSWSWL", [30, 30, 30], 5, 15), 115.0)
+    assert good["final_sum"] == 115 and good["loss"] == 0
+    fitted, _ = fit_pattern(115.0, "WSWSWL")
+    assert check_model_schedule(good, fitted, 0.0, tolerance=0.0) == []
+
+    # Only the pattern counts towards the loss: its lengths are refitted.
+    long = model_schedule(_prediction("WSW", [30, 30], 5), 110.0)
+    fitted, _ = fit_pattern(110.0, "WSW")
+    assert check_model_schedule(long, fitted, 0.0, tolerance=5.0) == ["WSW fits 110 min with loss 25.00 (heuristic 0.00)"]
+
+    repeated = model_schedule(_prediction("2×WSWSWL", [25, 25, 25], 5, 10), 100.0)
+    fitted, _ = fit_pattern(100.0, "2×WSWSWL")
+    assert check_model_schedule(repeated, fitted, 0.0, tolerance=0.0) == ["3 work sessions for 6 in the pattern"]
+    inverted = model_schedule(_prediction("WSWSWL", [30, 30, 30], 10, 5), 115.0)
+    fitted, _ = fit_pattern(115.0, "WSWSWL")
+    assert check_model_schedule(inverted, fitted, 0.0, tolerance=5.0) == ["long break not longer than the short break"]
+
+
+def test_decode_prediction_expands_repeated_patterns():
+    pattern_idx = PATTERN_LIST.index("2×WSWSWL")
+    decoded = decode_prediction(300.0, pattern_idx, [25] * MAX_SESSIONS, [5, 15])
+    assert decoded["work_sessions"] == [25] * 6 and decoded["long_break"] == 15
+
+
+def test_scheduler_serves_heuristic_then_model():
+    calls = []
+    model_ready = threading.Event()
+
+    def predict_fn(minutes):
+        model_ready.wait(5)
+        calls.append(minutes)
+        return _prediction("WSW", [25, 25], 5)
+
+    scheduler = HybridScheduler(predict_fn)
+    first = scheduler.schedule(55.2)
+    assert (first["source"], first["refinement"]) == ("heuristic", "pending")
+    assert first["bucket_minutes"] == 55.0
+    assert first["schedule"]["final_sum"] == 55
+    model_ready.set()
+    scheduler.wait(timeout=5)
+    again = scheduler.schedule(54.9)
+    assert (again["source"], again["refinement"]) == ("model", "accepted")
+    assert again["schedule"]["work_sessions"] == [25, 25]
+    assert calls == [55.0]
+
+
+def test_scheduler_keeps_heuristic_when_model_is_rejected_or_fails():
+    scheduler = HybridScheduler(lambda minutes: _prediction("WSW", [60], 5), background=False)
+    rejected = scheduler.schedule(55)
+    assert (rejected["source"], rejected["refinement"]) == ("heuristic", "rejected")
+    assert rejected["problems"]
+
+    def broken(minutes):
+        raise RuntimeError("model unavailable")
+
+    failed = HybridScheduler(broken, background=False).schedule(55)
+    assert (failed["source"], failed["refinement"], failed["problems"]) == ("heuristic", "failed", [])
+
+
+def test_scheduler_rejects_patterns_that_fit_worse_than_the_heuristic():
+    # Eight work sessions and their breaks take at least 90 min.
+    scheduler = HybridScheduler(lambda minutes: _prediction("2×WSWSWSWL", [10] * 8, 5, 10), background=False)
+    answer = scheduler.schedule(55)
+    assert (answer["source"], answer["refinement"]) == ("heuristic", "rejected")
+    assert answer["schedule"]["loss"] == 0
+    assert answer["problems"] == ["2×WSWSWSWL fits 55 min with loss 35.00 (heuristic 0.00)"]
+
+
+def test_scheduler_adopts_patterns_that_beat_the_heuristic():
+    # The quick heuristic leaves 20 min unplanned at 6 h; the model's
+    # pattern, fitted exactly, plans all of it.
+    scheduler = HybridScheduler(lambda minutes: _prediction("2×WSWSWSWL", [35] * 8, 10, 25), background=False)
+    answer = scheduler.schedule(360)
+    assert (answer["source"], answer["refinement"]) == ("model", "accepted")
+    assert answer["schedule"]["loss"] == 0 < heuristic_schedule(360.0)[1]
+
+    # Answers are fitted to the requested duration, not the bucket's.
+    other = scheduler.schedule(360.4)
+    assert (other["bucket_minutes"], other["schedule"]["total_duration"]) == (360.0, 360.4)
+
+
+def test_scheduler_evicts_least_recently_used_buckets():
+    calls = []
+    scheduler = HybridScheduler(lambda minutes: calls.append(minutes) or _prediction("WSW", [25, 25], 5),
+                                max_entries=2, background=False)
+    for minutes in (30, 40, 30, 50, 30, 40):
+        scheduler.schedule(minutes)
+    assert calls == [30, 40, 50, 40]
+
+
+def test_schedule_endpoint(client):
+    from Blueprints.ml_model import scheduler
+
+    scheduler.clear()
+    response = client.post("/ml/schedule", json={"data": 115 * 60000})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["bucket_minutes"] == 115 and body["schedule"]["loss"] == 0
+    scheduler.wait(timeout=10)
+    refined = client.post("/ml/schedule", json={"data": 115 * 60000 + 10000}).get_json()
+    assert refined["refinement"] in ("accepted", "rejected")
+    assert client.post("/ml/schedule", json={"data": -1}).status_code == 400
+    assert client.post("/ml/schedule", json={}).status_code == 400
+
+
+def test_schedule_endpoint_rejects_unbounded_durations(client):
+    assert client.post("/ml/schedule", json={"data": 24 * 3600 * 1000}).status_code == 200
+    assert client.post("/ml/schedule", json={"data": 24 * 3600 * 1000 + 1}).status_code == 400
+    assert client.post("/ml/schedule", json={"data": 6e9}).status_code == 400
+    for value in ("NaN", "Infinity", "-Infinity"):
+        response = client.post("/ml/schedule", data='{"data": %s}' % value, content_type="application/json")
+        assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,105 @@
+# tests/test_playlist.py
+
+import itertools
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from util.playlist import (
+    exact_pomodoro_playlist,
+    format_minutes_to_mmss,
+    optimized_pomodoro_playlist,
+    optimized_pomodoro_playlists,
+    parse_pattern,
+    search_schedule,
+)
+
+DURATIONS = ["0:00", "4:59", "25:00", "57:30", "1:55:00", "115:00", "3:07:45", "12:00:00"]
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"work_default": 50, "short_break_default": 10, "long_break_default": 20, "max_work_allowed": 60},
+    {"penalty_weight": 3.0, "code_format": True},
+])
+def test_bulk_matches_single(params):
+    expected = [optimized_pomodoro_playlist(d, **params) for d in DURATIONS]
+    assert optimized_pomodoro_playlists(DURATIONS, **params) == expected
+
+
+def test_bulk_of_nothing():
+    assert optimized_pomodoro_playlists([]) == []
+
+
+def test_cached_schedule_is_not_shared():
+    first = optimized_pomodoro_playlist("1:55:00")
+    first["work_sessions"].append(99)
+    first["sequence"] = "changed"
+    second = optimized_pomodoro_playlist("115:00")
+    assert 99 not in second["work_sessions"]
+    assert second["sequence"] != "changed"
+    assert second["input_duration_str"] == "115:00"
+
+
+def test_parse_pattern():
+    assert parse_pattern("2×WSWSWL") == {"pattern": "2×WSWSWL", "w": 6, "s": 4, "l": 2, "tokens": "WSWSWL" * 2}
+    assert parse_pattern("WSWSWSWL+WSWS")["s"] == 5
+    assert parse_pattern("3xWS+W")["tokens"] == "WSWSWSW"
+    for bad in ("", "WSX", "0×WS", "SL", "W++W"):
+        with pytest.raises(ValueError):
+            parse_pattern(bad)
+
+
+def _brute_force(T, catalogue, penalty_weight):
+    """Every combination the exact search may choose, with its loss."""
+    best = None
+    for text in catalogue:
+        pattern = parse_pattern(text)
+        for short in range(5, 16, 5):
+            for long in (range(10, 31, 5) if pattern["l"] else [0]):
+                for sessions in itertools.combinations_with_replacement(range(5, int(T) + 10, 5), pattern["w"]):
+                    total = sum(sessions) + pattern["s"] * short + pattern["l"] * long
+                    loss = abs(T - total) + penalty_weight * sum(max(0, w - 35) for w in sessions)
+                    best = loss if best is None else min(best, loss)
+    return best
+
+
+@pytest.mark.parametrize("penalty_weight", [1.0, 0.3, 2.0])
+def test_search_is_exact(penalty_weight):
+    catalogue = ("WSW", "WSWSWL", "WL")
+    for T in (11.1, 37.0, 52.5, 81.4, 99.9, 140.0):
+        schedule, loss = search_schedule(T, catalogue, penalty_weight=penalty_weight)
+        assert loss == pytest.approx(_brute_force(T, catalogue, penalty_weight))
+        pattern = parse_pattern(schedule["sequence"])
+        breaks = pattern["s"] * (schedule["short_break"] or 0) + pattern["l"] * (schedule["long_break"] or 0)
+        assert schedule["final_sum"] == sum(schedule["work_sessions"]) + breaks
+
+
+def test_exact_never_worse_than_heuristic():
+    # Below 15 minutes the heuristic may use 0-minute sessions.
+    for seconds in range(15 * 60, 12 * 60 * 60, 97):
+        duration = format_minutes_to_mmss(seconds / 60)
+        assert exact_pomodoro_playlist(duration)["loss"] <= optimized_pomodoro_playlist(duration)["loss"] + 1e-9
+
+
+def test_search_scales_to_long_durations():
+    # Work splits are even and computed in closed form, not by a table
+    # quadratic in the duration.
+    schedule, loss = search_schedule(20000.0, penalty_weight=0.5)
+    assert schedule["final_sum"] == 20000
+    assert max(schedule["work_sessions"]) - min(schedule["work_sessions"]) <= 5
+    assert loss == 0.5 * sum(w - 35 for w in schedule["work_sessions"])
+
+
+def test_exact_uses_the_catalogue():
+    schedule = exact_pomodoro_playlist("1:55:00", catalogue=["2×WS+W"])
+    assert schedule["sequence"] == "2×WS+W"
+    assert len(schedule["work_sessions"]) == 3
+    assert schedule["long_break"] is None
+    assert schedule["loss"] == 0
+    assert exact_pomodoro_playlist("115:00", code_format=True).startswith("115:00:")
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,130 @@
+# tests/test_round_trip_budgets.py
+
+import sys
+import os
+import bcrypt
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from server import create_app
+from benchmarks.provider_stubs import USER_PLAYLISTS
+from database import firebase_operations
+from database.firebase_operations import alias_map
+from util import youtube
+from util.playlist import optimized_pomodoro_playlist
+from util.budget import RoundTripBudgetExceeded, round_trip_budget
+
+EMAIL = "user@example.com"
+
+# Most Firestore reads, Firestore writes and outbound provider calls each
+# route may make for one request against the seeded user. Raise a budget
+# only for a deliberate change; an unexpected increase is usually a new
+# per-item lookup.
+ROUTE_BUDGETS = {
+    # User, app and token lookups, then the Spotify profile.
+    ("/apps/check_linked_app", "apps"): dict(reads=3, writes=0, outbound=1),
+    # User and token lookups, token check, one page of playlists.
+    ("/spotify/playlists", "spotify"): dict(reads=2, writes=0, outbound=2),
+    # Token refresh updates the YouTube and Google API links (a query and a
+    # write each), then playlists and channels, and for each of the two
+    # playlists its item pages (50 per page; the stubs hold 24 and 101
+    # items) plus one video-details call.
+    ("/youtube-music/playlists", "youtube"): dict(reads=4, writes=1, outbound=9),
+    # The library listing plus one track listing per playlist; Apple Music
+    # has no batch endpoint for library playlist tracks.
+    ("/apple-music/playlists", "apple"): dict(reads=2, writes=0, outbound=1 + USER_PLAYLISTS),
+    ("/profile/view", "me"): dict(reads=2, writes=0, outbound=0),
+}
+
+PAYLOADS = {
+    "/apps/check_linked_app": {"app_name": "Spotify", "user_email": EMAIL},
+}
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app = create_app(app, testing=True)
+    app.config["JWT_SECRET_KEY"] = "test-secret"
+    JWTManager(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+
+@pytest.fixture
+def seeded(fake_firestore, provider_stubs, monkeypatch):
+    """
+    A user linked to Spotify, Apple Music and YouTube Music, with a profile.
+    Playlist caches start cold so every run pays for the full fan-out.
+    """
+    monkeypatch.setattr(youtube, "playlist_cache", {})
+    salt = bcrypt.gensalt
+    monkeypatch.setattr(firebase_operations.bcrypt, "gensalt", lambda: salt(rounds=4))
+    fake_firestore.document("counters/users").set({"seq": 0})
+    for app_id, app_name in ((1, "Spotify"), (2, "AppleMusic"), (3, "YoutubeMusic"), (4, "Google API")):
+        fake_firestore.collection(alias_map["apps"]).document(str(app_id)).set(
+            {"app_id": app_id, "app_name": app_name}
+        )
+    user_id = firebase_operations.insert_user(EMAIL, "password")
+    for app_id in (1, 2, 3):
+        firebase_operations.insert_userlinkedapps(user_id, app_id, f"token-{app_id}", f"refresh-{app_id}", 0, "")
+    fake_firestore.collection(alias_map["userprofiles"]).add(
+        {"user_id": user_id, "first_name": "Load", "last_name": "User", "avatar_url": "", "bio": ""}
+    )
+    fake_firestore.reset_counters()
+    return fake_firestore
+
+
+def get_auth_headers(scope):
+    token = create_access_token(identity=EMAIL, additional_claims={"scopes": [scope]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("route,scope", list(ROUTE_BUDGETS), ids=[route for route, _ in ROUTE_BUDGETS])
+def test_route_stays_within_budget(client, seeded, route, scope):
+    payload = PAYLOADS.get(route, {"user_email": EMAIL})
+    with round_trip_budget(**ROUTE_BUDGETS[route, scope]):
+        response = client.post(route, json=payload, headers=get_auth_headers(scope))
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def test_apple_playlists_carry_pomodoro_schedules(client, seeded):
+    response = client.post("/apple-music/playlists", json={"user_email": EMAIL}, headers=get_auth_headers("apple"))
+    playlists = response.get_json()["data"]
+    assert playlists
+    for playlist in playlists:
+        assert playlist["pomodoro_schedule"] == optimized_pomodoro_playlist(playlist["formatted_duration"])
+
+
+def test_budget_reports_what_was_used(seeded):
+    with pytest.raises(RoundTripBudgetExceeded, match="reads: 2 > 1"):
+        with round_trip_budget(reads=1):
+            firebase_operations.get_user_id_by_email(EMAIL)
+            firebase_operations.get_app_id_by_name("Spotify")
+
+
+def test_budget_as_decorator(seeded):
+    @round_trip_budget(reads=1, writes=0)
+    def lookup():
+        return firebase_operations.get_user_id_by_email(EMAIL)
+
+    assert lookup() == 1
+
+    @round_trip_budget(reads=0)
+    def too_many():
+        return firebase_operations.get_user_id_by_email(EMAIL)
+
+    with pytest.raises(RoundTripBudgetExceeded):
+        too_many()
+
+
+if __name__ == "__main__":
+    pytest.main()
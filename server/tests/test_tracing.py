@@ -0,0 +1,66 @@
+# tests/test_tracing.py
+
+import sys
+import os
+import time
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from server import create_app
+from util import tracing
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app = create_app(app, testing=True)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+
+def test_timed_is_noop_outside_request():
+    """Timing blocks must not fail when no trace is active."""
+    with tracing.timed("firestore"):
+        pass
+    assert tracing.current_request_id() is None
+
+
+def test_timed_charges_exclusive_time():
+    """Nested categories are not double counted in the outer category."""
+    trace = tracing.start_trace("abc")
+    try:
+        with tracing.timed("firestore"):
+            with tracing.timed("bcrypt"):
+                time.sleep(0.02)
+    finally:
+        tracing.end_trace()
+    assert trace["timings"]["bcrypt"] >= 0.02
+    assert trace["timings"]["firestore"] < 0.02
+
+
+def test_request_record_and_request_id(client, monkeypatch):
+    """Each request emits one structured record and echoes its request ID."""
+    records = []
+    monkeypatch.setattr(tracing.request_logger, "info", records.append)
+
+    response = client.get("/healthcheck", headers={"X-Request-ID": "req-123"})
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "req-123"
+
+    assert len(records) == 1
+    record = records[0]
+    assert record["request_id"] == "req-123"
+    assert record["route"] == "/healthcheck"
+    assert record["status"] == 200
+    assert set(record["timings_ms"]) == set(tracing.TIMING_CATEGORIES)
+
+
+if __name__ == "__main__":
+    pytest.main()
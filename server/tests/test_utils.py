@@ -9,6 +9,7 @@ from util.utils import (
     obfuscate,
     get_email_username,
 )
+from util.logit import get_console, NullConsole
 
 
 def test_ms2FormattedDuration():
@@ -32,5 +33,14 @@ def test_get_email_username():
     assert get_email_username("invalid") is None
 
 
+def test_get_console_is_silent_outside_gui_mode(monkeypatch):
+    """CmdGUI is only rendered when OUTPUT_MODE=gui."""
+    monkeypatch.setattr("util.logit.settings.output_mode", "console", raising=False)
+    console = get_console()
+    assert isinstance(console, NullConsole)
+    console.log("message", level="error")
+    console.status("message", status="error")
+
+
 if __name__ == "__main__":
     pytest.main()
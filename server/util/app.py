@@ -7,6 +7,9 @@ from flask_cors import CORS
 from util.logit import get_logger
 from util.blueprints import register_blueprints
 from util.error_handlers import register_error_handlers
+from util.tracing import register_request_tracing
+from util.metrics import register_metrics
+from util.profiler import register_route_profiling
 
 
 def create_app(app: Flask, testing=False):
@@ -24,6 +27,7 @@ def create_app(app: Flask, testing=False):
     app.config["JWT_SECRET_KEY"] = settings.jwt_secret_key
     app.config["SWAGGER_URL"] = "/api/docs"
     app.config["API_URL"] = "/static/swagger.json"
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = settings.static_max_age
     app.config["SECRET_KEY"] = settings.SECRET_KEY
     app.config["PREFERRED_URL_SCHEME"] = "https"
     app.config["TESTING"] = testing
@@ -33,6 +37,15 @@ def create_app(app: Flask, testing=False):
     # Add logging to the root logger
     logger = get_logger("logs", "Service")
 
+    # Structured per-request timing records (logs/Requests.jsonl)
+    app = register_request_tracing(app)
+
+    # Prometheus metrics (served at /metrics)
+    app = register_metrics(app)
+
+    # Opt-in cProfile capture of the slowest requests per route
+    app = register_route_profiling(app)
+
     # Middleware to log all requests
 
     def log_request():
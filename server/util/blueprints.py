@@ -12,6 +12,7 @@ from Blueprints.spotify_micro_service import SpotifyMicroService_bp
 from Blueprints.lyrics import lyrics_bp
 from Blueprints.youtube_music import youtubeMusic_bp
 from Blueprints.ml_model import mlModel_bp
+from Blueprints.metrics import metrics_bp
 
 
 def register_blueprints(app: Flask, testing=False):
@@ -41,5 +42,6 @@ def register_blueprints(app: Flask, testing=False):
         url_prefix=app.config["SWAGGER_URL"])
 
     app.register_blueprint(util_bp, url_prefix="/")
+    app.register_blueprint(metrics_bp, url_prefix="/")
 
     return app
@@ -0,0 +1,83 @@
+from functools import wraps
+from util.metrics import OUTBOUND_REQUESTS, install_outbound_metrics
+
+
+class RoundTripBudgetExceeded(AssertionError):
+    pass
+
+
+def _outbound_calls() -> int:
+    return int(sum(
+        sample.value
+        for metric in OUTBOUND_REQUESTS.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    ))
+
+
+def _firestore_counts(db) -> tuple:
+    round_trips = db.counters()["round_trips"]
+    reads = round_trips.get("read", 0)
+    writes = round_trips.get("write", 0) + round_trips.get("transaction", 0)
+    return reads, writes
+
+
+class round_trip_budget:
+    """
+    Context manager / decorator asserting that a block makes at most
+    `reads` Firestore reads, `writes` Firestore writes and `outbound`
+    outbound provider calls. A limit left as None is not checked.
+
+    Firestore round trips are taken from the counting client behind
+    database.firebase_operations (the in-memory fake in tests); a
+    transaction's begin and commit count as writes. Outbound calls are taken
+    from the outbound_requests_total metric, so they are counted however
+    the calls are answered.
+
+        with round_trip_budget(reads=3, writes=0, outbound=1):
+            client.post("/apps/check_linked_app", json=payload)
+
+        @round_trip_budget(reads=2)
+        def test_view_profile(client): ...
+
+    Exceeding any limit raises RoundTripBudgetExceeded, an AssertionError
+    listing what was used against the budget.
+    """
+
+    def __init__(self, reads: int = None, writes: int = None, outbound: int = None, db=None):
+        self.limits = {"reads": reads, "writes": writes, "outbound": outbound}
+        self.db = db
+        self.used = {}
+
+    def __enter__(self):
+        if self.db is None:
+            from database import firebase_operations
+
+            self.db = firebase_operations.DB
+        if not hasattr(self.db, "counters"):
+            raise TypeError("round_trip_budget needs a Firestore client that counts round trips")
+        install_outbound_metrics()
+        self._start = _firestore_counts(self.db) + (_outbound_calls(),)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _firestore_counts(self.db) + (_outbound_calls(),)
+        self.used = dict(zip(("reads", "writes", "outbound"), (e - s for s, e in zip(self._start, end))))
+        if exc_type is not None:
+            return False
+        over = [
+            f"{name}: {self.used[name]} > {limit}"
+            for name, limit in self.limits.items()
+            if limit is not None and self.used[name] > limit
+        ]
+        if over:
+            raise RoundTripBudgetExceeded(f"Round-trip budget exceeded ({', '.join(over)}); used {self.used}")
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with round_trip_budget(db=self.db, **self.limits):
+                return fn(*args, **kwargs)
+
+        return wrapper
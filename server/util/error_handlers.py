@@ -1,4 +1,5 @@
 from flask import Flask
+from util.error_stats import register_error_stats
 from helper.error import (
     errors_bp,
     bad_request,
@@ -24,4 +25,7 @@ def register_error_handlers(app: Flask, testing=False):
     app.register_error_handler(429, too_many_requests)
     app.register_error_handler(500, internal_server_error)
 
+    # Windowed error counts shared across workers (served at /error_stats)
+    app = register_error_stats(app)
+
     return app
@@ -1,10 +1,10 @@
-from cmd_gui_kit import CmdGUI
 import traceback
-from util.logit import get_logger
+from util.logit import get_logger, get_console
+from util.tracing import current_request_id
 import os
 
-# Initialize CmdGUI for visual feedback
-gui = CmdGUI()
+# Initialize CmdGUI for visual feedback (rendered only when OUTPUT_MODE=gui)
+gui = get_console()
 
 logger = get_logger("logs", "Error")
 
@@ -40,5 +40,10 @@ def log_error(e):
     # Append the error type and message
     # e.g. "module.func <--- | Error : RuntimeError: Something went wrong!"
     chain += f"\n{type(e).__name__}: {str(e)}"
+
+    # Tie the error to its structured request record, if any
+    request_id = current_request_id()
+    if request_id:
+        chain = f"[request_id={request_id}] {chain}"
     gui.log(chain, level="error")
     logger.error(chain)
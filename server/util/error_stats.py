@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from flask import Flask, request
+from config.config import settings
+from util.logit import get_logger
+
+logger = get_logger("logs", "ErrorStats")
+
+# Sliding windows reported by /error_stats, in seconds.
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+RETENTION = max(WINDOWS.values())
+FLUSH_INTERVAL = 1.0  # seconds between background flushes to SQLite
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class ErrorStatsStore:
+    """
+    Error counters per (second, status code, route) shared by every worker
+    through one SQLite file, so /error_stats reports the same numbers no
+    matter which gunicorn worker answers.
+
+    The hot path (`record`) only appends to a deque, which is atomic in
+    CPython; a per-process background thread drains it and upserts
+    aggregated per-second buckets. Rows older than the largest window are
+    pruned on flush.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.pending = deque()
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS error_events (
+                    bucket INTEGER NOT NULL,
+                    status INTEGER NOT NULL,
+                    route TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, status, route)
+                )
+                """
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------------------------
+    # Hot path
+    # ---------------------------
+
+    def record(self, status: int, route: str, now: float = None):
+        self.pending.append((int(now if now is not None else time.time()), status, route))
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    # ---------------------------
+    # Background flushing
+    # ---------------------------
+
+    def _start_flusher(self):
+        # Threads do not survive fork(), so each worker starts its own.
+        with self._flush_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        thread = threading.Thread(target=self._flush_forever, name="error-stats-flusher", daemon=True)
+        thread.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Error stats flush failed: {e}")
+
+    def flush(self, now: float = None):
+        """
+        Drains pending events into SQLite and prunes expired buckets.
+        """
+        with self._flush_lock:
+            batch = Counter()
+            while True:
+                try:
+                    batch[self.pending.popleft()] += 1
+                except IndexError:
+                    break
+            cutoff = int(now if now is not None else time.time()) - RETENTION
+            conn = self._connect()
+            try:
+                with conn:
+                    if batch:
+                        conn.executemany(
+                            """
+                            INSERT INTO error_events (bucket, status, route, count)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT (bucket, status, route)
+                            DO UPDATE SET count = count + excluded.count
+                            """,
+                            [(bucket, status, route, n) for (bucket, status, route), n in batch.items()],
+                        )
+                    conn.execute("DELETE FROM error_events WHERE bucket < ?", (cutoff,))
+            finally:
+                conn.close()
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+
+    def snapshot(self, now: float = None) -> dict:
+        """
+        Returns totals per status code and per route for each sliding window,
+        aggregated across all workers sharing the database.
+        """
+        now = int(now if now is not None else time.time())
+        self.flush(now)
+        result = {}
+        conn = self._connect()
+        try:
+            for name, seconds in WINDOWS.items():
+                since = now - seconds
+                by_status = dict(
+                    conn.execute(
+                        "SELECT status, SUM(count) FROM error_events WHERE bucket > ? GROUP BY status",
+                        (since,),
+                    ).fetchall()
+                )
+                by_route = dict(
+                    conn.execute(
+                        "SELECT route, SUM(count) FROM error_events WHERE bucket > ? GROUP BY route",
+                        (since,),
+                    ).fetchall()
+                )
+                result[name] = {
+                    "total": sum(by_status.values()),
+                    "by_status": {str(status): n for status, n in sorted(by_status.items())},
+                    "by_route": dict(sorted(by_route.items(), key=lambda item: -item[1])),
+                }
+        finally:
+            conn.close()
+        return result
+
+
+error_stats = ErrorStatsStore(settings.error_stats_db)
+
+
+def register_error_stats(app: Flask):
+    """
+    Records every 4xx/5xx response, including those produced by the error
+    handlers, against its status code and route template.
+    """
+
+    @app.after_request
+    def record_error_response(response):
+        if response.status_code >= 400:
+            rule = request.url_rule
+            error_stats.record(
+                response.status_code,
+                rule.rule if rule is not None else UNMATCHED_ROUTE,
+            )
+        return response
+
+    return app
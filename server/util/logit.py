@@ -1,5 +1,7 @@
 import os
+import json
 import logging
+from config.config import settings
 
 
 def check_log_folder(LOG_DIR: str = "logs") -> None:
@@ -57,9 +59,84 @@ def get_logger(LOG_DIR: str, logger_name: str) -> logging.Logger:
     console_handler.setFormatter(formatter)
 
     # Add handlers to the logger, but avoid adding duplicates.
+    # In "quiet" output mode nothing is written to the terminal.
     if not logger.handlers:
         logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        if settings.output_mode != "quiet":
+            logger.addHandler(console_handler)
+
+    logger.propagate = False
+
+    return logger
+
+
+class NullConsole:
+    """
+    Stand-in for CmdGUI when terminal rendering is disabled. Every message
+    passed to it is already mirrored to a logger by the caller, so dropping
+    it here loses nothing and costs a no-op call.
+    """
+
+    def log(self, *args, **kwargs) -> None:
+        pass
+
+    def status(self, *args, **kwargs) -> None:
+        pass
+
+
+def get_console():
+    """
+    Returns a CmdGUI instance when OUTPUT_MODE is "gui", otherwise a NullConsole.
+    """
+    if settings.output_mode == "gui":
+        from cmd_gui_kit import CmdGUI
+
+        return CmdGUI()
+    return NullConsole()
+
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Formats each record as a single JSON object. Dict messages are merged into
+    the record; anything else is stored under "message".
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+        }
+        if isinstance(record.msg, dict):
+            payload.update(record.msg)
+        else:
+            payload["message"] = record.getMessage()
+        return json.dumps(payload, default=str)
+
+
+def get_json_logger(LOG_DIR: str, logger_name: str) -> logging.Logger:
+    """
+    This function creates a logger that writes JSON lines to LOG_DIR/<logger_name>.jsonl.
+
+    Parameters:
+        LOG_DIR (str): The directory where log files will be stored.
+        logger_name (str): The name of the logger.
+
+    Returns:
+        logging.Logger: The configured logger.
+    """
+    check_log_folder(LOG_DIR)
+
+    log_file_path = os.path.join(LOG_DIR, f"{logger_name}.jsonl")
+
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(logging.INFO)
+
+    if not logger.handlers:
+        file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(JsonLineFormatter())
+        logger.addHandler(file_handler)
 
     logger.propagate = False
 
@@ -0,0 +1,155 @@
+import os
+import time
+from functools import wraps
+from urllib.parse import urlsplit
+from flask import Flask, g, request
+import requests
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+# (see gunicorn.conf.py) and /metrics merges them at scrape time, so the
+# numbers do not depend on which worker answers the scrape.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latency of requests served by the Flask app.",
+    ["blueprint", "route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+OUTBOUND_REQUESTS = Counter(
+    "outbound_requests_total",
+    "Outbound HTTP calls made to music/identity providers.",
+    ["provider", "status"],
+)
+
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds",
+    "Latency of outbound HTTP calls made to providers.",
+    ["provider"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "playlist_cache_requests_total",
+    "Playlist cache lookups; hit ratio = hit / (hit + miss).",
+    ["cache", "result"],
+)
+
+# Counts helper calls, not Firestore round trips or documents: one helper
+# may run a query and then a write, or read many documents in one get_all.
+FIRESTORE_HELPER_CALLS = Counter(
+    "firestore_helper_calls_total",
+    "Calls of database.firebase_operations helpers, by the access they are declared as (read or write).",
+    ["kind", "helper"],
+)
+
+# Host suffix -> provider label for outbound calls.
+PROVIDER_HOSTS = {
+    "spotify.com": "spotify",
+    "googleapis.com": "google",
+    "google.com": "google",
+    "music.apple.com": "apple",
+    "apple.com": "apple",
+    "musixmatch.com": "musixmatch",
+}
+
+
+def provider_for_url(url: str) -> str:
+    """
+    Maps an outbound URL to a low-cardinality provider label.
+    """
+    host = (urlsplit(url).hostname or "").lower()
+    for suffix, provider in PROVIDER_HOSTS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return provider
+    return "other"
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_firestore_helper_call(kind: str, helper: str) -> None:
+    FIRESTORE_HELPER_CALLS.labels(kind=kind, helper=helper).inc()
+
+
+def install_outbound_metrics():
+    """
+    Wraps `requests.Session.request` to count and time every outbound call per
+    provider. Safe to call more than once.
+    """
+    session_request = requests.Session.request
+    if getattr(session_request, "_metered", False):
+        return
+
+    @wraps(session_request)
+    def metered_request(self, method, url, *args, **kwargs):
+        provider = provider_for_url(url)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = session_request(self, method, url, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            OUTBOUND_LATENCY.labels(provider=provider).observe(
+                time.perf_counter() - started
+            )
+            OUTBOUND_REQUESTS.labels(provider=provider, status=status).inc()
+
+    metered_request._metered = True
+    requests.Session.request = metered_request
+
+
+def render_metrics():
+    """
+    Returns (body, content_type) in the Prometheus text exposition format,
+    aggregating across worker processes when multiprocess mode is enabled.
+    """
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def register_metrics(app: Flask):
+    """
+    Records a latency sample per request, labelled by blueprint and route
+    template (not the raw path, to keep label cardinality bounded).
+    """
+    install_outbound_metrics()
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request_latency(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        rule = request.url_rule
+        REQUEST_LATENCY.labels(
+            blueprint=request.blueprint or "app",
+            route=rule.rule if rule is not None else "<unmatched>",
+            method=request.method,
+            status=str(response.status_code),
+        ).observe(time.perf_counter() - started)
+        return response
+
+    return app
@@ -1,5 +1,5 @@
 # models.py
-from pydantic import BaseModel, EmailStr, constr
+from pydantic import BaseModel, EmailStr, conlist, constr
 
 
 class RegisterRequest(BaseModel):
@@ -16,6 +16,10 @@ class MLRequest(BaseModel):
     data: float
 
 
+class MLBatchRequest(BaseModel):
+    data: conlist(float, min_items=1, max_items=1024)  # type: ignore
+
+
 class LinkedAppRequest(BaseModel):
     app_name: str
     user_email: EmailStr
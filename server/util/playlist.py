@@ -1,13 +1,19 @@
-from typing import Union, Dict, List, Tuple
+from functools import lru_cache
+from typing import Union, Dict, List, Sequence, Tuple
+import numpy as np
 from rich.console import Console
 from rich.table import Table
 
+# Distinct (duration, defaults) combinations whose best schedule is kept.
+SCHEDULE_CACHE_SIZE = 4096
+
 
 def round_to_nearest_5(x: float) -> int:
     """Round a float x to the nearest multiple of 5."""
     return int((x + 2.5) // 5) * 5
 
 
+@lru_cache(maxsize=SCHEDULE_CACHE_SIZE)
 def parse_duration(duration_str: str) -> float:
     """
     Convert a duration string in "MM:SS" (or "HH:MM:SS") format to a total number of minutes.
@@ -126,26 +132,20 @@ def compute_schedule_for_pattern(
     return schedule, total_loss
 
 
-def optimized_pomodoro_playlist(
-    total_duration_str: str,
-    work_default: int = 25,
-    short_break_default: int = 5,
-    long_break_default: int = 10,
-    max_work_allowed: int = 35,
-    penalty_weight: float = 1.0,
-    code_format: bool = False,
-) -> Union[Dict, str]:
+@lru_cache(maxsize=SCHEDULE_CACHE_SIZE)
+def _best_schedule(
+    T: float,
+    work_default: int,
+    short_break_default: int,
+    long_break_default: int,
+    max_work_allowed: int,
+    penalty_weight: float,
+) -> Tuple[Dict, float]:
     """
-    Generate an optimized Pomodoro schedule given a total duration in "MM:SS" (or "HH:MM:SS") format.
-
-    The algorithm iterates over candidate patterns and selects the one that minimizes
-    the combined loss (|input duration - final scheduled time| plus penalty for oversized work sessions).
-
-    If code_format is True, returns a colon-separated string in the format:
-      input_duration:sequence:session1:session2:...:sessionN:loss=<MM:SS>
-    Otherwise, returns a dictionary with schedule details.
+    The lowest-loss schedule over candidate_patterns; the first pattern
+    wins ties. Memoized on the normalized parameters, so "115:00" and
+    "1:55:00" share an entry. Callers must not mutate the cached schedule.
     """
-    T = parse_duration(total_duration_str)
     best_schedule = None
     best_loss = float("inf")
     for pattern in candidate_patterns:
@@ -161,7 +161,17 @@ def optimized_pomodoro_playlist(
         if loss < best_loss:
             best_loss = loss
             best_schedule = schedule
+    return best_schedule, best_loss
+
 
+def _present(
+    schedule: Dict, best_loss: float, total_duration_str: str, code_format: bool
+) -> Union[Dict, str]:
+    """
+    Shapes a best schedule as optimized_pomodoro_playlist returns it, on a
+    copy so cached schedules stay untouched.
+    """
+    best_schedule = dict(schedule, work_sessions=list(schedule["work_sessions"]))
     best_schedule["input_duration_str"] = total_duration_str
     best_schedule["loss"] = best_loss
 
@@ -185,6 +195,353 @@ def optimized_pomodoro_playlist(
         return best_schedule
 
 
+def optimized_pomodoro_playlist(
+    total_duration_str: str,
+    work_default: int = 25,
+    short_break_default: int = 5,
+    long_break_default: int = 10,
+    max_work_allowed: int = 35,
+    penalty_weight: float = 1.0,
+    code_format: bool = False,
+) -> Union[Dict, str]:
+    """
+    Generate an optimized Pomodoro schedule given a total duration in "MM:SS" (or "HH:MM:SS") format.
+
+    The algorithm iterates over candidate patterns and selects the one that minimizes
+    the combined loss (|input duration - final scheduled time| plus penalty for oversized work sessions).
+
+    If code_format is True, returns a colon-separated string in the format:
+      input_duration:sequence:session1:session2:...:sessionN:loss=<MM:SS>
+    Otherwise, returns a dictionary with schedule details.
+    """
+    schedule, best_loss = _best_schedule(
+        parse_duration(total_duration_str),
+        work_default,
+        short_break_default,
+        long_break_default,
+        max_work_allowed,
+        penalty_weight,
+    )
+    return _present(schedule, best_loss, total_duration_str, code_format)
+
+
+# ---------------------------
+# Vectorized scheduling
+# ---------------------------
+
+def _round_to_nearest_5(x: np.ndarray) -> np.ndarray:
+    return np.floor_divide(x + 2.5, 5) * 5
+
+
+def evaluate_patterns(
+    T: np.ndarray,
+    work_default: int = 25,
+    short_break_default: int = 5,
+    long_break_default: int = 10,
+    max_work_allowed: int = 35,
+    penalty_weight: float = 1.0,
+) -> Dict[str, np.ndarray]:
+    """
+    compute_schedule_for_pattern for every candidate pattern and every
+    duration in T (minutes) at once, with the same float operations so the
+    results are identical. Arrays are indexed [pattern, duration];
+    "work_sessions" has a trailing axis padded with 0 past each pattern's
+    work count.
+    """
+    T = np.asarray(T, dtype=np.float64)[np.newaxis, :]
+    w = np.array([p["w"] for p in candidate_patterns])[:, np.newaxis]
+    s = np.array([p["s"] for p in candidate_patterns])[:, np.newaxis]
+    lc = np.array([p["l"] for p in candidate_patterns])[:, np.newaxis]
+
+    base_total = w * work_default + s * short_break_default + lc * long_break_default
+    scaling = T / base_total
+
+    work_candidate = _round_to_nearest_5(work_default * scaling)
+    short_candidate = _round_to_nearest_5(short_break_default * scaling)
+    long_candidate = np.where(lc > 0, _round_to_nearest_5(long_break_default * scaling), 0)
+
+    schedule_sum = w * work_candidate + s * short_candidate + lc * long_candidate
+    # np.round rounds half to even, like round().
+    diff_rounded = np.round((T - schedule_sum) / 5) * 5
+
+    # Distribute diff_rounded among work sessions, earlier sessions first.
+    num_chunks = diff_rounded // 5
+    per_session, remainder = np.divmod(np.abs(num_chunks), w)
+    session = np.arange(max(p["w"] for p in candidate_patterns))
+    extra = (per_session[..., np.newaxis] + (session < remainder[..., np.newaxis])) * 5
+    extra = np.where(num_chunks[..., np.newaxis] < 0, -extra, extra)
+    work_sessions = np.where(session < w[..., np.newaxis], work_candidate[..., np.newaxis] + extra, 0)
+
+    final_sum = schedule_sum + diff_rounded
+    penalty = np.maximum(0, work_sessions - max_work_allowed).sum(axis=-1)
+    loss = np.abs(T - final_sum) + penalty_weight * penalty
+    return {
+        "work_sessions": work_sessions,
+        "short_break": short_candidate,
+        "long_break": long_candidate,
+        "final_sum": final_sum,
+        "loss": loss,
+    }
+
+
+def optimized_pomodoro_playlists(
+    total_duration_strs: Sequence[str],
+    work_default: int = 25,
+    short_break_default: int = 5,
+    long_break_default: int = 10,
+    max_work_allowed: int = 35,
+    penalty_weight: float = 1.0,
+    code_format: bool = False,
+) -> List[Union[Dict, str]]:
+    """
+    optimized_pomodoro_playlist for a whole library of durations: every
+    distinct duration is evaluated against every pattern in one NumPy pass.
+    Element i equals optimized_pomodoro_playlist(total_duration_strs[i], ...).
+    """
+    durations = [parse_duration(d) for d in total_duration_strs]
+    unique = sorted(set(durations))
+    if not unique:
+        return []
+    evaluated = evaluate_patterns(
+        np.array(unique),
+        work_default,
+        short_break_default,
+        long_break_default,
+        max_work_allowed,
+        penalty_weight,
+    )
+    # argmin takes the first minimum, like the strict < in _best_schedule.
+    best = evaluated["loss"].argmin(axis=0)
+    schedules = {}
+    for j, T in enumerate(unique):
+        k = best[j]
+        pattern = candidate_patterns[k]
+        loss = float(evaluated["loss"][k, j])
+        schedules[T] = ({
+            "total_duration": T,
+            "sequence": pattern["pattern"],
+            "work_sessions": evaluated["work_sessions"][k, j, :pattern["w"]].astype(int).tolist(),
+            "short_break": int(evaluated["short_break"][k, j]),
+            "long_break": int(evaluated["long_break"][k, j]) if pattern["l"] > 0 else None,
+            "final_sum": int(evaluated["final_sum"][k, j]),
+            "loss": loss,
+        }, loss)
+    return [
+        _present(*schedules[T], duration_str, code_format)
+        for T, duration_str in zip(durations, total_duration_strs)
+    ]
+
+
+# ---------------------------
+# Exact search
+# ---------------------------
+
+# The hand-written patterns above are the default catalogue. Patterns are
+# read from their text (see parse_pattern), so "WSWSWSWL+WSWS" counts the
+# five short breaks it spells out.
+DEFAULT_CATALOGUE = tuple(p["pattern"] for p in candidate_patterns)
+
+# Lengths the exact search may choose, in minutes; all are multiples of 5.
+MIN_WORK = 5
+SHORT_BREAK_RANGE = (5, 15)
+LONG_BREAK_RANGE = (10, 30)
+
+
+@lru_cache(maxsize=256)
+def parse_pattern(pattern: str) -> Dict:
+    """
+    Parse a catalogue entry: terms joined by "+", each an optional repeat
+    count ("2×" or "2x") followed by W, S and L tokens, e.g.
+    "2×WSWSWL+WSW". Returns the counts and the expanded token sequence.
+    """
+    tokens = ""
+    for term in pattern.split("+"):
+        count, body = 1, term
+        for sign in ("×", "x"):
+            if sign in term:
+                head, body = term.split(sign, 1)
+                if not head.isdigit() or int(head) < 1:
+                    raise ValueError(f"Invalid repeat count in pattern {pattern!r}.")
+                count = int(head)
+                break
+        if not body or set(body) - set("WSL"):
+            raise ValueError(f"Invalid pattern {pattern!r}: terms are made of W, S and L.")
+        tokens += body * count
+    if "W" not in tokens:
+        raise ValueError(f"Pattern {pattern!r} has no work session.")
+    return {
+        "pattern": pattern,
+        "w": tokens.count("W"),
+        "s": tokens.count("S"),
+        "l": tokens.count("L"),
+        "tokens": tokens,
+    }
+
+
+def _break_options(bounds: Tuple[int, int]) -> np.ndarray:
+    return np.arange(bounds[0], bounds[1] + 1, 5)
+
+
+@lru_cache(maxsize=256)
+def _work_table(
+    w_count: int, max_units: int, work_default: int, max_work_allowed: int, min_work: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best splits of u 5-minute units into w_count work sessions, for every
+    total u up to max_units: the least penalty (minutes over
+    max_work_allowed) and, among those, the least squared deviation from
+    work_default. Both costs are convex in a session's length, so the
+    even split (see _even_split) minimises them together and the table
+    is computed in closed form, in time and memory linear in max_units.
+    Totals that cannot give every session min_work minutes are infinite.
+    """
+    units = np.arange(max_units + 1)
+    low, extra = np.divmod(units, w_count)
+
+    def total(cost_of):
+        return extra * cost_of(low + 1) + (w_count - extra) * cost_of(low)
+
+    penalty = total(lambda n: np.maximum(0, n * 5 - max_work_allowed)).astype(float)
+    deviation = total(lambda n: (n * 5 - work_default) ** 2.0)
+    short = low * 5 < min_work
+    penalty[short] = np.inf
+    deviation[short] = np.inf
+    return penalty, deviation
+
+
+def _even_split(total_units: int, w_count: int) -> List[int]:
+    low, extra = divmod(total_units, w_count)
+    # Longer sessions come first, as in compute_schedule_for_pattern.
+    return [(low + 1) * 5] * extra + [low * 5] * (w_count - extra)
+
+
+def search_schedule(
+    T: float,
+    catalogue: Sequence[str] = DEFAULT_CATALOGUE,
+    work_default: int = 25,
+    short_break_default: int = 5,
+    long_break_default: int = 10,
+    max_work_allowed: int = 35,
+    penalty_weight: float = 1.0,
+    min_work: int = MIN_WORK,
+    short_break_range: Tuple[int, int] = SHORT_BREAK_RANGE,
+    long_break_range: Tuple[int, int] = LONG_BREAK_RANGE,
+) -> Tuple[Dict, float]:
+    """
+    The minimum-loss schedule for T minutes over every pattern in the
+    catalogue, with the same loss as compute_schedule_for_pattern but
+    every work session chosen freely (in 5-minute steps, at least
+    min_work) and one short and one long break length from their ranges.
+    Among equal losses the schedule closest to the defaults wins, then
+    the earlier pattern.
+
+    Work splits come from _work_table. Once a schedule is found, later
+    patterns only consider totals within its loss of T, and are skipped
+    when even their shortest schedule is further from T than that.
+    """
+    # No schedule can be closer than the nearest multiple of 5 minutes.
+    floor_loss = abs(T - round(T / 5) * 5)
+    max_units = max(1, int(np.ceil(T / 5)) + 1)
+    # Rounded up so nearby durations share a cached work table.
+    max_units = -(-max_units // 24) * 24
+    short_options = _break_options(short_break_range)
+    long_options = _break_options(long_break_range)
+
+    best = None  # (loss, deviation, schedule)
+    for pattern_text in catalogue:
+        pattern = parse_pattern(pattern_text)
+        w_count, s_count, l_count = pattern["w"], pattern["s"], pattern["l"]
+        shortest = w_count * min_work + s_count * short_options[0] + (l_count * long_options[0] if l_count else 0)
+        if best is not None and max(floor_loss, shortest - T) > best[0]:
+            continue
+        table_units = max(max_units, -(-w_count * min_work // 5))
+        penalty, deviation = _work_table(w_count, table_units, work_default, max_work_allowed, min_work)
+
+        shorts = short_options if s_count else short_options[:1]
+        longs = long_options if l_count else np.zeros(1, dtype=int)
+        # Axes: short break, long break, work units.
+        breaks = s_count * shorts[:, np.newaxis] + l_count * longs[np.newaxis, :]
+        # Only work totals that land within the best loss so far of T can win.
+        lo, hi = 0, table_units
+        if best is not None:
+            lo = max(0, int(np.floor((T - best[0] - breaks.max()) / 5)))
+            hi = min(table_units, int(np.ceil((T + best[0] - breaks.min()) / 5)))
+        if lo > hi:
+            continue
+        work_units = np.arange(lo, hi + 1)
+        final_sum = breaks[..., np.newaxis] + 5 * work_units
+        loss = np.abs(T - final_sum) + penalty_weight * penalty[lo:hi + 1]
+        total_deviation = (
+            deviation[lo:hi + 1] +
+            s_count * (shorts[:, np.newaxis, np.newaxis] - short_break_default) ** 2.0 +
+            l_count * (longs[np.newaxis, :, np.newaxis] - long_break_default) ** 2.0
+        )
+        # Least deviation among the least losses.
+        i, j, u = np.unravel_index(np.where(loss <= loss.min(), total_deviation, np.inf).argmin(), loss.shape)
+        candidate = (float(loss[i, j, u]), float(total_deviation[i, j, u]))
+        if not np.isfinite(candidate[0]) or (best is not None and candidate >= best[:2]):
+            continue
+        schedule = {
+            "total_duration": T,
+            "sequence": pattern_text,
+            "work_sessions": _even_split(int(work_units[u]), w_count),
+            "short_break": int(shorts[i]) if s_count else None,
+            "long_break": int(longs[j]) if l_count else None,
+            "final_sum": int(final_sum[i, j, u]),
+            "loss": candidate[0],
+        }
+        best = (candidate[0], candidate[1], schedule)
+    if best is None:
+        raise ValueError("The pattern catalogue is empty.")
+    return best[2], best[0]
+
+
+_cached_search = lru_cache(maxsize=SCHEDULE_CACHE_SIZE)(search_schedule)
+
+
+def heuristic_schedule(T: float) -> Tuple[Dict, float]:
+    """
+    (schedule, loss) optimized_pomodoro_playlist picks for T minutes with
+    the default parameters. Memoized; callers must not mutate the schedule.
+    """
+    return _best_schedule(T, 25, 5, 10, 35, 1.0)
+
+
+def fit_pattern(T: float, pattern: str) -> Tuple[Dict, float]:
+    """
+    (schedule, loss) of the exact search for T minutes restricted to one
+    pattern, with the default parameters. Memoized like heuristic_schedule.
+    """
+    return _cached_search(T, (pattern,), 25, 5, 10, 35, 1.0)
+
+
+def exact_pomodoro_playlist(
+    total_duration_str: str,
+    work_default: int = 25,
+    short_break_default: int = 5,
+    long_break_default: int = 10,
+    max_work_allowed: int = 35,
+    penalty_weight: float = 1.0,
+    code_format: bool = False,
+    catalogue: Sequence[str] = DEFAULT_CATALOGUE,
+) -> Union[Dict, str]:
+    """
+    optimized_pomodoro_playlist with the exact search: the returned
+    schedule's loss is the least any pattern in `catalogue` can reach with
+    the allowed session and break lengths. Same output formats.
+    """
+    schedule, best_loss = _cached_search(
+        parse_duration(total_duration_str),
+        tuple(catalogue),
+        work_default,
+        short_break_default,
+        long_break_default,
+        max_work_allowed,
+        penalty_weight,
+    )
+    return _present(schedule, best_loss, total_duration_str, code_format)
+
+
 def test_all_rich() -> None:
     """
     Run tests on a variety of total durations and display the results in a formatted table using rich.
@@ -0,0 +1,279 @@
+import cProfile
+import heapq
+import io
+import itertools
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from flask import Flask, g, request
+from config.config import settings
+from util.logit import get_logger
+from util.tracing import current_request_id
+
+logger = get_logger("logs", "Profiler")
+
+MAX_SAMPLE_SECONDS = 60
+# Longest profile a request may wait for: gunicorn kills sync workers that
+# spend its default 30 s timeout on one request. Longer profiles run as
+# background jobs.
+MAX_BLOCKING_SECONDS = 20
+MAX_SAMPLING_JOBS = 8
+DEFAULT_SAMPLE_INTERVAL = 0.005  # 200 Hz
+MAX_STATS_LINES = 40
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a sampling profile is already running in this worker."""
+
+
+_sampling_lock = threading.Lock()
+
+
+def _collapse(frame) -> str:
+    """
+    Renders a frame stack root-first as "module.func;module.func;...",
+    the same module.method naming used by log_error.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module_name = os.path.splitext(os.path.basename(code.co_filename))[0]
+        names.append(f"{module_name}.{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+def _clamp(seconds: float, interval: float):
+    """
+    Bounds both values: _sample sleeps for `interval` with _sampling_lock
+    held, so an interval longer than the profile would hold the lock past
+    the deadline.
+    """
+    seconds = max(0.0, min(float(seconds), MAX_SAMPLE_SECONDS))
+    interval = float(interval)
+    if not math.isfinite(interval):
+        interval = seconds
+    return seconds, min(max(0.001, interval), max(0.001, seconds))
+
+
+def _sample(seconds: float, interval: float) -> str:
+    """Samples with _sampling_lock held by the caller."""
+    own_thread = threading.get_ident()
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own_thread:
+                stacks[_collapse(frame)] += 1
+        time.sleep(interval)
+    logger.info(f"Sampling profile finished: {sum(stacks.values())} samples over {seconds}s")
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def sample_stacks(seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> str:
+    """
+    Samples the Python stacks of every other thread in this worker for
+    `seconds` and returns them in collapsed-stack format ("a;b;c <count>"
+    per line), ready for flamegraph.pl or speedscope.
+
+    Only one profile may run per worker at a time; a concurrent call raises
+    ProfilerBusy. The calling thread is excluded from the samples.
+    """
+    seconds, interval = _clamp(seconds, interval)
+    if not _sampling_lock.acquire(blocking=False):
+        raise ProfilerBusy("A sampling profile is already running.")
+    try:
+        return _sample(seconds, interval)
+    finally:
+        _sampling_lock.release()
+
+
+class SamplingJobs:
+    """
+    sample_stacks on a background thread, so the request that starts a
+    profile returns at once and the worker keeps serving the traffic being
+    profiled. Jobs are kept per worker process, the last
+    MAX_SAMPLING_JOBS of them, and fetched by id.
+    """
+
+    def __init__(self, keep: int = MAX_SAMPLING_JOBS):
+        self.lock = threading.Lock()
+        self.keep = keep
+        self.jobs = OrderedDict()  # job id -> job dict
+
+    def start(self, seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL) -> dict:
+        """Starts a profile and returns its job; raises ProfilerBusy like sample_stacks."""
+        seconds, interval = _clamp(seconds, interval)
+        if not _sampling_lock.acquire(blocking=False):
+            raise ProfilerBusy("A sampling profile is already running.")
+        job = {"id": uuid.uuid4().hex, "status": "running", "seconds": seconds,
+               "started_at": time.time(), "result": None, "error": None}
+        with self.lock:
+            self.jobs[job["id"]] = job
+            while len(self.jobs) > self.keep:
+                self.jobs.popitem(last=False)
+        try:
+            threading.Thread(target=self._run, args=(job, seconds, interval),
+                             name="sampling-profiler", daemon=True).start()
+        except Exception:
+            _sampling_lock.release()
+            raise
+        return dict(job)
+
+    def get(self, job_id: str):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id: str, timeout: float = None) -> dict:
+        """Polls until the job has finished; for tests."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] != "running":
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(0.01)
+
+    @staticmethod
+    def _run(job: dict, seconds: float, interval: float):
+        try:
+            job["result"] = _sample(seconds, interval)
+            job["status"] = "done"
+        except Exception as e:
+            logger.error(f"Sampling profile {job['id']} failed: {e}")
+            job["error"], job["status"] = str(e), "failed"
+        finally:
+            _sampling_lock.release()
+
+
+sampling_jobs = SamplingJobs()
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in per-route cProfile capture that keeps only the slowest N requests
+    per route. Routes are matched by their URL rule (e.g. "/spotify/playlists").
+    State is per worker process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}  # route -> number of captures to keep
+        self.captures = {}  # route -> min-heap of (duration, seq, capture)
+        self._seq = itertools.count()
+
+    def enable(self, route: str, keep: int = 5):
+        with self.lock:
+            self.routes[route] = max(1, int(keep))
+            self.captures.setdefault(route, [])
+
+    def disable(self, route: str):
+        with self.lock:
+            self.routes.pop(route, None)
+
+    def is_enabled(self, route: str) -> bool:
+        return route in self.routes
+
+    def wants(self, route: str, duration: float) -> bool:
+        """
+        True if a request of this duration would make the slowest-N list.
+        Checked before rendering stats so fast requests cost nothing extra.
+        """
+        with self.lock:
+            keep = self.routes.get(route)
+            if keep is None:
+                return False
+            heap = self.captures.setdefault(route, [])
+            return len(heap) < keep or duration > heap[0][0]
+
+    def record(self, route: str, duration: float, capture: dict):
+        with self.lock:
+            keep = self.routes.get(route)
+            if keep is None:
+                return
+            heap = self.captures.setdefault(route, [])
+            entry = (duration, next(self._seq), capture)
+            if len(heap) < keep:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heappushpop(heap, entry)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "routes": dict(self.routes),
+                "captures": {
+                    route: [c for _, _, c in sorted(heap, key=lambda e: -e[0])]
+                    for route, heap in self.captures.items()
+                },
+            }
+
+    def clear(self):
+        with self.lock:
+            for heap in self.captures.values():
+                heap.clear()
+
+
+slow_request_profiler = SlowRequestProfiler()
+
+
+def _configured_routes():
+    return [r.strip() for r in settings.profile_routes.split(",") if r.strip()]
+
+
+def register_route_profiling(app: Flask):
+    """
+    Wraps requests to opted-in routes in cProfile. Routes can be enabled at
+    startup via PROFILE_ROUTES or at runtime via the admin endpoint.
+    """
+    for route in _configured_routes():
+        slow_request_profiler.enable(route, settings.profile_slowest_n)
+
+    @app.before_request
+    def start_route_profile():
+        rule = request.url_rule
+        if rule is None or not slow_request_profiler.is_enabled(rule.rule):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this interpreter.
+            return
+        g.route_profile = (profile, rule.rule, time.perf_counter())
+
+    @app.after_request
+    def finish_route_profile(response):
+        state = g.pop("route_profile", None)
+        if state is None:
+            return response
+        profile, route, started = state
+        profile.disable()
+        duration = time.perf_counter() - started
+        if slow_request_profiler.wants(route, duration):
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(MAX_STATS_LINES)
+            slow_request_profiler.record(
+                route,
+                duration,
+                {
+                    "route": route,
+                    "request_id": current_request_id(),
+                    "status": response.status_code,
+                    "duration_ms": round(duration * 1000, 3),
+                    "captured_at": time.time(),
+                    "stats": stream.getvalue(),
+                },
+            )
+        return response
+
+    return app
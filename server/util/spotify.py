@@ -1,15 +1,15 @@
 import time
-from cmd_gui_kit import CmdGUI
 import requests
 import base64
 from config.config import settings
 from util.error_handling import log_error
-from util.logit import get_logger
+from util.logit import get_logger, get_console
+from util.metrics import record_cache_lookup
 from util.utils import ms2FormattedDuration
 import database.firebase_operations as firebase_operations
 
-# Initialize CmdGUI for visual feedback
-gui = CmdGUI()
+# Initialize CmdGUI for visual feedback (rendered only when OUTPUT_MODE=gui)
+gui = get_console()
 
 # Logging setup
 logger = get_logger("logs", "SpotifyUtils")
@@ -197,7 +197,7 @@ def fetch_user_playlists(user_id, app_id):
             playlists_data = response.json()
             items = playlists_data.get("items", [])
             if not items:
-                print("Not Found Any Item")
+                logger.debug("No playlist items found at offset %s", offset)
                 break
             for item in playlists_data.get("items", []):
                 # Fetch track details for each playlist
@@ -291,10 +291,12 @@ def calculate_playlist_duration(
     if cached_entry:
         cached_data, expiration_time = cached_entry
         if time.time() < expiration_time:
+            record_cache_lookup("spotify_playlist", hit=True)
             return cached_data
         else:
             # Remove expired cache entry
             del playlist_cache[playlist_id]
+    record_cache_lookup("spotify_playlist", hit=False)
 
     # Compute the playlist duration
     url_template = "https://api.spotify.com/v1/playlists/{playlist_id}/tracks?limit=50&offset={offset}"
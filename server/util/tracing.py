@@ -0,0 +1,157 @@
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from flask import Flask, g, request
+import requests
+from util.logit import get_json_logger
+
+# Dependency buckets reported in every request record.
+TIMING_CATEGORIES = ("firestore", "http", "bcrypt", "model")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Per-request trace state. Each Flask worker thread runs in its own context,
+# so concurrent requests never see each other's timings.
+_trace: ContextVar = ContextVar("request_trace", default=None)
+
+request_logger = get_json_logger("logs", "Requests")
+
+
+def current_request_id():
+    """
+    Returns the ID of the request being served, or None outside a request.
+    """
+    trace = _trace.get()
+    return trace["request_id"] if trace else None
+
+
+def start_trace(request_id: str = None) -> dict:
+    """
+    Starts a new timing trace for the current context and returns it.
+    """
+    trace = {
+        "request_id": request_id or uuid.uuid4().hex,
+        "started": time.perf_counter(),
+        "timings": {category: 0.0 for category in TIMING_CATEGORIES},
+        "stack": [],
+    }
+    _trace.set(trace)
+    return trace
+
+
+def end_trace():
+    """
+    Detaches and returns the current trace (None if no trace is active).
+    """
+    trace = _trace.get()
+    _trace.set(None)
+    return trace
+
+
+class timed:
+    """
+    Context manager / decorator that attributes elapsed time to a category of
+    the current request trace.
+
+    Timings are exclusive: time spent in a nested `timed` block is charged to
+    the inner category only, so bcrypt hashing inside a Firestore helper is
+    not counted twice. Outside an active trace this is a no-op.
+
+        with timed("bcrypt"):
+            bcrypt.checkpw(...)
+
+        @timed("firestore")
+        def get_user_id_by_email(email): ...
+    """
+
+    def __init__(self, category: str):
+        self.category = category
+
+    def __enter__(self):
+        trace = _trace.get()
+        if trace is not None:
+            # [category, started, time spent in nested blocks]
+            trace["stack"].append([self.category, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = _trace.get()
+        if trace is None or not trace["stack"]:
+            return False
+        category, started, nested = trace["stack"].pop()
+        elapsed = time.perf_counter() - started
+        timings = trace["timings"]
+        timings[category] = timings.get(category, 0.0) + (elapsed - nested)
+        if trace["stack"]:
+            trace["stack"][-1][2] += elapsed
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.category):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def install_http_timing():
+    """
+    Wraps `requests.Session.request` so every outbound provider call
+    (Spotify, Google, Apple, Musixmatch) is charged to the "http" category.
+    Module-level helpers such as `requests.get` route through it as well.
+    """
+    session_request = requests.Session.request
+    if getattr(session_request, "_timed", False):
+        return
+
+    @wraps(session_request)
+    def timed_request(self, method, url, *args, **kwargs):
+        with timed("http"):
+            return session_request(self, method, url, *args, **kwargs)
+
+    timed_request._timed = True
+    requests.Session.request = timed_request
+
+
+def register_request_tracing(app: Flask):
+    """
+    Emits one JSON line per request to logs/Requests.jsonl with the route,
+    status, total latency and the per-dependency breakdown in milliseconds.
+    The request ID is taken from the X-Request-ID header when present and is
+    echoed back on the response.
+    """
+    install_http_timing()
+
+    @app.before_request
+    def begin_request_trace():
+        trace = start_trace(request.headers.get(REQUEST_ID_HEADER))
+        g.request_id = trace["request_id"]
+
+    @app.after_request
+    def finish_request_trace(response):
+        trace = end_trace()
+        if trace is None:
+            return response
+        total = time.perf_counter() - trace["started"]
+        rule = request.url_rule
+        request_logger.info(
+            {
+                "request_id": trace["request_id"],
+                "method": request.method,
+                "route": rule.rule if rule is not None else None,
+                "endpoint": request.endpoint,
+                "path": request.path,
+                "status": response.status_code,
+                "latency_ms": round(total * 1000, 3),
+                "timings_ms": {
+                    category: round(seconds * 1000, 3)
+                    for category, seconds in trace["timings"].items()
+                },
+            }
+        )
+        response.headers[REQUEST_ID_HEADER] = trace["request_id"]
+        return response
+
+    return app
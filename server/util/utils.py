@@ -1,15 +1,14 @@
 import os
-from cmd_gui_kit import CmdGUI
 import hashlib
 from config.config import settings
-from util.logit import get_logger
+from util.logit import get_logger, get_console
 import json
 from dotenv import load_dotenv
 
 OAUTHLIB_INSECURE_TRANSPORT = 1
 
-# Initialize CmdGUI for visual feedback
-gui = CmdGUI()
+# Initialize CmdGUI for visual feedback (rendered only when OUTPUT_MODE=gui)
+gui = get_console()
 
 # Logging setup
 logger = get_logger("logs", "Utils")
@@ -58,9 +57,13 @@ route_descriptions = {
     "/auth/healthcheck": "Health check endpoint for the authentication service to verify functionality.",
     "/auth/login": "Handles user login requests with necessary credentials.",
     "/auth/register": "Handles user registration by creating a new account.",
+    "/debug/profile": "Admin only: samples this worker's stacks and returns a collapsed-stack flamegraph file, or starts a background profile with background=true.",
+    "/debug/profile/<job_id>": "Admin only: the collapsed-stack file of a background profile started on this worker.",
+    "/debug/slow_requests": "Admin only: opt routes into cProfile capture and read the slowest captured requests.",
     "/endpoints": "Lists all available endpoints in the application.",
-    "/error_stats": "Displays error statistics for the application, such as error logs or counts.",
+    "/error_stats": "Error counts per status code and route over 1m/5m/1h windows, aggregated across workers.",
     "/healthcheck": "General health check endpoint for the main application.",
+    "/metrics": "Prometheus metrics: request latency histograms, provider calls, cache and Firestore counters.",
     "/profile/healthcheck": "Health check endpoint for the profile service to ensure it's operational.",
     "/profile/view": "Displays the profile of the current user.",
     "/spotify-micro-service/healthcheck": "Health check endpoint for the Spotify microservice.",
@@ -4,6 +4,7 @@ from flask import jsonify
 import requests
 import isodate
 from util.logit import get_logger
+from util.metrics import record_cache_lookup
 from config.config import settings
 
 logger = get_logger("logs", "YoutubeUtils")
@@ -60,10 +61,12 @@ def playlist_items(access_token, playlist_id):
     if cached_entry:
         cached_data, expiration_time = cached_entry
         if time.time() < expiration_time:
+            record_cache_lookup("youtube_playlist", hit=True)
             return cached_data
         else:
             # Remove expired cache entry
             del playlist_cache[playlist_id]
+    record_cache_lookup("youtube_playlist", hit=False)
 
     # Now, fetch all playlist items from YouTube
     url = "https://www.googleapis.com/youtube/v3/playlistItems"
@@ -113,7 +116,7 @@ def playlist_items(access_token, playlist_id):
         # Second loop: Retrieve track details (duration, title, etc.) using the
         # video IDs
         while True:
-            print("Playlist fetching...")
+            logger.debug("Fetching track details for playlist %s", playlist_id)
             url = "https://www.googleapis.com/youtube/v3/videos"
             headers = {"Authorization": f"Bearer {access_token}"}
             params = {
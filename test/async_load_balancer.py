@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+asyncio engine for the load balancer.
+
+Every client connection is a coroutine on a single event loop instead of an
+OS thread, and each backend gets a bounded pool of keep-alive connections.
+Backend selection and health checking are shared with the threaded engine in
+load_balancer.py (same BackendManager, same health check thread).
+
+    python async_load_balancer.py --port 8080 --max-clients 10000 --pool-size 100 --strategy p2c --cache
+"""
+import argparse
+import asyncio
+import threading
+import time
+from collections import deque
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from load_balancer import (
+    BACKEND_CONNECT_TIMEOUT,
+    BACKEND_READ_TIMEOUT,
+    BALANCING_STRATEGIES,
+    BODYLESS_STATUSES,
+    CACHE_MAX_BYTES,
+    CHUNK_SIZE,
+    CLIENT_TIMEOUT,
+    CONNECT_ATTEMPTS,
+    DEFAULT_STRATEGY,
+    HOP_BY_HOP_HEADERS,
+    IDEMPOTENT_METHODS,
+    LISTEN_BACKLOG,
+    POOL_MAXSIZE,
+    REQUEST_FRAMING_HEADERS,
+    BackendUnreachable,
+    BodyBuffer,
+    ResponseCache,
+    backend_manager,
+    health_check_thread,
+    logger,
+    shutdown_flag,
+)
+
+# -------------------------------------------------------------------------------
+# CONFIGURATION CONSTANTS
+# -------------------------------------------------------------------------------
+DEFAULT_PORT = 8080
+MAX_CLIENT_CONNECTIONS = 10000  # client connections served concurrently
+MAX_HEADER_BYTES = 64 * 1024  # request/status line plus headers
+MAX_REQUEST_BODY = 16 * 1024 * 1024  # request bodies are buffered so they can be replayed
+SHUTDOWN_POLL_INTERVAL = 0.5  # seconds between shutdown_flag checks
+POOL_WAIT_TIMEOUT = 10  # seconds a request may wait for a free backend connection
+
+
+class ProtocolError(Exception):
+    """Malformed or oversized HTTP message."""
+
+
+class PoolExhausted(Exception):
+    """Every pooled connection to a backend stayed busy for POOL_WAIT_TIMEOUT."""
+
+
+# -------------------------------------------------------------------------------
+# HTTP/1.1 HELPERS
+# -------------------------------------------------------------------------------
+def get_header(headers, name, default=None):
+    name = name.lower()
+    for h, v in reversed(headers):
+        if h.lower() == name:
+            return v
+    return default
+
+
+def wants_keep_alive(version, headers):
+    tokens = {t.strip().lower() for t in get_header(headers, "Connection", "").split(",")}
+    if version == "HTTP/1.0":
+        return "keep-alive" in tokens
+    return "close" not in tokens
+
+
+async def read_head(reader, timeout):
+    """
+    Read a request or status line plus headers. Returns (start_line, headers)
+    or None when the peer closed the connection cleanly between messages.
+    """
+    try:
+        raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise ProtocolError("Truncated message head")
+    except asyncio.LimitOverrunError:
+        raise ProtocolError("Message head too large")
+    lines = raw.lstrip(b"\r\n")[:-4].decode("latin-1").split("\r\n")
+    headers = []
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if not sep or not name.strip():
+            raise ProtocolError(f"Malformed header line: {line!r}")
+        headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+async def read_chunk_size(reader, timeout):
+    size_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), timeout)
+    try:
+        return size_line, int(size_line.split(b";", 1)[0].strip(), 16)
+    except ValueError:
+        raise ProtocolError(f"Bad chunk size line: {size_line!r}")
+
+
+async def read_trailers(reader, timeout):
+    lines = []
+    while True:
+        line = await asyncio.wait_for(reader.readuntil(b"\r\n"), timeout)
+        lines.append(line)
+        if line == b"\r\n":
+            return b"".join(lines)
+
+
+async def read_request_body(reader, headers):
+    """Buffer the request body (Content-Length or chunked) so it can be replayed."""
+    if "chunked" in get_header(headers, "Transfer-Encoding", "").lower():
+        parts, total = [], 0
+        while True:
+            _, size = await read_chunk_size(reader, CLIENT_TIMEOUT)
+            if size == 0:
+                await read_trailers(reader, CLIENT_TIMEOUT)
+                return b"".join(parts)
+            total += size
+            if total > MAX_REQUEST_BODY:
+                raise ProtocolError("Request body too large")
+            data = await asyncio.wait_for(reader.readexactly(size + 2), CLIENT_TIMEOUT)
+            parts.append(data[:-2])
+    try:
+        length = int(get_header(headers, "Content-Length", "0"))
+    except ValueError:
+        raise ProtocolError("Bad Content-Length")
+    if length < 0 or length > MAX_REQUEST_BODY:
+        raise ProtocolError("Request body too large")
+    if not length:
+        return b""
+    return await asyncio.wait_for(reader.readexactly(length), CLIENT_TIMEOUT)
+
+
+async def relay_exact(reader, writer, length, timeout, sink=None):
+    while length > 0:
+        chunk = await asyncio.wait_for(reader.read(min(CHUNK_SIZE, length)), timeout)
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"", length)
+        if sink is not None:
+            sink.add(chunk)
+        writer.write(chunk)
+        await writer.drain()
+        length -= len(chunk)
+
+
+async def relay_chunked(reader, writer, timeout, dechunk=False, sink=None):
+    """
+    Copy a chunked body. Framing and trailers are passed through verbatim,
+    or stripped when `dechunk` is set (HTTP/1.0 clients). `sink` only ever
+    sees the de-chunked data.
+    """
+    while True:
+        size_line, size = await read_chunk_size(reader, timeout)
+        if size == 0:
+            trailers = await read_trailers(reader, timeout)
+            if not dechunk:
+                writer.write(size_line + trailers)
+                await writer.drain()
+            return
+        if not dechunk:
+            writer.write(size_line)
+        await relay_exact(reader, writer, size, timeout, sink)
+        crlf = await asyncio.wait_for(reader.readexactly(2), timeout)
+        if not dechunk:
+            writer.write(crlf)
+
+
+async def relay_until_eof(reader, writer, timeout, sink=None):
+    while True:
+        chunk = await asyncio.wait_for(reader.read(CHUNK_SIZE), timeout)
+        if not chunk:
+            return
+        if sink is not None:
+            sink.add(chunk)
+        writer.write(chunk)
+        await writer.drain()
+
+
+def is_interim(status_line):
+    parts = status_line.split(" ", 2)
+    return len(parts) > 1 and parts[1].startswith("1")
+
+
+def encode_head(start_line, headers):
+    lines = [start_line] + [f"{h}: {v}" for h, v in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_plain(writer, status, message, keep_alive):
+    writer.write(encode_head(
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+        [
+            ("Content-Type", "text/plain"),
+            ("Content-Length", str(len(message))),
+            ("Connection", "keep-alive" if keep_alive else "close"),
+        ],
+    ) + message)
+    await writer.drain()
+
+
+async def send_cached(writer, entry, keep_alive):
+    if entry is None:
+        return False
+    writer.write(encode_head(
+        f"HTTP/1.1 {entry.status} {HTTPStatus(entry.status).phrase}",
+        entry.headers + [
+            ("Content-Length", str(len(entry.body))),
+            ("Age", str(int(time.time() - entry.stored_at))),
+            ("X-Cache", "HIT"),
+            ("Connection", "keep-alive" if keep_alive else "close"),
+        ],
+    ) + entry.body)
+    await writer.drain()
+    return True
+
+
+# -------------------------------------------------------------------------------
+# PER-BACKEND CONNECTION POOL
+# -------------------------------------------------------------------------------
+class BackendPool:
+    """
+    Keep-alive connections to one backend. At most `max_size` connections are
+    open at once; further requests wait until one is released, for at most
+    POOL_WAIT_TIMEOUT, so a stuck backend cannot queue clients forever.
+    """
+
+    def __init__(self, url, max_size=POOL_MAXSIZE):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.netloc = parts.netloc
+        self.idle = deque()
+        self.slots = asyncio.Semaphore(max_size)
+
+    async def acquire(self):
+        """Returns (reader, writer, reused); raises PoolExhausted."""
+        try:
+            await asyncio.wait_for(self.slots.acquire(), POOL_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise PoolExhausted(self.netloc) from None
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, limit=MAX_HEADER_BYTES),
+                BACKEND_CONNECT_TIMEOUT,
+            )
+        except BaseException:
+            self.slots.release()
+            raise
+        return reader, writer, False
+
+    def release(self, reader, writer, reusable):
+        if reusable and not reader.at_eof() and not writer.is_closing():
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+        self.slots.release()
+
+    def close(self):
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+
+
+# -------------------------------------------------------------------------------
+# ASYNC PROXY
+# -------------------------------------------------------------------------------
+class AsyncLoadBalancer:
+    def __init__(self, manager, max_clients=MAX_CLIENT_CONNECTIONS, pool_size=POOL_MAXSIZE, cache=None):
+        self.manager = manager
+        self.cache = cache  # ResponseCache built with waiter_factory=asyncio.Event, or None
+        self.max_clients = max_clients
+        self.pool_size = pool_size
+        self.pools = {}
+        self.client_slots = None  # created on the running loop
+
+    def pool_for(self, backend):
+        pool = self.pools.get(backend)
+        if pool is None:
+            pool = self.pools[backend] = BackendPool(backend, self.pool_size)
+        return pool
+
+    async def handle_client(self, reader, writer):
+        if self.client_slots is None:
+            self.client_slots = asyncio.Semaphore(self.max_clients)
+        async with self.client_slots:
+            try:
+                while await self.handle_request(reader, writer):
+                    pass
+            except ProtocolError as e:
+                logger.debug(f"[AsyncProxy] Bad request: {e}")
+                try:
+                    await send_plain(writer, 400, b"Bad Request", keep_alive=False)
+                except OSError:
+                    pass
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                # Client went away or idled out.
+                pass
+            finally:
+                writer.close()
+
+    async def handle_request(self, reader, writer):
+        """Serve one request; returns True if the client connection stays open."""
+        head = await read_head(reader, CLIENT_TIMEOUT)
+        if head is None:
+            return False
+        request_line, headers = head
+        try:
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            raise ProtocolError(f"Malformed request line: {request_line!r}")
+        body = await read_request_body(reader, headers)
+        keep_alive = wants_keep_alive(version, headers)
+
+        cacheable = self.cache is not None and self.cache.wants(
+            method, get_header(headers, "Authorization"), get_header(headers, "Cache-Control")
+        )
+        header_get = partial(get_header, headers)
+        filling_key = None
+        if cacheable:
+            key = self.cache.key_for(target, header_get)
+            if await send_cached(writer, self.cache.get(key), keep_alive):
+                return keep_alive
+            waiter = self.cache.claim(key)
+            if waiter is None:
+                filling_key = key
+            else:
+                # Another request is already fetching this response; wait for
+                # it once, and go to a backend ourselves if it was not cacheable.
+                try:
+                    await asyncio.wait_for(waiter.wait(), BACKEND_READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+                if await send_cached(writer, self.cache.get(self.cache.key_for(target, header_get)), keep_alive):
+                    return keep_alive
+
+        try:
+            for attempt in range(CONNECT_ATTEMPTS):
+                backend_url = self.manager.acquire_backend()
+                if not backend_url:
+                    await send_plain(writer, 503, b"No healthy backends available", keep_alive)
+                    return keep_alive
+                try:
+                    return await self.forward(
+                        backend_url, method, target, version, headers, body, writer, keep_alive, cacheable,
+                        retry=attempt + 1 < CONNECT_ATTEMPTS,
+                    )
+                except BackendUnreachable:
+                    logger.info(f"[AsyncProxy] {backend_url} unreachable, retrying on another backend.")
+                finally:
+                    self.manager.release_backend(backend_url)
+        finally:
+            if filling_key is not None:
+                self.cache.release_claim(filling_key)
+
+    async def forward(self, backend_url, method, target, version, headers, body, writer, keep_alive,
+                      cacheable=False, retry=False):
+        pool = self.pool_for(backend_url)
+        forwarded = [
+            (h, v) for h, v in headers
+            if h.lower() not in HOP_BY_HOP_HEADERS and h.lower() not in REQUEST_FRAMING_HEADERS
+        ]
+        if get_header(headers, "Host") is None:
+            forwarded.append(("Host", pool.netloc))
+        if body or method in ("POST", "PUT", "PATCH"):
+            forwarded.append(("Content-Length", str(len(body))))
+        forwarded.append(("Connection", "keep-alive"))
+        request_bytes = encode_head(f"{method} {target} HTTP/1.1", forwarded) + body
+
+        started = time.monotonic()
+        for attempt in range(2):
+            try:
+                b_reader, b_writer, reused = await pool.acquire()
+            except PoolExhausted:
+                # The backend is saturated or stuck, not down: its in-flight
+                # requests report it when they time out.
+                if retry:
+                    raise BackendUnreachable(backend_url)
+                logger.warning(f"[AsyncProxy] No free connection to {backend_url} in {POOL_WAIT_TIMEOUT}s")
+                await send_plain(writer, 503, b"Service Unavailable: Backend is busy.", keep_alive)
+                return keep_alive
+            except (OSError, asyncio.TimeoutError) as e:
+                self.manager.report_failure(backend_url, connect_failure=True)
+                self.manager.record_latency(backend_url, BACKEND_CONNECT_TIMEOUT)
+                if retry:
+                    raise BackendUnreachable(backend_url)
+                logger.warning(f"[AsyncProxy] Connect to {backend_url} failed: {e!r}")
+                await send_plain(writer, 503, b"Service Unavailable: Could not reach backend.", keep_alive)
+                return keep_alive
+            try:
+                b_writer.write(request_bytes)
+                await b_writer.drain()
+                head = await read_head(b_reader, BACKEND_READ_TIMEOUT)
+                # Skip interim 1xx responses.
+                while head is not None and is_interim(head[0]):
+                    head = await read_head(b_reader, BACKEND_READ_TIMEOUT)
+                if head is None:
+                    raise ConnectionResetError("Backend closed the connection")
+                break
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ProtocolError) as e:
+                pool.release(b_reader, b_writer, reusable=False)
+                stale = reused and not isinstance(e, asyncio.TimeoutError)
+                if attempt == 0 and stale and method in IDEMPOTENT_METHODS:
+                    continue
+                logger.warning(f"[AsyncProxy] Request to {backend_url} failed: {e!r}")
+                self.manager.report_failure(backend_url)
+                self.manager.record_latency(backend_url, BACKEND_CONNECT_TIMEOUT)
+                await send_plain(writer, 503, b"Service Unavailable: Could not reach backend.", keep_alive)
+                return keep_alive
+        self.manager.record_latency(backend_url, time.monotonic() - started)
+
+        status_line, resp_headers = head
+        parts = status_line.split(" ", 2)
+        try:
+            status = int(parts[1])
+        except (IndexError, ValueError):
+            self.manager.report_failure(backend_url)
+            pool.release(b_reader, b_writer, reusable=False)
+            await send_plain(writer, 502, b"Bad Gateway", keep_alive)
+            return keep_alive
+        reason = parts[2] if len(parts) > 2 else HTTPStatus(status).phrase
+        if status >= 500:
+            self.manager.report_failure(backend_url)
+        else:
+            self.manager.report_success(backend_url)
+        backend_reusable = wants_keep_alive(parts[0], resp_headers)
+
+        if method == "HEAD" or status in BODYLESS_STATUSES:
+            framing = "none"
+        elif "chunked" in get_header(resp_headers, "Transfer-Encoding", "").lower():
+            framing = "chunked"
+        elif get_header(resp_headers, "Content-Length") is not None:
+            framing = "length"
+        else:
+            framing = "eof"
+            backend_reusable = False
+        dechunk = framing == "chunked" and version == "HTTP/1.0"
+        if framing == "eof" or dechunk:
+            # The end of the body is signalled by closing the client connection.
+            keep_alive = False
+
+        ttl = self.cache.ttl_for(target, status, partial(get_header, resp_headers)) if cacheable else None
+        buffer = BodyBuffer(self.cache.max_entry_bytes) if ttl else None
+
+        stored_headers = [
+            (h, v) for h, v in resp_headers
+            if h.lower() not in HOP_BY_HOP_HEADERS and h.lower() != "content-length"
+        ]
+        out_headers = [(h, v) for h, v in resp_headers if h.lower() not in HOP_BY_HOP_HEADERS]
+        if cacheable:
+            out_headers.append(("X-Cache", "MISS"))
+        if framing == "chunked" and not dechunk:
+            out_headers.append(("Transfer-Encoding", "chunked"))
+        out_headers.append(("Connection", "keep-alive" if keep_alive else "close"))
+
+        try:
+            writer.write(encode_head(f"HTTP/1.1 {status} {reason}", out_headers))
+            if framing == "length":
+                length = int(get_header(resp_headers, "Content-Length"))
+                await relay_exact(b_reader, writer, length, BACKEND_READ_TIMEOUT, buffer)
+            elif framing == "chunked":
+                await relay_chunked(b_reader, writer, BACKEND_READ_TIMEOUT, dechunk=dechunk, sink=buffer)
+            elif framing == "eof":
+                await relay_until_eof(b_reader, writer, BACKEND_READ_TIMEOUT, buffer)
+            await writer.drain()
+            if buffer is not None and not buffer.overflow:
+                self.cache.put(target, partial(get_header, headers), status, stored_headers, buffer.getvalue(), ttl)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ProtocolError, ValueError) as e:
+            # Headers are already out; the only signal left is closing the client connection.
+            logger.debug(f"[AsyncProxy] Transfer from {backend_url} aborted: {e!r}")
+            if isinstance(e, (asyncio.IncompleteReadError, ProtocolError)):
+                self.manager.report_failure(backend_url)
+            backend_reusable = False
+            keep_alive = False
+        finally:
+            pool.release(b_reader, b_writer, backend_reusable)
+        return keep_alive
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+
+async def serve(engine, host, port):
+    """Run the engine until shutdown_flag is set (SIGINT/SIGTERM)."""
+    server = await asyncio.start_server(
+        engine.handle_client, host or None, port, limit=MAX_HEADER_BYTES, backlog=LISTEN_BACKLOG
+    )
+    logger.info(f"Async load balancer running on port {port}")
+    async with server:
+        # Polled rather than using loop.add_signal_handler, which Windows lacks.
+        while not shutdown_flag.is_set():
+            await asyncio.sleep(SHUTDOWN_POLL_INTERVAL)
+        logger.info("Shutting down server...")
+    engine.close()
+
+
+# -------------------------------------------------------------------------------
+# MAIN FUNCTION
+# -------------------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="asyncio load balancer engine")
+    parser.add_argument("--host", default="", help="interface to bind (default: all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-clients", type=int, default=MAX_CLIENT_CONNECTIONS,
+                        help="client connections served concurrently")
+    parser.add_argument("--pool-size", type=int, default=POOL_MAXSIZE,
+                        help="max open keep-alive connections per backend")
+    parser.add_argument("--strategy", choices=BALANCING_STRATEGIES, default=DEFAULT_STRATEGY,
+                        help="backend selection strategy")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve cacheable GET responses from memory (see ResponseCache)")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_BYTES // (1024 * 1024),
+                        help="total response cache size in MiB")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    backend_manager.set_strategy(args.strategy)
+    logger.info(f"Balancing strategy: {args.strategy}")
+
+    # Health checks stay on their own thread, exactly as in the threaded engine.
+    hc_thread = threading.Thread(target=health_check_thread, daemon=True)
+    hc_thread.start()
+
+    cache = None
+    if args.cache:
+        cache = ResponseCache(max_bytes=args.cache_max_mb * 1024 * 1024, waiter_factory=asyncio.Event)
+        logger.info(f"Response cache enabled ({args.cache_max_mb} MiB)")
+    engine = AsyncLoadBalancer(backend_manager, args.max_clients, args.pool_size, cache)
+    try:
+        asyncio.run(serve(engine, args.host, args.port))
+    finally:
+        shutdown_flag.set()
+
+    hc_thread.join(timeout=5)
+    backend_manager.close()
+    logger.info("Load balancer has stopped gracefully.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Side-by-side throughput benchmark of the threaded (load_balancer.py) and
+asyncio (async_load_balancer.py) engines.
+
+Both engines are run in their own process in front of the same stub backends,
+which answer /healthcheck after an optional delay standing in for Flask work.
+--slow-backend-delay makes the first stub slower than the rest, to compare
+balancing strategies against one degraded instance.
+Each engine is then driven by the same keep-alive load generator at every
+requested concurrency level.
+
+    python lb_benchmark.py --backends 4 --concurrency 50 200 1000 --duration 10
+    python lb_benchmark.py --engines asyncio --strategy p2c --slow-backend-delay 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENGINES = ("threaded", "asyncio")
+STUB_BODY = b'{"status":"ok"}'
+STARTUP_TIMEOUT = 15  # seconds to wait for a subprocess to accept connections
+REQUEST_TIMEOUT = 30  # seconds before a benchmark request counts as an error
+
+
+# -------------------------------------------------------------------------------
+# STUB BACKENDS
+# -------------------------------------------------------------------------------
+async def stub_backend_connection(reader, writer, delay):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lowered = head.lower()
+            for line in lowered.split(b"\r\n"):
+                if line.startswith(b"content-length:"):
+                    await reader.readexactly(int(line.split(b":", 1)[1]))
+            if delay:
+                await asyncio.sleep(delay)
+            request_line = lowered.split(b"\r\n", 1)[0]
+            close = b"connection: close" in lowered or request_line.endswith(b"http/1.0")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n" +
+                b"Content-Length: %d\r\n" % len(STUB_BODY) +
+                (b"Connection: close\r\n" if close else b"") +
+                b"\r\n" + STUB_BODY
+            )
+            await writer.drain()
+            if close:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_stub_backends(ports, delay, slow_delay=None):
+    delays = [delay] * len(ports)
+    if slow_delay is not None:
+        delays[0] = slow_delay
+    servers = [
+        await asyncio.start_server(
+            lambda r, w, d=d: stub_backend_connection(r, w, d), "127.0.0.1", port, backlog=2048
+        )
+        for port, d in zip(ports, delays)
+    ]
+    await asyncio.gather(*(s.serve_forever() for s in servers))
+
+
+# -------------------------------------------------------------------------------
+# ENGINES UNDER TEST
+# -------------------------------------------------------------------------------
+def run_engine(engine, port, backend_urls, strategy):
+    sys.path.insert(0, HERE)
+    import load_balancer
+
+    # Point the engine at the stub backends; every stub is healthy, so no
+    # health check thread is started.
+    manager = load_balancer.BackendManager(backend_urls, strategy)
+    if engine == "threaded":
+        load_balancer.backend_manager = manager
+        with load_balancer.ThreadedTCPServer(("127.0.0.1", port), load_balancer.LoadBalancerHandler) as httpd:
+            httpd.serve_forever()
+    else:
+        import async_load_balancer
+        asyncio.run(async_load_balancer.serve(async_load_balancer.AsyncLoadBalancer(manager), "127.0.0.1", port))
+
+
+# -------------------------------------------------------------------------------
+# LOAD GENERATOR
+# -------------------------------------------------------------------------------
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lowered = head.lower()
+    length = None
+    for line in lowered.split(b"\r\n"):
+        if line.startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    status = int(head.split(b" ", 2)[1])
+    if length is None:
+        await reader.read()
+        return status, False
+    await reader.readexactly(length)
+    keep_alive = head.startswith(b"HTTP/1.1") and b"connection: close" not in lowered
+    return status, keep_alive
+
+
+async def client_loop(port, path, deadline, latencies, errors):
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n".encode()
+    conn = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if conn is None:
+                conn = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), REQUEST_TIMEOUT)
+            reader, writer = conn
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(read_response(reader), REQUEST_TIMEOUT)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            kind = "timeout" if isinstance(e, asyncio.TimeoutError) else "connection"
+            errors[kind] = errors.get(kind, 0) + 1
+            if conn is not None:
+                conn[1].close()
+            conn = None
+            await asyncio.sleep(0.01)
+            continue
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+        if not keep_alive:
+            writer.close()
+            conn = None
+    if conn is not None:
+        conn[1].close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def generate_load(port, path, concurrency, duration):
+    latencies, errors = [], {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client_loop(port, path, deadline, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **{
+            f"p{q}_ms": round(percentile(latencies, q) * 1000, 2) if latencies else None
+            for q in (50, 95, 99)
+        },
+    }
+
+
+# -------------------------------------------------------------------------------
+# ORCHESTRATION
+# -------------------------------------------------------------------------------
+def free_ports(count):
+    sockets = [socket.socket() for _ in range(count)]
+    for s in sockets:
+        s.bind(("127.0.0.1", 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def wait_for_port(port, process):
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited early with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {STARTUP_TIMEOUT}s")
+
+
+def spawn(*args):
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), *args],
+        cwd=HERE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def benchmark(args):
+    backend_ports = free_ports(args.backends)
+    backend_urls = [f"http://127.0.0.1:{p}" for p in backend_ports]
+    stub_args = ["--serve-backends", *map(str, backend_ports), "--backend-delay", str(args.backend_delay)]
+    if args.slow_backend_delay is not None:
+        stub_args += ["--slow-backend-delay", str(args.slow_backend_delay)]
+    backends = spawn(*stub_args)
+    results = []
+    try:
+        for port in backend_ports:
+            wait_for_port(port, backends)
+        for engine in args.engines:
+            (port,) = free_ports(1)
+            process = spawn(
+                "--serve-engine", engine, "--port", str(port), "--strategy", args.strategy,
+                "--backend-urls", *backend_urls,
+            )
+            try:
+                wait_for_port(port, process)
+                for concurrency in args.concurrency:
+                    # Short warm-up so both engines start with open backend connections.
+                    asyncio.run(generate_load(port, args.path, concurrency, min(1.0, args.duration)))
+                    result = asyncio.run(generate_load(port, args.path, concurrency, args.duration))
+                    result["engine"] = engine
+                    result["strategy"] = args.strategy
+                    results.append(result)
+                    print(
+                        f"{engine:>8}  {args.strategy:<17}  c={concurrency:<5} {result['throughput_rps']:>9} req/s  "
+                        f"p50={result['p50_ms']}ms  p95={result['p95_ms']}ms  p99={result['p99_ms']}ms  "
+                        f"errors={sum(result['errors'].values())}",
+                        flush=True,
+                    )
+            finally:
+                stop(process)
+    finally:
+        stop(backends)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Threaded vs asyncio load balancer throughput benchmark")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--backends", type=int, default=4, help="number of stub backends")
+    parser.add_argument("--backend-delay", type=float, default=0.0,
+                        help="seconds each stub backend waits before answering")
+    parser.add_argument("--slow-backend-delay", type=float,
+                        help="seconds the first stub backend waits instead")
+    # Validated by the engine process; importing load_balancer here would
+    # install its signal handlers in the benchmark process too.
+    parser.add_argument("--strategy", default="round-robin",
+                        help="balancing strategy, see load_balancer.BALANCING_STRATEGIES")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per measurement")
+    parser.add_argument("--path", default="/healthcheck")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    # Internal: subprocess roles.
+    parser.add_argument("--serve-backends", type=int, nargs="+", help=argparse.SUPPRESS)
+    parser.add_argument("--serve-engine", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--backend-urls", nargs="+", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.serve_backends:
+        asyncio.run(run_stub_backends(args.serve_backends, args.backend_delay, args.slow_backend_delay))
+        return
+    if args.serve_engine:
+        run_engine(args.serve_engine, args.port, args.backend_urls, args.strategy)
+        return
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
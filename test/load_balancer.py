@@ -1,25 +1,46 @@
 #!/usr/bin/env python3
+import os
 import sys
+import math
+import random
 import signal
-import queue
+import argparse
 import threading
 import time
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as BackendStreamError
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ProtocolError
 from http.server import BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn, TCPServer
+from collections import OrderedDict, namedtuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # -------------------------------------------------------------------------------
 # CONFIGURATION CONSTANTS
 # -------------------------------------------------------------------------------
 LOG_FILE = "logs/load_balancer.log"
-NUM_WORKERS = 10
-REQUEST_TIMEOUT = 60  # seconds to wait for worker response
-RETRY_INTERVAL = 30   # seconds until a backend is retried after failure
+# Timeouts shared by both engines (async_load_balancer.py imports these).
+BACKEND_CONNECT_TIMEOUT = 5  # seconds to open a connection to a backend
+BACKEND_READ_TIMEOUT = 30  # seconds a backend may stay silent while answering
+CLIENT_TIMEOUT = 60  # seconds a keep-alive client may idle or stall mid-request
+LISTEN_BACKLOG = 2048  # pending client connections queued by the kernel
+POOL_MAXSIZE = 50  # pooled keep-alive connections kept per backend
+CHUNK_SIZE = 64 * 1024  # bytes streamed to the client per write
 HEALTH_CHECK_INTERVAL = 10  # seconds between health check cycles
+HEALTH_CHECK_TIMEOUT = 5  # seconds a /healthcheck probe may take
+PROBE_WORKERS = 10  # persistent threads running health check probes
 MAX_CONSECUTIVE_FAILURES = 3  # mark backend unhealthy after these many failures
 MIN_CONSECUTIVE_SUCCESSES = 2  # mark backend healthy after these many successes
+# Passive outlier detection on live traffic.
+CONSECUTIVE_5XX_TO_EJECT = 5  # 5xx/read failures in a row before ejection
+EJECTION_BASE_TIME = 10  # seconds; doubles with each consecutive ejection
+EJECTION_MAX_TIME = 300  # cap on a single ejection
+MAX_EJECTION_PERCENT = 50  # 5xx ejections never take out more backends than this
+BALANCING_STRATEGIES = ("round-robin", "least-outstanding", "peak-ewma", "p2c")
+DEFAULT_STRATEGY = "round-robin"
+EWMA_DECAY = 10.0  # seconds for an old latency sample's weight to fall by 1/e
 
 # -------------------------------------------------------------------------------
 # LOGGING SETUP
@@ -27,6 +48,7 @@ MIN_CONSECUTIVE_SUCCESSES = 2  # mark backend healthy after these many successes
 logger = logging.getLogger("ImprovedLoadBalancer")
 logger.setLevel(logging.DEBUG)
 
+os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
 file_handler.setLevel(logging.DEBUG)
 console_handler = logging.StreamHandler(sys.stdout)
@@ -68,14 +90,65 @@ signal.signal(signal.SIGTERM, signal_handler)
 # BACKEND MANAGER (THREAD-SAFE)
 # -------------------------------------------------------------------------------
 class BackendManager:
-    def __init__(self, backends):
+    """
+    Health state plus backend selection. Proxies call acquire_backend() /
+    release_backend() around each request so the in-flight count per backend
+    stays accurate, and record_latency() once response headers arrive.
+
+    Health is active and passive. Live traffic reports every outcome through
+    report_success() / report_failure(): a connect failure ejects the backend
+    at once, CONSECUTIVE_5XX_TO_EJECT 5xx responses or read failures in a row
+    eject it too (bounded by MAX_EJECTION_PERCENT). Failed /healthcheck probes
+    eject as before. Ejections last EJECTION_BASE_TIME doubled per repeat
+    ejection; afterwards the probes must pass MIN_CONSECUTIVE_SUCCESSES times
+    before the backend is readmitted.
+
+    Strategies:
+      round-robin        rotate through healthy backends
+      least-outstanding  fewest in-flight requests
+      peak-ewma          lowest latency EWMA x (in-flight + 1); the EWMA jumps
+                         to any slower sample at once and decays back slowly
+      p2c                two random backends, the one with fewer in-flight
+                         requests wins (ties go to the lower peak-EWMA cost)
+    """
+    def __init__(self, backends, strategy=DEFAULT_STRATEGY):
         self.backends = backends
         self.healthy_backends = list(backends)  # start by assuming all are healthy
-        self.excluded_backends = {}  # {backend_url: next_retry_timestamp}
+        self.ejected_until = {}  # {backend_url: monotonic time its ejection ends}
+        self.ejection_counts = {b: 0 for b in backends}  # consecutive ejections, drives backoff
+        self.last_ejected = {b: 0.0 for b in backends}
         self.current_index = 0
         self.consecutive_failures = {b: 0 for b in backends}
         self.consecutive_successes = {b: 0 for b in backends}
+        self.consecutive_5xx = {b: 0 for b in backends}  # passive, from live traffic
+        self.outstanding = {b: 0 for b in backends}  # in-flight requests
+        self.latency_ewma = {b: 0.0 for b in backends}  # seconds
+        self.latency_updated = {b: time.monotonic() for b in backends}
         self.lock = threading.Lock()
+        # Long-lived probe workers and keep-alive connections, instead of a new
+        # executor and new TCP connections every cycle.
+        self.probe_pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="probe")
+        self.probe_session = requests.Session()
+        self.probe_session.mount("http://", HTTPAdapter(pool_connections=len(backends), pool_maxsize=1))
+        self.set_strategy(strategy)
+
+    def set_strategy(self, strategy):
+        if strategy not in BALANCING_STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy {strategy!r}; expected one of {BALANCING_STRATEGIES}")
+        self.strategy = strategy
+
+    def _eject(self, backend, reason):
+        # Caller holds self.lock.
+        now = time.monotonic()
+        if backend in self.healthy_backends:
+            self.healthy_backends.remove(backend)
+        self.ejection_counts[backend] += 1
+        duration = min(EJECTION_BASE_TIME * 2 ** (self.ejection_counts[backend] - 1), EJECTION_MAX_TIME)
+        self.ejected_until[backend] = now + duration
+        self.last_ejected[backend] = now
+        self.consecutive_successes[backend] = 0
+        self.consecutive_5xx[backend] = 0
+        logger.warning(f"[Outlier] Ejected {backend} for {duration}s ({reason}).")
 
     def update_health_status(self, backend, is_healthy):
         with self.lock:
@@ -85,32 +158,114 @@ class BackendManager:
                 if self.consecutive_successes[backend] >= MIN_CONSECUTIVE_SUCCESSES:
                     if backend not in self.healthy_backends:
                         self.healthy_backends.append(backend)
-                    if backend in self.excluded_backends:
-                        del self.excluded_backends[backend]
+                        self.consecutive_5xx[backend] = 0
+                        logger.info(f"[HealthCheck] Readmitted {backend}.")
+                    self.ejected_until.pop(backend, None)
+                    # A backend that stayed up long enough starts its backoff over.
+                    if time.monotonic() - self.last_ejected[backend] > EJECTION_MAX_TIME:
+                        self.ejection_counts[backend] = 0
             else:
                 self.consecutive_successes[backend] = 0
                 self.consecutive_failures[backend] = self.consecutive_failures.get(backend, 0) + 1
-                if self.consecutive_failures[backend] >= MAX_CONSECUTIVE_FAILURES:
-                    if backend in self.healthy_backends:
-                        self.healthy_backends.remove(backend)
-                    self.excluded_backends[backend] = time.time() + RETRY_INTERVAL
+                if backend not in self.healthy_backends:
+                    # Failed its readmission probe: back out, for longer.
+                    self._eject(backend, "readmission probe failed")
+                elif self.consecutive_failures[backend] >= MAX_CONSECUTIVE_FAILURES:
+                    self._eject(backend, f"{MAX_CONSECUTIVE_FAILURES} failed health checks")
+
+    def report_success(self, backend):
+        """Live traffic got a non-5xx response from `backend`."""
+        with self.lock:
+            self.consecutive_5xx[backend] = 0
+
+    def report_failure(self, backend, connect_failure=False):
+        """
+        Live traffic failed on `backend`. A connect failure means nothing is
+        listening, so the backend is ejected on the spot; 5xx responses and
+        read failures only eject after CONSECUTIVE_5XX_TO_EJECT in a row.
+        """
+        with self.lock:
+            if backend not in self.healthy_backends:
+                return
+            if connect_failure:
+                self._eject(backend, "connect failure")
+                return
+            self.consecutive_5xx[backend] += 1
+            if self.consecutive_5xx[backend] < CONSECUTIVE_5XX_TO_EJECT:
+                return
+            ejected = len(self.backends) - len(self.healthy_backends)
+            if (ejected + 1) * 100 > MAX_EJECTION_PERCENT * len(self.backends):
+                # Errors everywhere usually mean a shared dependency is down;
+                # keep serving rather than eject the whole pool.
+                logger.debug(f"[Outlier] Not ejecting {backend}: max ejection percent reached.")
+                return
+            self._eject(backend, f"{CONSECUTIVE_5XX_TO_EJECT} consecutive 5xx")
+
+    def _round_robin(self):
+        backend = self.healthy_backends[self.current_index % len(self.healthy_backends)]
+        self.current_index = (self.current_index + 1) % len(self.healthy_backends)
+        return backend
+
+    def _least(self, key):
+        # Random choice among tied backends so no one of them is favoured.
+        costs = {b: key(b) for b in self.healthy_backends}
+        lowest = min(costs.values())
+        return random.choice([b for b, cost in costs.items() if cost == lowest])
+
+    def _ewma_cost(self, backend):
+        # The estimate decays while a backend gets no traffic, so a backend
+        # that was slow once is eventually probed again.
+        idle = time.monotonic() - self.latency_updated[backend]
+        latency = self.latency_ewma[backend] * math.exp(-idle / EWMA_DECAY)
+        return latency * (self.outstanding[backend] + 1)
 
     def get_next_backend(self):
         with self.lock:
             if not self.healthy_backends:
                 return None
-            backend = self.healthy_backends[self.current_index % len(self.healthy_backends)]
-            self.current_index = (self.current_index + 1) % len(self.healthy_backends)
+            return self._round_robin()
+
+    def acquire_backend(self):
+        """Pick a backend with the configured strategy and count the request as in flight."""
+        with self.lock:
+            if not self.healthy_backends:
+                return None
+            if self.strategy == "least-outstanding":
+                backend = self._least(lambda b: self.outstanding[b])
+            elif self.strategy == "peak-ewma":
+                backend = self._least(self._ewma_cost)
+            elif self.strategy == "p2c" and len(self.healthy_backends) > 1:
+                pair = random.sample(self.healthy_backends, 2)
+                backend = min(pair, key=lambda b: (self.outstanding[b], self._ewma_cost(b)))
+            else:
+                backend = self._round_robin()
+            self.outstanding[backend] += 1
             return backend
 
+    def release_backend(self, backend):
+        with self.lock:
+            self.outstanding[backend] = max(0, self.outstanding[backend] - 1)
+
+    def record_latency(self, backend, seconds):
+        """Fold a time-to-response-headers sample into the backend's peak-EWMA."""
+        with self.lock:
+            now = time.monotonic()
+            previous = self.latency_ewma[backend]
+            if seconds > previous:
+                self.latency_ewma[backend] = seconds
+            else:
+                weight = math.exp(-(now - self.latency_updated[backend]) / EWMA_DECAY)
+                self.latency_ewma[backend] = previous * weight + seconds * (1 - weight)
+            self.latency_updated[backend] = now
+
     def check_backend(self, backend):
-        current_time = time.time()
+        """Returns (backend, healthy), with healthy None while the backend sits out an ejection."""
         with self.lock:
-            if backend in self.excluded_backends and current_time < self.excluded_backends[backend]:
-                logger.debug(f"[HealthCheck] Skipping {backend} until retry time.")
-                return backend, False
+            if time.monotonic() < self.ejected_until.get(backend, 0):
+                logger.debug(f"[HealthCheck] Skipping {backend} until its ejection ends.")
+                return backend, None
         try:
-            resp = requests.get(f"{backend}/healthcheck", timeout=5)
+            resp = self.probe_session.get(f"{backend}/healthcheck", timeout=(BACKEND_CONNECT_TIMEOUT, HEALTH_CHECK_TIMEOUT))
             healthy = (resp.status_code == 200)
             return backend, healthy
         except requests.RequestException as e:
@@ -118,13 +273,17 @@ class BackendManager:
             return backend, False
 
     def perform_health_checks(self):
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(self.check_backend, b) for b in self.backends]
-            for future in as_completed(futures):
-                backend, is_healthy = future.result()
+        futures = [self.probe_pool.submit(self.check_backend, b) for b in self.backends]
+        for future in as_completed(futures):
+            backend, is_healthy = future.result()
+            if is_healthy is not None:
                 self.update_health_status(backend, is_healthy)
         with self.lock:
-            logger.info(f"[HealthCheck] {len(self.healthy_backends)}/{TOTAL_BACKENDS} healthy.")
+            logger.info(f"[HealthCheck] {len(self.healthy_backends)}/{len(self.backends)} healthy.")
+
+    def close(self):
+        self.probe_pool.shutdown(wait=False)
+        self.probe_session.close()
 
 # Create a global instance
 backend_manager = BackendManager(BACKENDS)
@@ -133,157 +292,476 @@ def health_check_thread():
     """Continuously perform health checks at fixed intervals."""
     while not shutdown_flag.is_set():
         backend_manager.perform_health_checks()
-        time.sleep(HEALTH_CHECK_INTERVAL)
+        shutdown_flag.wait(HEALTH_CHECK_INTERVAL)
+
 
 # -------------------------------------------------------------------------------
-# REQUEST MANAGER (FOR QUEUE AND RESPONSE MATCHING)
+# STREAMING PROXY
 # -------------------------------------------------------------------------------
-class RequestManager:
-    def __init__(self, maxsize=1000):
-        self.request_queue = queue.Queue(maxsize=maxsize)
-        self.responses = {}  # Maps request_id to response data
-        self.condition = threading.Condition()
-
-    def store_response(self, request_id, status, content, headers):
-        with self.condition:
-            self.responses[request_id] = {
-                "status": status,
-                "content": content,
-                "headers": headers
-            }
-            self.condition.notify_all()
-
-    def get_response(self, request_id, timeout):
-        start_time = time.time()
-        with self.condition:
-            while request_id not in self.responses:
-                remaining = timeout - (time.time() - start_time)
-                if remaining <= 0:
-                    return None
-                self.condition.wait(timeout=remaining)
-            return self.responses.pop(request_id)
+# Hop-by-hop headers apply to a single connection and must not be forwarded.
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade",
+}
+# Set by BaseHTTPRequestHandler.send_response itself.
+SERVER_SET_HEADERS = {"server", "date"}
+# The request body is read up front and re-framed for the backend.
+REQUEST_FRAMING_HEADERS = {"content-length", "expect"}
+# Statuses whose responses never carry a body.
+BODYLESS_STATUSES = {204, 304}
+
+
+def create_proxy_session():
+    """One shared session; urllib3 keeps a thread-safe keep-alive pool per backend."""
+    session = requests.Session()
+    # Only the client's own headers are forwarded; a default Accept-Encoding
+    # would get compressed bytes passed to clients that never asked for them.
+    session.headers.clear()
+    adapter = HTTPAdapter(pool_connections=TOTAL_BACKENDS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+proxy_session = create_proxy_session()
+
+# A request whose connection was refused never reached the backend, so it is
+# safe to try it on another one whatever its method.
+CONNECT_ATTEMPTS = 2
+# A request sent on a pooled connection the backend already closed may be
+# replayed once on a fresh connection, but only when doing so is safe.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class BackendUnreachable(Exception):
+    """Raised by forward() when no connection to the backend could be opened."""
+
+
+def is_connect_failure(exc):
+    """True if requests failed before any byte of the request reached the backend."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def is_connection_reset(exc):
+    """
+    True if the backend closed the connection without answering, as it does
+    to a pooled keep-alive connection it has already timed out.
+    """
+    if not isinstance(exc, requests.exceptions.ConnectionError) or is_connect_failure(exc):
+        return False
+    return bool(exc.args) and isinstance(exc.args[0], ProtocolError)
 
-# Create a global instance
-request_manager = RequestManager()
 
 # -------------------------------------------------------------------------------
-# WORKER THREAD FUNCTION
+# RESPONSE CACHE (OPTIONAL, --cache)
 # -------------------------------------------------------------------------------
-def worker_thread():
-    """Continuously process requests from the queue and forward them to backends."""
-    session = requests.Session()  # Reuse HTTP connections per worker
-    while not shutdown_flag.is_set():
-        try:
-            request_id, method, path, headers, body = request_manager.request_queue.get(timeout=1)
-        except queue.Empty:
-            continue  # Loop again if no request is available
-
-        backend_url = backend_manager.get_next_backend()
-        if not backend_url:
-            request_manager.store_response(
-                request_id, 503, b"No healthy backends available", {}
-            )
-            request_manager.request_queue.task_done()
-            continue
-
-        target_url = backend_url + path
-        try:
-            if method == "GET":
-                resp = session.get(target_url, headers=headers, timeout=10)
-            elif method == "POST":
-                resp = session.post(target_url, headers=headers, data=body, timeout=10)
-            else:
-                request_manager.store_response(
-                    request_id, 405, b"Method Not Allowed", {}
-                )
-                request_manager.request_queue.task_done()
-                continue
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # total cached body bytes before LRU eviction
+CACHE_MAX_ENTRY_BYTES = 1024 * 1024  # larger responses are streamed, never cached
+CACHE_DEFAULT_TTL = 5  # seconds, for allowlisted paths without explicit freshness
+# Idempotent GETs cached even when the backend sends no freshness information.
+CACHEABLE_PATHS = {"/healthcheck", "/endpoints", "/static/swagger.json", "/.well-known/assetlinks.json"}
+CacheEntry = namedtuple("CacheEntry", "status headers body stored_at expires_at")
+
+
+def parse_cache_control(value):
+    """'public, max-age=60' -> {'public': None, 'max-age': '60'}"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+class BodyBuffer:
+    """Collects a response body for the cache, giving up past `limit` bytes."""
+    def __init__(self, limit=CACHE_MAX_ENTRY_BYTES):
+        self.parts = []
+        self.size = 0
+        self.limit = limit
+        self.overflow = False
+
+    def add(self, chunk):
+        if self.overflow:
+            return
+        self.size += len(chunk)
+        if self.size > self.limit:
+            self.overflow = True
+            self.parts = []
+        else:
+            self.parts.append(chunk)
+
+    def getvalue(self):
+        return b"".join(self.parts)
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache of complete GET responses, bounded by total body bytes.
+
+    Shared-cache rules: freshness comes from s-maxage, then max-age; responses
+    marked no-store, no-cache or private, carrying Set-Cookie or "Vary: *",
+    or answering a request with Authorization are never stored, and requests
+    sending no-cache/no-store bypass the cache. CACHEABLE_PATHS (and every
+    */healthcheck) without explicit freshness get CACHE_DEFAULT_TTL. Each set
+    of Vary request-header values (e.g. Origin from flask-cors) is its own entry.
+
+    Concurrent misses on one key are coalesced: claim() makes the first caller
+    the filler and hands everyone else a waiter to block on until
+    release_claim(). Waiters come from `waiter_factory` (threading.Event here,
+    asyncio.Event in the async engine).
+    """
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_entry_bytes=CACHE_MAX_ENTRY_BYTES,
+                 waiter_factory=threading.Event):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.waiter_factory = waiter_factory
+        self.entries = OrderedDict()  # key -> CacheEntry, least recently used first
+        self.vary = {}  # path -> request header names the stored variants differ by
+        self.filling = {}  # key -> waiter of the request fetching it
+        self.size = 0
+        self.lock = threading.Lock()
 
-            request_manager.store_response(
-                request_id, resp.status_code, resp.content, resp.headers
-            )
-        except requests.RequestException as e:
-            logger.warning(f"[Worker] Request to {backend_url} failed: {e}")
-            request_manager.store_response(
-                request_id, 503, b"Service Unavailable: Could not reach backend.", {}
-            )
-        request_manager.request_queue.task_done()
+    @staticmethod
+    def wants(method, authorization, cache_control):
+        """Whether a request may be answered from, and fill, the cache."""
+        if method != "GET" or authorization:
+            return False
+        directives = parse_cache_control(cache_control)
+        return "no-cache" not in directives and "no-store" not in directives
+
+    def key_for(self, path, header_get):
+        names = self.vary.get(path, ())
+        return path, tuple((header_get(n) or "").lower() for n in names)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def claim(self, key):
+        """None if the caller should fetch `key`; otherwise a waiter for the filler."""
+        with self.lock:
+            waiter = self.filling.get(key)
+            if waiter is None:
+                self.filling[key] = self.waiter_factory()
+            return waiter
+
+    def release_claim(self, key):
+        with self.lock:
+            waiter = self.filling.pop(key, None)
+        if waiter is not None:
+            waiter.set()
+
+    def ttl_for(self, path, status, headers_get):
+        """Seconds a response may be served from cache, or None if it must not be stored."""
+        if status != 200 or headers_get("Set-Cookie") is not None:
+            return None
+        if "*" in (headers_get("Vary") or ""):
+            return None
+        directives = parse_cache_control(headers_get("Cache-Control"))
+        if {"no-store", "no-cache", "private"} & directives.keys():
+            return None
+        for name in ("s-maxage", "max-age"):
+            if name in directives:
+                try:
+                    ttl = int(directives[name])
+                except (TypeError, ValueError):
+                    return None
+                return ttl if ttl > 0 else None
+        path_only = path.split("?", 1)[0]
+        if path_only in CACHEABLE_PATHS or path_only.endswith("/healthcheck"):
+            return CACHE_DEFAULT_TTL
+        return None
+
+    def put(self, path, request_header_get, status, headers, body, ttl):
+        """Store a complete response; `headers` must exclude hop-by-hop and framing headers."""
+        if len(body) > self.max_entry_bytes:
+            return
+        names = tuple(
+            n.strip() for h, v in headers if h.lower() == "vary" for n in v.split(",") if n.strip()
+        )
+        now = time.time()
+        with self.lock:
+            self.vary[path] = names
+            key = (path, tuple((request_header_get(n) or "").lower() for n in names))
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = CacheEntry(status, headers, body, now, now + ttl)
+            self.size += len(body)
+            while self.size > self.max_bytes and self.entries:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+
+
+# Set by main() when --cache is given.
+response_cache = None
 
 # -------------------------------------------------------------------------------
 # HTTP REQUEST HANDLER
 # -------------------------------------------------------------------------------
 class LoadBalancerHandler(BaseHTTPRequestHandler):
-    def forward_to_queue(self, method):
-        # Check for healthy backends before enqueuing
-        if not backend_manager.healthy_backends:
-            self.send_response(503)
-            self.end_headers()
-            self.wfile.write(b"No healthy backends available")
+    # Persistent client connections: every response is framed by
+    # Content-Length or chunked encoding so the connection can be reused.
+    protocol_version = "HTTP/1.1"
+    timeout = CLIENT_TIMEOUT  # idle keep-alive connections are closed after this
+    # Headers and body go out in separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK of the headers on every response.
+    disable_nagle_algorithm = True
+
+    def send_plain(self, status, message):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(message)))
+        self.end_headers()
+        self.wfile.write(message)
+
+    def read_body(self):
+        """
+        Read the whole request body (Content-Length or chunked) so the next
+        request on this connection starts at the right byte.
+        """
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    return b"".join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+        content_length = int(self.headers.get("Content-Length", 0))
+        if content_length < 0:
+            # rfile.read(-1) would block until the client closes.
+            raise ValueError(f"negative Content-Length {content_length}")
+        return self.rfile.read(content_length) if content_length else None
+
+    def send_cached(self, entry):
+        if entry is None:
+            return False
+        self.send_response(entry.status)
+        for h, v in entry.headers:
+            self.send_header(h, v)
+        self.send_header("Content-Length", str(len(entry.body)))
+        self.send_header("Age", str(int(time.time() - entry.stored_at)))
+        self.send_header("X-Cache", "HIT")
+        self.end_headers()
+        self.wfile.write(entry.body)
+        return True
+
+    def proxy(self, method):
+        """
+        Forward the request from this handler thread straight to a backend
+        over a pooled connection and stream the response body back chunk by
+        chunk. Bytes are passed through undecoded, so Content-Length and
+        Content-Encoding from the backend stay valid.
+        """
+        try:
+            body = self.read_body()
+        except ValueError:
+            self.close_connection = True
+            self.send_plain(400, b"Bad Request: malformed body framing")
             return
 
-        # Generate a unique request_id (using thread ident and current time)
-        request_id = f"{threading.get_ident()}-{time.time()}"
-        path = self.path
-        headers = dict(self.headers)
-        body = b""
-        if method == "POST":
-            content_length = int(self.headers.get("Content-Length", 0))
-            body = self.rfile.read(content_length)
+        cacheable = response_cache is not None and response_cache.wants(
+            method, self.headers.get("Authorization"), self.headers.get("Cache-Control")
+        )
+        filling_key = None
+        if cacheable:
+            key = response_cache.key_for(self.path, self.headers.get)
+            if self.send_cached(response_cache.get(key)):
+                return
+            waiter = response_cache.claim(key)
+            if waiter is None:
+                filling_key = key
+            else:
+                # Another thread is already fetching this response; wait for it
+                # once, and go to a backend ourselves if it was not cacheable.
+                waiter.wait(BACKEND_READ_TIMEOUT)
+                if self.send_cached(response_cache.get(response_cache.key_for(self.path, self.headers.get))):
+                    return
 
-        # Enqueue the request
         try:
-            request_manager.request_queue.put_nowait((request_id, method, path, headers, body))
-        except queue.Full:
-            logger.warning("[MainThread] Request queue is full. Rejecting request.")
-            self.send_response(503)
-            self.end_headers()
-            self.wfile.write(b"Queue is full. Try again later.")
-            return
-
-        # Wait for the worker to process the request
-        response_data = request_manager.get_response(request_id, REQUEST_TIMEOUT)
-        if response_data is None:
-            logger.warning("[MainThread] Timed out waiting for worker response.")
-            self.send_response(504)
-            self.end_headers()
-            self.wfile.write(b"Gateway Timeout")
-            return
+            for attempt in range(CONNECT_ATTEMPTS):
+                backend_url = backend_manager.acquire_backend()
+                if not backend_url:
+                    self.send_plain(503, b"No healthy backends available")
+                    return
+                try:
+                    self.forward(backend_url, method, body, cacheable, retry=attempt + 1 < CONNECT_ATTEMPTS)
+                    return
+                except BackendUnreachable:
+                    logger.info(f"[Proxy] {backend_url} unreachable, retrying on another backend.")
+                finally:
+                    backend_manager.release_backend(backend_url)
+        finally:
+            if filling_key is not None:
+                response_cache.release_claim(filling_key)
+
+    def forward(self, backend_url, method, body, cacheable=False, retry=False):
+        headers = {
+            h: v for h, v in self.headers.items()
+            if h.lower() not in HOP_BY_HOP_HEADERS and h.lower() not in REQUEST_FRAMING_HEADERS
+        }
+
+        started = time.monotonic()
+        for attempt in range(2):
+            try:
+                resp = proxy_session.request(
+                    method,
+                    backend_url + self.path,
+                    headers=headers,
+                    data=body,
+                    stream=True,
+                    allow_redirects=False,
+                    timeout=(BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT),
+                )
+                break
+            except requests.RequestException as e:
+                if attempt == 0 and method in IDEMPOTENT_METHODS and is_connection_reset(e):
+                    # Most likely a stale pooled connection, not a failing
+                    # backend; urllib3 has discarded it.
+                    logger.debug(f"[Proxy] Connection to {backend_url} reset, replaying {method}.")
+                    continue
+                connect_failure = is_connect_failure(e)
+                backend_manager.report_failure(backend_url, connect_failure=connect_failure)
+                # A fast connection refusal must not make the backend look cheap.
+                backend_manager.record_latency(backend_url, BACKEND_CONNECT_TIMEOUT)
+                if connect_failure and retry:
+                    raise BackendUnreachable(backend_url)
+                logger.warning(f"[Proxy] Request to {backend_url} failed: {e}")
+                self.send_plain(503, b"Service Unavailable: Could not reach backend.")
+                return
+        backend_manager.record_latency(backend_url, time.monotonic() - started)
+        if resp.status_code >= 500:
+            backend_manager.report_failure(backend_url)
+        else:
+            backend_manager.report_success(backend_url)
+
+        has_body = method != "HEAD" and resp.status_code not in BODYLESS_STATUSES
+        # Without a Content-Length the body is re-chunked for HTTP/1.1 clients;
+        # HTTP/1.0 clients get it delimited by closing the connection.
+        chunked = has_body and "content-length" not in resp.raw.headers and self.request_version == "HTTP/1.1"
+        if has_body and "content-length" not in resp.raw.headers and not chunked:
+            self.close_connection = True
+        ttl = response_cache.ttl_for(self.path, resp.status_code, resp.raw.headers.get) if cacheable else None
+        buffer = BodyBuffer(response_cache.max_entry_bytes) if ttl else None
 
-        # Send the worker’s response
-        self.send_response(response_data["status"])
-        for h, v in response_data["headers"].items():
-            if h.lower() not in ["transfer-encoding", "content-length", "content-encoding"]:
+        try:
+            self.send_response(resp.status_code)
+            response_headers = [
+                (h, v) for h, v in resp.raw.headers.items()
+                if h.lower() not in HOP_BY_HOP_HEADERS and h.lower() not in SERVER_SET_HEADERS
+            ]
+            for h, v in response_headers:
                 self.send_header(h, v)
-        self.end_headers()
-        self.wfile.write(response_data["content"])
+            if cacheable:
+                self.send_header("X-Cache", "MISS")
+            if chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            if has_body:
+                for chunk in resp.raw.stream(CHUNK_SIZE, decode_content=False):
+                    if buffer is not None:
+                        buffer.add(chunk)
+                    if chunked and chunk:
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    elif chunk:
+                        self.wfile.write(chunk)
+                if chunked:
+                    self.wfile.write(b"0\r\n\r\n")
+            if buffer is not None and not buffer.overflow:
+                response_cache.put(
+                    self.path,
+                    self.headers.get,
+                    resp.status_code,
+                    [(h, v) for h, v in response_headers if h.lower() != "content-length"],
+                    buffer.getvalue(),
+                    ttl,
+                )
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            logger.debug("[Proxy] Client disconnected mid-response.")
+        except BackendStreamError as e:
+            # Headers are already out; closing is the only way to signal it.
+            self.close_connection = True
+            backend_manager.report_failure(backend_url)
+            logger.warning(f"[Proxy] Backend {backend_url} failed mid-response: {e}")
+        finally:
+            # Returns the connection to the pool once the body is consumed.
+            resp.close()
 
     def do_GET(self):
-        self.forward_to_queue("GET")
+        self.proxy("GET")
+
+    def do_HEAD(self):
+        self.proxy("HEAD")
 
     def do_POST(self):
-        self.forward_to_queue("POST")
+        self.proxy("POST")
+
+    def do_PUT(self):
+        self.proxy("PUT")
+
+    def do_PATCH(self):
+        self.proxy("PATCH")
+
+    def do_DELETE(self):
+        self.proxy("DELETE")
+
+    def do_OPTIONS(self):
+        self.proxy("OPTIONS")
 
 # -------------------------------------------------------------------------------
 # MULTI-THREADED TCP SERVER
 # -------------------------------------------------------------------------------
 class ThreadedTCPServer(ThreadingMixIn, TCPServer):
     allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
 
 # -------------------------------------------------------------------------------
 # MAIN FUNCTION
 # -------------------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Threaded load balancer")
+    parser.add_argument("--strategy", choices=BALANCING_STRATEGIES, default=DEFAULT_STRATEGY,
+                        help="backend selection strategy")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve cacheable GET responses from memory (see ResponseCache)")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_BYTES // (1024 * 1024),
+                        help="total response cache size in MiB")
+    return parser.parse_args()
+
 def main():
+    global response_cache
+    args = parse_args()
+    backend_manager.set_strategy(args.strategy)
+    logger.info(f"Balancing strategy: {args.strategy}")
+    if args.cache:
+        response_cache = ResponseCache(max_bytes=args.cache_max_mb * 1024 * 1024)
+        logger.info(f"Response cache enabled ({args.cache_max_mb} MiB)")
+
     # Start the health check thread
     hc_thread = threading.Thread(target=health_check_thread, daemon=True)
     hc_thread.start()
 
-    # Start worker threads
-    workers = []
-    for _ in range(NUM_WORKERS):
-        t = threading.Thread(target=worker_thread, daemon=True)
-        t.start()
-        workers.append(t)
-
     # Start the threaded TCP server for handling HTTP requests
     PORT = 8080
     with ThreadedTCPServer(("", PORT), LoadBalancerHandler) as httpd:
@@ -299,8 +777,8 @@ def main():
 
     # Wait for threads to finish (with timeout safeguards)
     hc_thread.join(timeout=5)
-    for w in workers:
-        w.join(timeout=5)
+    backend_manager.close()
+    proxy_session.close()
     logger.info("Load balancer has stopped gracefully.")
 
 if __name__ == "__main__":
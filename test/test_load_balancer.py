@@ -0,0 +1,357 @@
+"""
+Unit tests for the load balancer engines: backend selection and ejection in
+BackendManager, the ResponseCache rules, and requests through the threaded
+and the asyncio proxy against a local stub backend.
+
+    cd test && python -m pytest -q test_load_balancer.py
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import load_balancer
+from load_balancer import (
+    CACHE_DEFAULT_TTL,
+    CONSECUTIVE_5XX_TO_EJECT,
+    EJECTION_BASE_TIME,
+    MIN_CONSECUTIVE_SUCCESSES,
+    BackendManager,
+    LoadBalancerHandler,
+    ResponseCache,
+    ThreadedTCPServer,
+)
+from async_load_balancer import AsyncLoadBalancer
+
+CONCURRENT_MISSES = 8
+
+
+class StubBackend(BaseHTTPRequestHandler):
+    """
+    Answers every request with a two-byte body after server.delay seconds,
+    counting hits; the first server.resets requests get their connection
+    closed without an answer instead.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.hits += 1
+        if self.server.hits <= self.server.resets:
+            self.close_connection = True
+            return
+        time.sleep(self.server.delay)
+        body = b"ok"
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBackend)
+    server.hits = 0
+    server.resets = 0
+    server.delay = 0.0
+    server.status = 200
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    start_server(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_manager():
+    managers = []
+
+    def make(backends, strategy="round-robin"):
+        manager = BackendManager(backends, strategy)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+BACKENDS = ["http://a", "http://b", "http://c", "http://d"]
+
+
+# -------------------------------------------------------------------------------
+# STRATEGIES
+# -------------------------------------------------------------------------------
+def test_round_robin_rotates_through_healthy_backends(make_manager):
+    manager = make_manager(BACKENDS[:3])
+    picked = [manager.acquire_backend() for _ in range(6)]
+    assert picked == BACKENDS[:3] * 2
+
+
+def test_least_outstanding_picks_the_idlest_backend(make_manager):
+    manager = make_manager(BACKENDS[:3], "least-outstanding")
+    first = manager.acquire_backend()
+    second = manager.acquire_backend()
+    third = manager.acquire_backend()
+    assert {first, second, third} == set(BACKENDS[:3])
+    manager.release_backend(second)
+    assert manager.acquire_backend() == second
+
+
+def test_peak_ewma_avoids_slow_and_busy_backends(make_manager):
+    manager = make_manager(BACKENDS[:2], "peak-ewma")
+    manager.record_latency("http://a", 1.0)
+    manager.record_latency("http://b", 0.01)
+    assert {manager.acquire_backend() for _ in range(5)} == {"http://b"}
+    # One slow sample is enough to steer traffic away at once.
+    manager.record_latency("http://b", 5.0)
+    assert manager.acquire_backend() == "http://a"
+
+
+def test_p2c_prefers_the_backend_with_fewer_requests_in_flight(make_manager):
+    manager = make_manager(BACKENDS[:2], "p2c")
+    busy = manager.acquire_backend()
+    idle = ({"http://a", "http://b"} - {busy}).pop()
+    for _ in range(5):
+        backend = manager.acquire_backend()
+        assert backend == idle
+        manager.release_backend(backend)
+
+
+def test_acquire_and_release_track_requests_in_flight(make_manager):
+    manager = make_manager(BACKENDS[:2], "least-outstanding")
+    acquired = [manager.acquire_backend() for _ in range(4)]
+    assert manager.outstanding == {"http://a": 2, "http://b": 2}
+    for backend in acquired:
+        manager.release_backend(backend)
+    manager.release_backend("http://a")
+    assert manager.outstanding == {"http://a": 0, "http://b": 0}
+
+
+def test_unknown_strategy_is_rejected(make_manager):
+    with pytest.raises(ValueError):
+        make_manager(BACKENDS, "fastest")
+
+
+# -------------------------------------------------------------------------------
+# EJECTION
+# -------------------------------------------------------------------------------
+def test_connect_failure_ejects_at_once(make_manager):
+    manager = make_manager(BACKENDS[:2])
+    manager.report_failure("http://a", connect_failure=True)
+    assert manager.healthy_backends == ["http://b"]
+    assert {manager.acquire_backend() for _ in range(4)} == {"http://b"}
+
+
+def test_consecutive_5xx_eject_up_to_max_ejection_percent(make_manager):
+    manager = make_manager(BACKENDS)
+    for _ in range(CONSECUTIVE_5XX_TO_EJECT - 1):
+        manager.report_failure("http://a")
+    manager.report_success("http://a")
+    manager.report_failure("http://a")
+    assert "http://a" in manager.healthy_backends
+
+    for backend in BACKENDS:
+        for _ in range(CONSECUTIVE_5XX_TO_EJECT):
+            manager.report_failure(backend)
+    # MAX_EJECTION_PERCENT is 50: two of the four stay in the pool.
+    assert len(manager.healthy_backends) == 2
+
+
+def test_ejections_back_off_and_end_with_readmission(make_manager, backend):
+    manager = make_manager([backend.url])
+    manager.report_failure(backend.url, connect_failure=True)
+    first = manager.ejected_until[backend.url] - time.monotonic()
+    assert EJECTION_BASE_TIME - 1 < first <= EJECTION_BASE_TIME
+
+    # While ejected, probes are skipped and the backend stays out.
+    manager.perform_health_checks()
+    assert manager.healthy_backends == []
+
+    # A failed readmission probe ejects it again for twice as long.
+    manager.update_health_status(backend.url, False)
+    second = manager.ejected_until[backend.url] - time.monotonic()
+    assert 2 * EJECTION_BASE_TIME - 1 < second <= 2 * EJECTION_BASE_TIME
+
+    manager.ejected_until[backend.url] = 0
+    for _ in range(MIN_CONSECUTIVE_SUCCESSES):
+        manager.perform_health_checks()
+    assert manager.healthy_backends == [backend.url]
+    assert backend.url not in manager.ejected_until
+
+
+# -------------------------------------------------------------------------------
+# RESPONSE CACHE
+# -------------------------------------------------------------------------------
+def headers_get(headers):
+    return lambda name: headers.get(name)
+
+
+def test_cache_control_decides_what_is_stored_and_for_how_long():
+    cache = ResponseCache()
+    assert cache.ttl_for("/api", 200, headers_get({"Cache-Control": "public, max-age=60"})) == 60
+    assert cache.ttl_for("/api", 200, headers_get({"Cache-Control": "max-age=60, s-maxage=10"})) == 10
+    assert cache.ttl_for("/api", 200, headers_get({})) is None
+    assert cache.ttl_for("/endpoints", 200, headers_get({})) == CACHE_DEFAULT_TTL
+    assert cache.ttl_for("/auth/healthcheck", 200, headers_get({})) == CACHE_DEFAULT_TTL
+    for headers in ({"Cache-Control": "private, max-age=60"}, {"Cache-Control": "no-store"},
+                    {"Cache-Control": "max-age=0"}, {"Cache-Control": "max-age=x"},
+                    {"Cache-Control": "max-age=60", "Set-Cookie": "id=1"},
+                    {"Cache-Control": "max-age=60", "Vary": "*"}):
+        assert cache.ttl_for("/api", 200, headers_get(headers)) is None, headers
+    assert cache.ttl_for("/endpoints", 500, headers_get({})) is None
+
+    assert ResponseCache.wants("GET", None, None)
+    assert not ResponseCache.wants("POST", None, None)
+    assert not ResponseCache.wants("GET", "Bearer token", None)
+    assert not ResponseCache.wants("GET", None, "no-cache")
+
+
+def test_expired_entries_are_not_served():
+    cache = ResponseCache()
+    request = headers_get({})
+    cache.put("/endpoints", request, 200, [], b"body", ttl=60)
+    assert cache.get(cache.key_for("/endpoints", request)).body == b"body"
+    cache.put("/endpoints", request, 200, [], b"body", ttl=-1)
+    assert cache.get(cache.key_for("/endpoints", request)) is None
+    assert cache.size == 0
+
+
+def test_vary_headers_key_separate_entries():
+    cache = ResponseCache()
+    app = headers_get({"Origin": "https://app.example"})
+    web = headers_get({"Origin": "https://web.example"})
+    cache.put("/endpoints", app, 200, [("Vary", "Origin")], b"app", ttl=60)
+    assert cache.get(cache.key_for("/endpoints", web)) is None
+    cache.put("/endpoints", web, 200, [("Vary", "Origin")], b"web", ttl=60)
+    assert cache.get(cache.key_for("/endpoints", app)).body == b"app"
+    assert cache.get(cache.key_for("/endpoints", web)).body == b"web"
+
+
+def test_lru_eviction_is_bounded_by_body_bytes():
+    cache = ResponseCache(max_bytes=10, max_entry_bytes=8)
+    request = headers_get({})
+    for path in ("/a", "/b"):
+        cache.put(path, request, 200, [], b"1234", ttl=60)
+    cache.get(cache.key_for("/a", request))  # /b is now least recently used
+    cache.put("/c", request, 200, [], b"1234", ttl=60)
+    assert cache.get(cache.key_for("/b", request)) is None
+    assert cache.get(cache.key_for("/a", request)) is not None
+    assert cache.size == 8
+    cache.put("/large", request, 200, [], b"123456789", ttl=60)
+    assert cache.get(cache.key_for("/large", request)) is None
+    assert cache.size == 8
+
+
+def test_claim_makes_one_filler_and_wakes_the_waiters():
+    cache = ResponseCache()
+    key = cache.key_for("/endpoints", headers_get({}))
+    assert cache.claim(key) is None
+    waiter = cache.claim(key)
+    assert waiter is not None and not waiter.is_set()
+    cache.release_claim(key)
+    assert waiter.is_set()
+    assert cache.claim(key) is None
+
+
+# -------------------------------------------------------------------------------
+# THROUGH THE PROXIES
+# -------------------------------------------------------------------------------
+def start_proxy(monkeypatch, manager):
+    monkeypatch.setattr(load_balancer, "backend_manager", manager)
+    return start_server(ThreadedTCPServer(("127.0.0.1", 0), LoadBalancerHandler))
+
+
+def test_threaded_proxy_coalesces_concurrent_misses(monkeypatch, make_manager, backend):
+    backend.delay = 0.2
+    monkeypatch.setattr(load_balancer, "response_cache", ResponseCache())
+    proxy = start_proxy(monkeypatch, make_manager([backend.url]))
+    url = f"http://127.0.0.1:{proxy.server_address[1]}/endpoints"
+    try:
+        with ThreadPoolExecutor(CONCURRENT_MISSES) as pool:
+            responses = list(pool.map(lambda _: requests.get(url, timeout=5), range(CONCURRENT_MISSES)))
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_MISSES
+    assert {r.content for r in responses} == {b"ok"}
+    assert backend.hits == 1
+    assert sorted(r.headers["X-Cache"] for r in responses) == ["HIT"] * (CONCURRENT_MISSES - 1) + ["MISS"]
+
+
+def test_threaded_proxy_replays_idempotent_requests_on_a_reset_connection(monkeypatch, make_manager, backend):
+    backend.resets = 1
+    manager = make_manager([backend.url])
+    proxy = start_proxy(monkeypatch, manager)
+    url = f"http://127.0.0.1:{proxy.server_address[1]}/api"
+    try:
+        response = requests.get(url, timeout=5)
+        assert (response.status_code, backend.hits) == (200, 2)
+        assert manager.consecutive_5xx[backend.url] == 0
+
+        # A POST may already have been acted on, so it is not sent twice.
+        backend.resets = 3
+        response = requests.post(url, data=b"{}", timeout=5)
+        assert (response.status_code, backend.hits) == (503, 3)
+        assert manager.consecutive_5xx[backend.url] == 1
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
+
+
+async def _async_get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: lb\r\nConnection: close\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def test_async_proxy_coalesces_concurrent_misses(make_manager, backend):
+    backend.delay = 0.2
+    engine = AsyncLoadBalancer(make_manager([backend.url]), cache=ResponseCache(waiter_factory=asyncio.Event))
+
+    async def run():
+        server = await asyncio.start_server(engine.handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            responses = await asyncio.gather(*(_async_get(port, "/endpoints") for _ in range(CONCURRENT_MISSES)))
+        engine.close()
+        return responses
+
+    responses = asyncio.run(run())
+    assert all(r.startswith(b"HTTP/1.1 200") and r.endswith(b"\r\n\r\nok") for r in responses)
+    assert sum(b"X-Cache: HIT" in r for r in responses) == CONCURRENT_MISSES - 1
+    assert backend.hits == 1
+
+
+def test_async_proxy_does_not_cache_server_errors(make_manager, backend):
+    backend.status = 500
+    engine = AsyncLoadBalancer(make_manager([backend.url]), cache=ResponseCache(waiter_factory=asyncio.Event))
+
+    async def run():
+        server = await asyncio.start_server(engine.handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            responses = [await _async_get(port, "/endpoints") for _ in range(2)]
+        engine.close()
+        return responses
+
+    responses = asyncio.run(run())
+    assert all(r.startswith(b"HTTP/1.1 500") for r in responses)
+    assert backend.hits == 2